@@ -23,9 +23,90 @@ const ROOT = getRootPrefix();
 const __BUST__ = String(Date.now());
 function withBust(url) { try { return `${url}${url.includes('?') ? '&' : '?'}v=${__BUST__}`; } catch(_) { return url; } }
 
+// Content-hashed asset manifest (tools/build.py manifest): maps logical paths under data/ and
+// images/ to immutable hashed/ copies. Only the manifest itself is revalidated on every visit;
+// mapped files use the normal HTTP cache. Without a manifest we fall back to cache-busting.
+const MANIFEST_FORMAT = 1;
+let __manifest__ = null;
+
+function loadManifest() {
+  if (!__manifest__) {
+    __manifest__ = (async () => {
+      try {
+        const res = await fetch(withBust(`${ROOT}data/manifest.json`), { cache: 'no-store' });
+        if (!res.ok) return null;
+        const data = await res.json();
+        return (data && data.format === MANIFEST_FORMAT && data.files) ? data.files : null;
+      } catch (_) {
+        return null;
+      }
+    })();
+  }
+  return __manifest__;
+}
+
+// Resolve a root-relative logical path (e.g. "data/os/topics.json") to a fetchable URL
+async function resolveAsset(path) {
+  const files = await loadManifest();
+  const hashed = files && files[path];
+  if (hashed) return { url: `${ROOT}${hashed}`, cache: 'default' };
+  return { url: withBust(`${ROOT}${path}`), cache: 'no-store' };
+}
+
+async function fetchAsset(path) {
+  const { url, cache } = await resolveAsset(path);
+  const res = await fetch(url, { cache });
+  return { url, res };
+}
+
+// URL for a root-relative path (e.g. "images/os/..."); hashed when listed in the manifest
+function rootedAsset(files, path) {
+  if (!path || /^https?:\/\//.test(path)) return path;
+  return `${ROOT}${(files && files[path]) || path}`;
+}
+
+// Optimized image variants (tools/build.py images): images/<course>/variants.json maps an original
+// to its lossless recompression ("opt") and, optionally, a dimension-capped copy ("small").
+const __variants__ = new Map();
+const SMALL_SCREEN = '(max-width: 900px)';
+
+function loadImageVariants(courseId) {
+  if (!__variants__.has(courseId)) {
+    __variants__.set(courseId, (async () => {
+      try {
+        const { res } = await fetchAsset(`images/${courseId}/variants.json`);
+        if (!res.ok) return null;
+        const data = await res.json();
+        return (data && data.images) || null;
+      } catch (_) {
+        return null;
+      }
+    })());
+  }
+  return __variants__.get(courseId);
+}
+
+// Variants for a course plus the shared content-addressed store (images/cas/)
+async function loadVariantsFor(courseId) {
+  const [own, cas] = await Promise.all([loadImageVariants(courseId), loadImageVariants('cas')]);
+  return (own || cas) ? { ...(cas || {}), ...(own || {}) } : null;
+}
+
+function pickVariant(variants, path) {
+  const v = variants && path && variants[path];
+  if (!v) return path;
+  let small = false;
+  try { small = !!(window.matchMedia && window.matchMedia(SMALL_SCREEN).matches); } catch (_) {}
+  return (small && v.small) || v.opt || path;
+}
+
+// Image URL for a root-relative path: best variant for this screen, then manifest hashing
+function imageAsset(files, variants, path) {
+  return rootedAsset(files, pickVariant(variants, path));
+}
+
 export async function loadCourses() {
-  const url = withBust(`${ROOT}data/courses.json`);
-  const res = await fetch(url, { cache: 'no-store' });
+  const { res } = await fetchAsset('data/courses.json');
   if (!res.ok) throw new Error(`Failed to load courses.json (${res.status})`);
   const data = await res.json();
   // Expected shape: { courses: [{ id, course_name }] }
@@ -34,8 +115,7 @@ export async function loadCourses() {
 
 export async function loadTopics(courseId) {
   if (!courseId) return [];
-  const url = withBust(`${ROOT}data/${courseId}/topics.json`);
-  const res = await fetch(url, { cache: 'no-store' });
+  const { res } = await fetchAsset(`data/${courseId}/topics.json`);
   if (!res.ok) throw new Error(`Failed to load topics for ${courseId} (${res.status})`);
   const data = await res.json();
   // Expected shape per spec
@@ -54,8 +134,7 @@ export async function loadTopics(courseId) {
 
 export async function loadPresets(courseId) {
   try {
-    const url = withBust(`${ROOT}data/${courseId}/presets.json`);
-    const res = await fetch(url, { cache: 'no-store' });
+    const { res } = await fetchAsset(`data/${courseId}/presets.json`);
     if (!res.ok) return [];
     const data = await res.json();
     // Expected: { presets: [ { id, name, description, topics?: ["id", ...] } ] }
@@ -65,14 +144,37 @@ export async function loadPresets(courseId) {
   }
 }
 
+// Sharded topics (tools/editor.py shard): the topic file is a manifest listing chunk files
+// ({ questions: [...] }) with a content hash each. Shards are fetched in parallel and, being
+// named by that hash, reuse the HTTP cache until an edit changes them. All shards of a selected
+// topic are fetched up front: QuizEngine weighs and tracks mastery over the whole question set.
+const SHARD_FORMAT = 1;
+
+async function fetchShard(courseId, shard) {
+  const path = `data/${courseId}/${shard.file}`;
+  const files = await loadManifest();
+  const { url, cache } = (shard.sha && !(files && files[path]))
+    ? { url: `${ROOT}${path}?v=${encodeURIComponent(shard.sha)}`, cache: 'default' }
+    : await resolveAsset(path);
+  const res = await fetch(url, { cache });
+  if (!res.ok) throw new Error(`Failed to load topic shard ${url} (${res.status})`);
+  const data = await res.json();
+  if (!data || !Array.isArray(data.questions)) throw new Error(`Invalid topic shard ${url}: missing questions[]`);
+  return data.questions;
+}
+
 export async function loadTopicQuestions(courseId, relativeFilePath) {
-  const url = withBust(`${ROOT}data/${courseId}/${relativeFilePath}`);
-  const res = await fetch(url, { cache: 'no-store' });
+  const { url, res } = await fetchAsset(`data/${courseId}/${relativeFilePath}`);
   if (!res.ok) throw new Error(`Failed to load topic file ${url} (${res.status})`);
   const data = await res.json();
+  if (data && data.shard_format === SHARD_FORMAT && Array.isArray(data.shards)) {
+    const parts = await Promise.all(data.shards.map(s => fetchShard(courseId, s)));
+    data.questions = parts.flat();
+  }
   // Ensure each question has required fields minimally
   if (!data || !Array.isArray(data.questions)) throw new Error('Invalid topic file structure: missing questions[]');
   // Normalize image paths to be relative from project root if they are relative in file
+  const [files, variants] = await Promise.all([loadManifest(), loadVariantsFor(courseId)]);
   data.questions.forEach(q => {
     // Normalize primary question image path
     if (q.image && !/^https?:\/\//.test(q.image)) {
@@ -83,7 +185,7 @@ export async function loadTopicQuestions(courseId, relativeFilePath) {
         q.image = `images/${courseId}/${p}`;
       }
       // Prefix to root for correct resolution from subfolders like /quiz/
-      if (!/^https?:\/\//.test(q.image)) q.image = `${ROOT}${q.image}`;
+      if (!/^https?:\/\//.test(q.image)) q.image = imageAsset(files, variants, q.image);
     }
     // Normalize optional explanation image path
     if (q.explanation_image && !/^https?:\/\//.test(q.explanation_image)) {
@@ -93,28 +195,80 @@ export async function loadTopicQuestions(courseId, relativeFilePath) {
       } else {
         q.explanation_image = `images/${courseId}/${pe}`;
       }
-      if (!/^https?:\/\//.test(q.explanation_image)) q.explanation_image = `${ROOT}${q.explanation_image}`;
+      if (!/^https?:\/\//.test(q.explanation_image)) q.explanation_image = imageAsset(files, variants, q.explanation_image);
     }
   });
   return data;
 }
 
+// Precompiled course bundle (tools/build.py bundles): one request for every topic of a course.
+// Image paths are already rewritten to images/<course>/... and ids are topic-prefixed.
+// Sharded topics are listed ("sharded": true) but not inlined; they are loaded on selection.
+const BUNDLE_FORMAT = 2;
+const __bundles__ = new Map();
+
+export async function loadCourseBundle(courseId) {
+  if (!courseId) return null;
+  if (!__bundles__.has(courseId)) {
+    const p = (async () => {
+      try {
+        const { res } = await fetchAsset(`data/${courseId}/bundle.json`);
+        if (!res.ok) return null;
+        const data = await res.json();
+        if (!data || data.format !== BUNDLE_FORMAT || !Array.isArray(data.questions)) return null;
+        return data;
+      } catch (_) {
+        return null;
+      }
+    })();
+    __bundles__.set(courseId, p);
+  }
+  return __bundles__.get(courseId);
+}
+
+// One topic's questions with topic-prefixed ids, as in the bundle
+async function loadPrefixedTopic(courseId, t) {
+  const data = await loadTopicQuestions(courseId, t.file);
+  return (data.questions || []).map(q => ({
+    ...q,
+    id: `${t.id}::${q.id}`, // ensure uniqueness across topics
+    _topicId: t.id,
+    _topicName: data.topic_name || t.topic_name || t.id,
+  }));
+}
+
 export async function loadQuestionsForTopics(courseId, topicIds) {
-  // Load topics.json to resolve file paths
-  const allTopics = await loadTopics(courseId);
-  const selected = allTopics.filter(t => topicIds.includes(t.id));
-  const loaded = [];
-  for (const t of selected) {
-    const data = await loadTopicQuestions(courseId, t.file);
-    const questions = (data.questions || []).map(q => ({
-      ...q,
-      id: `${t.id}::${q.id}`, // ensure uniqueness across topics
-      _topicId: t.id,
-      _topicName: data.topic_name || t.topic_name || t.id,
+  const bundle = await loadCourseBundle(courseId);
+  if (bundle) {
+    const wanted = new Set(topicIds);
+    const selected = bundle.topics.filter(t => wanted.has(t.id));
+    const [files, variants] = await Promise.all([loadManifest(), loadVariantsFor(courseId)]);
+    const questions = bundle.questions
+      .filter(q => wanted.has(q._topicId))
+      .map(q => ({
+        ...q,
+        image: imageAsset(files, variants, q.image),
+        explanation_image: imageAsset(files, variants, q.explanation_image),
+      }));
+    // Keep the shape identical to per-topic loading (no explicit undefined image keys)
+    questions.forEach(q => {
+      if (!q.image) delete q.image;
+      if (!q.explanation_image) delete q.explanation_image;
+    });
+    // Splice sharded topics back in at their place in the selection, as per-topic loading would
+    const byTopic = new Map(selected.map(t => [t.id, []]));
+    questions.forEach(q => byTopic.get(q._topicId).push(q));
+    await Promise.all(selected.filter(t => t.sharded).map(async t => {
+      byTopic.set(t.id, await loadPrefixedTopic(courseId, t));
     }));
-    loaded.push({ topic: t, questions });
+    const label = selected.map(t => (t.topic_name || t.id)).join(', ');
+    return { questions: selected.flatMap(t => byTopic.get(t.id)), label };
   }
-  const merged = loaded.flatMap(x => x.questions);
+  // Fallback without a bundle: load topics.json, then all selected topic files in parallel
+  const allTopics = await loadTopics(courseId);
+  const selected = allTopics.filter(t => topicIds.includes(t.id));
+  const loaded = await Promise.all(selected.map(t => loadPrefixedTopic(courseId, t)));
+  const merged = loaded.flat();
   const label = selected.map(t => (t.topic_name || t.id)).join(', ');
   return { questions: merged, label };
 }
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+ Build step for the static site
+- Compiles each course into one question bundle: data/<course>/bundle.json
+  (topics index + all questions with image paths rewritten to images/<course>/...
+  and topic-prefixed ids, exactly what js/data.js would produce at runtime)
+- Emits precompressed variants next to it: bundle.json.gz and, when the optional
+  `brotli` module is installed, bundle.json.br
+- Writes a content-hashed asset manifest (data/manifest.json) mapping logical paths
+  under data/ and images/ to immutable copies in hashed/ that can be cached forever
+- Optimizes PNGs under images/ in a process pool: lossless recompression (<name>.opt.png)
+  and, with the optional Pillow package, a dimension-capped variant (<name>.w<N>.png),
+  listed in images/<course>/variants.json for js/data.js
+
+Run: python tools/build.py bundles [--course ID ...]
+     python tools/build.py manifest
+     python tools/build.py images [--course ID ...] [--jobs N] [--max-size 1280]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from editor import (DATA_DIR, IMAGES_DIR, PROJECT_ROOT, compact_topic_logs, file_sha256, is_sharded_topic,
+                    load_courses, load_topics, load_topic_file, site_image_path, write_bytes_atomic,
+                    write_json_atomic)
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image  # optional: pip install Pillow (only needed for --max-size variants)
+except ImportError:
+    Image = None
+
+BUNDLE_NAME = 'bundle.json'
+# Bump when the bundle layout changes; js/data.js ignores bundles with another format
+BUNDLE_FORMAT = 2
+
+MANIFEST_PATH = os.path.join(DATA_DIR, 'manifest.json')
+MANIFEST_FORMAT = 1
+HASHED_DIR = os.path.join(PROJECT_ROOT, 'hashed')
+# Precompressed siblings are copied along with their hashed file, never listed on their own
+COMPRESSED_EXTS = ('.gz', '.br')
+
+VARIANTS_NAME = 'variants.json'
+DEFAULT_MAX_SIZE = 1280
+# Our own outputs; never optimized again
+_VARIANT_RE = re.compile(r'\.(opt|w\d+)\.png$', re.IGNORECASE)
+
+# ---------- Bundles ----------
+
+def build_course_bundle(course_id):
+    """Return the bundle dict for one course."""
+    topics_json = load_topics(course_id)
+    topics = []
+    questions = []
+    for t in topics_json.get('topics', []):
+        tid = t['id']
+        if is_sharded_topic(t['file']):
+            # Not inlined: the site fetches the shards of a sharded topic only when it is selected
+            topics.append({'id': tid, 'file': t['file'], 'topic_name': t.get('topic_name') or tid, 'sharded': True})
+            continue
+        data = load_topic_file(course_id, t['file'])
+        topic_name = data.get('topic_name') or t.get('topic_name') or tid
+        topics.append({'id': tid, 'file': t['file'], 'topic_name': t.get('topic_name') or tid})
+        for q in data.get('questions', []):
+            q = dict(q)
+            for key in ('image', 'explanation_image'):
+                if q.get(key):
+                    q[key] = site_image_path(course_id, q[key])
+            q['id'] = f"{tid}::{q.get('id')}"
+            q['_topicId'] = tid
+            q['_topicName'] = topic_name
+            questions.append(q)
+    return {
+        'format': BUNDLE_FORMAT,
+        'course': course_id,
+        'course_name': topics_json.get('course_name', ''),
+        'topics': topics,
+        'questions': questions,
+    }
+
+
+def bundle_path(course_id):
+    return os.path.join(DATA_DIR, course_id, BUNDLE_NAME)
+
+
+def write_course_bundle(course_id):
+    """Write bundle.json (+ .gz, + .br if available). Returns list of files actually rewritten."""
+    payload = json.dumps(build_course_bundle(course_id), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    p = bundle_path(course_id)
+    written = []
+    if write_bytes_atomic(p, payload):
+        written.append(p)
+    # mtime=0 keeps the gzip output byte-identical for identical input
+    if write_bytes_atomic(p + '.gz', gzip.compress(payload, compresslevel=9, mtime=0)):
+        written.append(p + '.gz')
+    if brotli is not None:
+        if write_bytes_atomic(p + '.br', brotli.compress(payload, quality=11)):
+            written.append(p + '.br')
+    return written
+
+
+def cmd_bundles(args):
+    course_ids = args.course or [c['id'] for c in load_courses()]
+    rc = 0
+    for cid in course_ids:
+        try:
+            written = write_course_bundle(cid)
+        except Exception as e:
+            print(f'{cid}: bundle failed: {e}', file=sys.stderr)
+            rc = 1
+            continue
+        size = os.path.getsize(bundle_path(cid))
+        gz = os.path.getsize(bundle_path(cid) + '.gz')
+        state = 'written' if written else 'unchanged'
+        print(f'{cid}: {size} B json, {gz} B gzip ({state})')
+    if brotli is None:
+        print('brotli module not installed; skipped .br variants', file=sys.stderr)
+    return rc
+
+
+# ---------- Content-hashed asset manifest ----------
+
+def _to_logical(abs_path):
+    return os.path.relpath(abs_path, PROJECT_ROOT).replace(os.sep, '/')
+
+
+def _to_abs(logical):
+    return os.path.join(PROJECT_ROOT, logical.replace('/', os.sep))
+
+
+def hashed_name(logical, digest):
+    """data/os/topics.json -> hashed/data/os/topics.<12 hex>.json"""
+    stem, ext = os.path.splitext(logical)
+    return f'hashed/{stem}.{digest[:12]}{ext}'
+
+
+def iter_asset_files():
+    """Yield logical paths of every file under data/ and images/ that belongs in the manifest."""
+    for root_dir in (DATA_DIR, IMAGES_DIR):
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for fn in sorted(filenames):
+                if fn.startswith('.') or fn.endswith(COMPRESSED_EXTS):
+                    continue
+                p = os.path.join(dirpath, fn)
+                if os.path.abspath(p) == os.path.abspath(MANIFEST_PATH):
+                    continue
+                yield _to_logical(p)
+
+
+def load_manifest():
+    """Return {logical: hashed} or None when no manifest has been built."""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('format') != MANIFEST_FORMAT:
+        return None
+    return data.get('files', {})
+
+
+def _publish_hashed(logical):
+    """Copy logical (and its .gz/.br siblings) to its hashed name; return the hashed path or None if missing."""
+    src = _to_abs(logical)
+    if not os.path.isfile(src):
+        return None
+    target = hashed_name(logical, file_sha256(src))
+    for ext in ('',) + COMPRESSED_EXTS:
+        if ext and not os.path.isfile(src + ext):
+            continue
+        dst = _to_abs(target + ext)
+        # Content-addressed: an existing file with this name already has these bytes
+        if not os.path.exists(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(src + ext, dst)
+    return target
+
+
+def _remove_hashed(target):
+    for ext in ('',) + COMPRESSED_EXTS:
+        try:
+            os.remove(_to_abs(target + ext))
+        except OSError:
+            pass
+
+
+def _write_manifest(files):
+    return write_json_atomic(MANIFEST_PATH, {'format': MANIFEST_FORMAT, 'files': dict(sorted(files.items()))})
+
+
+def build_manifest():
+    """Rebuild the manifest from scratch and prune hashed files no longer referenced."""
+    files = {}
+    for logical in iter_asset_files():
+        target = _publish_hashed(logical)
+        if target:
+            files[logical] = target
+    keep = set()
+    for target in files.values():
+        keep.update(target + ext for ext in ('',) + COMPRESSED_EXTS)
+    for dirpath, _dirnames, filenames in os.walk(HASHED_DIR):
+        for fn in filenames:
+            if _to_logical(os.path.join(dirpath, fn)) not in keep:
+                os.remove(os.path.join(dirpath, fn))
+    _write_manifest(files)
+    return files
+
+
+def update_manifest(logical_paths):
+    """Re-hash only the given logical paths (e.g. after an editor save).
+    No-op when no manifest has been built yet. Returns the list of changed entries.
+    """
+    files = load_manifest()
+    if files is None:
+        return []
+    changed = []
+    for logical in logical_paths:
+        old = files.get(logical)
+        new = _publish_hashed(logical)
+        if new == old:
+            continue
+        if new:
+            files[logical] = new
+        else:
+            files.pop(logical, None)
+        if old and old not in files.values():
+            _remove_hashed(old)
+        changed.append(logical)
+    if changed:
+        _write_manifest(files)
+    return changed
+
+
+def cmd_manifest(args):
+    # Publish topics with their patch-save write logs folded in (editor saves that only
+    # appended to a log left the course bundle as it was)
+    compacted = set()
+    for cid, rel_file in compact_topic_logs():
+        print(f'{cid}/{rel_file}: write log compacted')
+        compacted.add(cid)
+    for cid in sorted(compacted):
+        if os.path.exists(bundle_path(cid)):
+            write_course_bundle(cid)
+    files = build_manifest()
+    print(f'{len(files)} assets in {_to_logical(MANIFEST_PATH)}')
+    return 0
+
+
+# ---------- Image optimization ----------
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Chunks that affect decoding or color; all other ancillary chunks (text, time, pHYs, ...) are dropped
+_PNG_KEEP = {b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT'}
+# Animated PNGs carry frame data outside IDAT; leave them untouched
+_PNG_ANIMATED = {b'acTL', b'fcTL', b'fdAT'}
+
+
+def _png_chunks(data):
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError('not a PNG file')
+    i = len(PNG_SIGNATURE)
+    while i + 8 <= len(data):
+        length, ctype = struct.unpack('>I4s', data[i:i + 8])
+        yield ctype, data[i + 8:i + 8 + length]
+        i += 12 + length
+        if ctype == b'IEND':
+            break
+
+
+def _png_chunk(ctype, body):
+    return struct.pack('>I', len(body)) + ctype + body + struct.pack('>I', zlib.crc32(ctype + body) & 0xffffffff)
+
+
+def recompress_png(data):
+    """Losslessly recompress PNG bytes: same pixels, max zlib effort, metadata chunks stripped.
+    Returns the smaller of the input and the recompressed bytes.
+    """
+    chunks = list(_png_chunks(data))
+    if any(t in _PNG_ANIMATED for t, _ in chunks):
+        return data
+    raw = zlib.decompress(b''.join(body for t, body in chunks if t == b'IDAT'))
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        c = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        out = c.compress(raw) + c.flush()
+        if best is None or len(out) < len(best):
+            best = out
+    parts = [PNG_SIGNATURE]
+    idat_written = False
+    for t, body in chunks:
+        if t == b'IDAT':
+            if not idat_written:
+                parts.append(_png_chunk(b'IDAT', best))
+                idat_written = True
+        elif t in _PNG_KEEP:
+            parts.append(_png_chunk(t, body))
+    out = b''.join(parts)
+    return out if len(out) < len(data) else data
+
+
+def _downscale_png(data, max_size):
+    """Pillow-only: return PNG bytes capped to max_size px on the longer side, or None if already small."""
+    with Image.open(io.BytesIO(data)) as im:
+        if max(im.size) <= max_size:
+            return None
+        im.thumbnail((max_size, max_size), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, format='PNG', optimize=True)
+    return recompress_png(buf.getvalue())
+
+
+def _variant_paths(src, max_size):
+    stem = src[:-len('.png')]
+    return stem + '.opt.png', f'{stem}.w{max_size}.png'
+
+
+def optimize_image(job):
+    """Write the smaller variants of one PNG next to it. Module-level so it can run in a worker.
+    job: (abs_path, max_size). Returns {path, size, opt, small} with variant sizes (None if not written).
+    """
+    src, max_size = job
+    opt_path, small_path = _variant_paths(src, max_size)
+    with open(src, 'rb') as f:
+        data = f.read()
+    rec = {'path': src, 'size': len(data), 'opt': None, 'small': None, 'error': None}
+    try:
+        opt = recompress_png(data)
+        if len(opt) < len(data):
+            write_bytes_atomic(opt_path, opt)
+            rec['opt'] = len(opt)
+        elif os.path.exists(opt_path):
+            os.remove(opt_path)
+        small = _downscale_png(data, max_size) if Image is not None else None
+        if small is not None and len(small) < min(len(data), rec['opt'] or len(data)):
+            write_bytes_atomic(small_path, small)
+            rec['small'] = len(small)
+        elif os.path.exists(small_path):
+            os.remove(small_path)
+    except Exception as e:
+        rec['error'] = str(e)
+    return rec
+
+
+def iter_course_pngs(course_dir):
+    for dirpath, dirnames, filenames in os.walk(course_dir):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if fn.lower().endswith('.png') and not _VARIANT_RE.search(fn):
+                yield os.path.join(dirpath, fn)
+
+
+def optimize_images(course_ids=None, jobs=None, max_size=DEFAULT_MAX_SIZE):
+    """Optimize every PNG of the given courses (default: every folder in images/).
+    Writes images/<course>/variants.json and returns {course: [records]}.
+    """
+    if course_ids is None:
+        course_ids = sorted(d for d in os.listdir(IMAGES_DIR) if os.path.isdir(os.path.join(IMAGES_DIR, d)))
+    work = [(cid, p) for cid in course_ids for p in iter_course_pngs(os.path.join(IMAGES_DIR, cid))]
+    report = {cid: [] for cid in course_ids}
+    if work:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            for (cid, _p), rec in zip(work, ex.map(optimize_image, [(p, max_size) for _c, p in work])):
+                report[cid].append(rec)
+    for cid, recs in report.items():
+        variants = {}
+        for rec in recs:
+            opt_path, small_path = _variant_paths(rec['path'], max_size)
+            entry = {}
+            if rec['opt']:
+                entry['opt'] = _to_logical(opt_path)
+            if rec['small']:
+                entry['small'] = _to_logical(small_path)
+            if entry:
+                variants[_to_logical(rec['path'])] = entry
+        vpath = os.path.join(IMAGES_DIR, cid, VARIANTS_NAME)
+        if variants:
+            write_json_atomic(vpath, {'max_size': max_size, 'images': variants})
+        elif os.path.exists(vpath):
+            os.remove(vpath)
+    return report
+
+
+def cmd_images(args):
+    if Image is None:
+        print('Pillow not installed; only lossless .opt.png variants are written', file=sys.stderr)
+    report = optimize_images(args.course, jobs=args.jobs, max_size=args.max_size)
+    rc = 0
+    for cid, recs in report.items():
+        orig = sum(r['size'] for r in recs)
+        best = sum(min(x for x in (r['size'], r['opt'], r['small']) if x) for r in recs)
+        saved = (100.0 * (orig - best) / orig) if orig else 0.0
+        print(f'{cid}: {len(recs)} PNGs, {orig / 1024:.0f} KiB -> {best / 1024:.0f} KiB smallest variants ({saved:.1f}% saved)')
+        for r in recs:
+            if r['error']:
+                print(f"  {_to_logical(r['path'])}: {r['error']}", file=sys.stderr)
+                rc = 1
+    return rc
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Build static-site artifacts from data/')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_b = sub.add_parser('bundles', help='Compile each course into data/<course>/bundle.json')
+    p_b.add_argument('--course', action='append', help='Course id (repeatable; default: all courses)')
+    p_b.set_defaults(func=cmd_bundles)
+    p_m = sub.add_parser('manifest', help='Write data/manifest.json and content-hashed copies in hashed/')
+    p_m.set_defaults(func=cmd_manifest)
+    p_i = sub.add_parser('images', help='Write optimized PNG variants next to images/ originals')
+    p_i.add_argument('--course', action='append', help='Course id (repeatable; default: all image folders)')
+    p_i.add_argument('--jobs', type=int, default=None, help='Worker processes (default: CPU count)')
+    p_i.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE,
+                     help=f'Longer side of the capped variant in px (default: {DEFAULT_MAX_SIZE}; needs Pillow)')
+    p_i.set_defaults(func=cmd_images)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,16 +15,118 @@ Question types supported:
 - connect_nodes
 
 Run: python tools/editor.py
+Headless validation: python tools/editor.py validate [--jobs N] [--format ndjson|json]
 """
+import argparse
+import copy
+import ctypes
+import ctypes.util
+import difflib
+import hashlib
+import io
 import json
+import math
 import os
+import queue
+import re
 import shutil
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import topicbin
+
+# --profile-startup: the GUI imports (Tk, optional Pillow) dominate import time
+_IMPORT_T0 = time.perf_counter()
+# Imported by _import_gui() when the GUI starts, so the headless commands (and build.py,
+# questiondb.py) also run on Python builds without Tk
+tk = tkfont = ttk = filedialog = messagebox = simpledialog = None
+PILImage = None
+
+
+def _import_gui():
+    global tk, tkfont, ttk, filedialog, messagebox, simpledialog, PILImage
+    import tkinter as tk
+    import tkinter.font as tkfont
+    from tkinter import ttk, filedialog, messagebox, simpledialog
+    try:
+        from PIL import Image as PILImage  # optional: better thumbnails, and JPEG/WebP previews
+    except ImportError:
+        PILImage = None
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 IMAGES_DIR = os.path.join(PROJECT_ROOT, 'images')
+# Content-addressed image store shared by all courses: images/cas/<2 hex>/<hash><ext>
+CAS_DIR = os.path.join(IMAGES_DIR, 'cas')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'tools', '.cache')
+VALIDATION_CACHE_PATH = os.path.join(CACHE_DIR, 'validation.json')
+JOURNAL_DIR = os.path.join(CACHE_DIR, 'journal')
+THUMB_DIR = os.path.join(CACHE_DIR, 'thumbs')
+# Bounding box of the inline previews under the Image / Explanation Image fields
+THUMB_MAX = (240, 120)
+# Bump whenever validate_question() rules change so cached results are discarded
+# 2: topic files are read as a stream (.mqt too); new "Unreadable topic file" errors
+VALIDATOR_VERSION = 2
+
+
+def write_bytes_atomic(path, payload):
+    """Write bytes to path via temp file + fsync + os.replace.
+    Skips the write (keeping the mtime) when the file already holds exactly these bytes.
+    Returns True when the file was written, False when it was unchanged.
+    """
+    try:
+        if os.path.getsize(path) == len(payload):
+            with open(path, 'rb') as f:
+                if f.read() == payload:
+                    return False
+    except OSError:
+        pass
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=d)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, tmp)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself (not supported on Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        try:
+            dfd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dfd)
+            finally:
+                os.close(dfd)
+        except OSError:
+            pass
+    return True
+
+
+def dump_json_bytes(data):
+    # Canonical on-disk format of every JSON file written by the editor
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def write_json_atomic(path, data):
+    return write_bytes_atomic(path, dump_json_bytes(data))
 
 
 def load_courses():
@@ -45,30 +147,633 @@ def load_topics(course_id):
 
 def save_topics_json(course_id, topics_json):
     p = os.path.join(DATA_DIR, course_id, 'topics.json')
-    with open(p, 'w', encoding='utf-8') as f:
-        json.dump(topics_json, f, ensure_ascii=False, indent=2)
+    return write_json_atomic(p, topics_json)
+
+
+def topic_path(course_id, rel_file):
+    return os.path.join(DATA_DIR, course_id, rel_file.replace('/', os.sep))
+
+
+def is_binary_topic(rel_file):
+    return rel_file.endswith(topicbin.EXT)
+
+
+def encode_topic(rel_file, topic_data):
+    """On-disk bytes of a topic: compact binary for *.mqt files (see topicbin.py), else JSON."""
+    if is_binary_topic(rel_file):
+        return topicbin.dumps(topic_data)
+    return dump_json_bytes(topic_data)
 
 
 def load_topic_file(course_id, rel_file):
-    p = os.path.join(DATA_DIR, course_id, rel_file.replace('/', os.sep))
+    topic = _load_topic_base(course_id, rel_file)
+    records = read_topic_log(course_id, rel_file)
+    return replay_journal(topic, records) if records else topic
+
+
+def _load_topic_base(course_id, rel_file):
+    p = topic_path(course_id, rel_file)
     if not os.path.exists(p):
         return {"topic_id": "", "topic_name": "", "questions": []}
+    if is_sharded_topic(rel_file):
+        topic = {}
+        questions = list(iter_sharded_topic(course_id, rel_file, topic))
+        topic['questions'] = questions
+        return topic
+    if is_binary_topic(rel_file):
+        with open(p, 'rb') as f:
+            return topicbin.loads(f.read())
     with open(p, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 
 def save_topic_file(course_id, rel_file, topic_data):
-    p = os.path.join(DATA_DIR, course_id, rel_file.replace('/', os.sep))
-    os.makedirs(os.path.dirname(p), exist_ok=True)
-    with open(p, 'w', encoding='utf-8') as f:
-        json.dump(topic_data, f, ensure_ascii=False, indent=2)
+    if is_sharded_topic(rel_file):
+        return bool(save_sharded_topic(course_id, rel_file, topic_data))
+    payload = encode_topic(rel_file, topic_data)
+    mark_topic_log_folded(course_id, rel_file, hashlib.sha256(payload).hexdigest())
+    changed = write_bytes_atomic(topic_path(course_id, rel_file), payload)
+    # The file now holds everything in the write log
+    return discard_topic_log(course_id, rel_file) or changed
+
+
+def iter_topic_file(course_id, rel_file, header=None, chunk_size=64 * 1024):
+    """Yield a topic's questions one at a time while the file is read in chunks, so
+    callers can start work before it is parsed and memory stays bounded by one question.
+    The other top-level keys are stored in `header` in file order ('questions' keeps its
+    position with a None value). Sharded topics are read one shard at a time; binary
+    .mqt topics and topics with a write log are loaded whole, then yielded.
+    """
+    header = {} if header is None else header
+    p = topic_path(course_id, rel_file)
+    if not os.path.exists(p):
+        header.update(topic_id='', topic_name='', questions=None)
+        return
+    if is_sharded_topic(rel_file):
+        yield from iter_sharded_topic(course_id, rel_file, header)
+        return
+    if is_binary_topic(rel_file) or os.path.exists(topic_log_path(course_id, rel_file)):
+        topic = load_topic_file(course_id, rel_file)
+        header.update((k, None if k == 'questions' else v) for k, v in topic.items())
+        yield from topic.get('questions') or []
+        return
+    with open(p, 'r', encoding='utf-8') as f:
+        yield from _iter_json_questions(f, header, chunk_size)
+
+
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+
+def _iter_json_questions(f, header, chunk_size):
+    # Walks the top-level object by hand and hands each value (and each element of
+    # "questions") to JSONDecoder.raw_decode; a value cut off at the end of the buffer
+    # is retried after the next chunk is appended.
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = '' if eof else f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf, pos = buf[pos:] + chunk, 0
+        return True
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                raise ValueError('Unexpected end of topic file')
+
+    def expect(chars):
+        nonlocal pos
+        c = peek()
+        if c not in chars:
+            raise ValueError(f'Expected {" or ".join(map(repr, chars))} at {c!r} in topic file')
+        pos += 1
+        return c
+
+    def value():
+        nonlocal pos
+        if peek() not in '{["':
+            # Numbers and literals have no closing bracket; buffer up to the delimiter after them
+            while not _SCALAR_END.search(buf, pos) and fill():
+                pass
+        while True:
+            try:
+                v, pos = decoder.raw_decode(buf, pos)
+                return v
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = value()
+        if not isinstance(key, str):
+            raise ValueError('Invalid topic file: object keys must be strings')
+        expect(':')
+        if key == 'questions':
+            header[key] = None
+            expect('[')
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield value()
+                    if expect(',]') == ']':
+                        break
+        else:
+            header[key] = value()
+        if expect(',}') == '}':
+            return
+
 
+# ---------- Sharded topics ----------
+# A topic whose file ends in .shards.json is a manifest listing chunk files of about
+# shard_size questions ({"questions": [...]}, paths relative to the course folder, with a
+# content hash each). Saves keep every question in the shard it was loaded from, so an
+# edit rewrites one shard plus the manifest, and the site fetches and caches shards
+# independently (see js/data.js).
 
-def copy_image_into_course(course_id, topic_id, src_path):
+SHARDED_EXT = '.shards.json'
+SHARD_FORMAT = 1
+SHARD_SIZE = 200
+_SHARD_META = ('shard_format', 'shard_size', 'next_shard', 'shards')
+
+
+def is_sharded_topic(rel_file):
+    return rel_file.endswith(SHARDED_EXT)
+
+
+def shard_digest(payload):
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _shard_prefix(rel_file):
+    # topic/big.shards.json -> topic/big/
+    return rel_file[:-len(SHARDED_EXT)] + '/'
+
+
+def load_shard_manifest(course_id, rel_file):
+    with open(topic_path(course_id, rel_file), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict) or manifest.get('shard_format') != SHARD_FORMAT \
+            or not isinstance(manifest.get('shards'), list):
+        raise ValueError(f'{rel_file} is not a shard manifest (format {SHARD_FORMAT})')
+    return manifest
+
+
+def read_shard(course_id, shard):
+    """Questions of one manifest entry; ValueError when the file does not match its hash."""
+    with open(topic_path(course_id, shard['file']), 'rb') as f:
+        payload = f.read()
+    if shard.get('sha') and shard_digest(payload) != shard['sha']:
+        raise ValueError(f"Shard {shard['file']} was changed without updating its manifest")
+    data = json.loads(payload.decode('utf-8'))
+    if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+        raise ValueError(f"Invalid shard {shard['file']}: missing questions[]")
+    return data['questions']
+
+
+def iter_sharded_topic(course_id, rel_file, header):
+    # Memory stays bounded by one shard
+    manifest = load_shard_manifest(course_id, rel_file)
+    for k, v in manifest.items():
+        if k == 'shards':
+            header['questions'] = None
+        elif k not in _SHARD_META:
+            header[k] = v
+    for shard in manifest['shards']:
+        yield from read_shard(course_id, shard)
+
+
+def sharded_topic_size(course_id, rel_file):
+    """Bytes on disk of a sharded topic (manifest plus shards)."""
+    total = os.path.getsize(topic_path(course_id, rel_file))
+    for shard in load_shard_manifest(course_id, rel_file)['shards']:
+        try:
+            total += os.path.getsize(topic_path(course_id, shard['file']))
+        except OSError:
+            pass
+    return total
+
+
+def _question_key(q):
+    return json.dumps(q, ensure_ascii=False, separators=(',', ':'))
+
+
+def save_sharded_topic(course_id, rel_file, topic_data, shard_size=None):
+    """Write a sharded topic, rewriting only the shards whose questions changed.
+    Questions are aligned with the saved shards (difflib over their JSON) so unchanged
+    ones stay where they are; inserted questions join the shard of the one before them
+    and a shard grown past twice shard_size is split. Changed shards are written under
+    fresh names and superseded ones deleted only after the manifest is replaced, so the
+    files on disk always match some manifest. Returns the files written or deleted,
+    relative to the course folder.
+    """
+    try:
+        manifest = load_shard_manifest(course_id, rel_file)
+    except FileNotFoundError:
+        manifest = {}
+    size = shard_size or manifest.get('shard_size') or SHARD_SIZE
+    next_shard = manifest.get('next_shard', 1)
+    old_shards = manifest.get('shards', [])
+    old_keys, owner, unchanged = [], [], {}
+    for si, shard in enumerate(old_shards):
+        try:
+            keys = [_question_key(q) for q in read_shard(course_id, shard)]
+            unchanged[si] = keys
+        except OSError:
+            keys = []
+        except ValueError:
+            # Edited behind the manifest's back: keeps its place but is always rewritten
+            try:
+                keys = [_question_key(q) for q in read_shard(course_id, dict(shard, sha=None))]
+            except ValueError:
+                keys = []
+        old_keys.extend(keys)
+        owner.extend([si] * len(keys))
+    questions = topic_data.get('questions', [])
+    new_keys = [_question_key(q) for q in questions]
+    assign = [None] * len(questions)
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        for j in range(j1, j2):
+            if op == 'insert':
+                assign[j] = assign[j - 1] if j else (owner[0] if owner else None)
+            else:
+                assign[j] = owner[min(i1 + j - j1, i2 - 1)]
+    groups = OrderedDict()  # old shard index (None: no shards yet) -> [(question, key)]
+    for q, key, si in zip(questions, new_keys, assign):
+        groups.setdefault(si, []).append((q, key))
+
+    prefix = _shard_prefix(rel_file)
+    taken = {shard.get('file') for shard in old_shards}
+    shards, written = [], []
+    for si, items in groups.items():
+        if si is not None and len(items) <= 2 * size:
+            pieces = [items]
+        else:
+            pieces = [items[k:k + size] for k in range(0, len(items), size)]
+        for n, piece in enumerate(pieces):
+            if si is not None and n == 0:
+                entry = old_shards[si]
+                if unchanged.get(si) == [key for _q, key in piece]:
+                    shards.append(entry)
+                    continue
+            # Copy-on-write: never overwrite a shard the current manifest points at
+            name = f'{prefix}{next_shard:04d}.json'
+            while name in taken:
+                next_shard += 1
+                name = f'{prefix}{next_shard:04d}.json'
+            next_shard += 1
+            payload = dump_json_bytes({'questions': [q for q, _key in piece]})
+            if write_bytes_atomic(topic_path(course_id, name), payload):
+                written.append(name)
+            shards.append({'file': name, 'count': len(piece), 'sha': shard_digest(payload)})
+
+    meta = {'shard_format': SHARD_FORMAT, 'shard_size': size, 'next_shard': next_shard, 'shards': shards}
+    out = {}
+    for k, v in topic_data.items():
+        if k == 'questions':
+            out.update(meta)
+        elif k not in _SHARD_META:
+            out[k] = v
+    out.update((k, v) for k, v in meta.items() if k not in out)
+    # The manifest switches to the new shards atomically; the old ones go only afterwards
+    if write_json_atomic(topic_path(course_id, rel_file), out):
+        written.append(rel_file)
+    kept = {s['file'] for s in shards}
+    for shard in old_shards:
+        name = shard.get('file', '')
+        if name not in kept and name.startswith(prefix):
+            try:
+                os.remove(topic_path(course_id, name))
+                written.append(name)
+            except FileNotFoundError:
+                pass
+    return written
+
+
+def remove_sharded_topic(course_id, rel_file):
+    """Delete a shard manifest and its shards; returns the removed files."""
+    removed = []
+    prefix = _shard_prefix(rel_file)
+    names = [s.get('file', '') for s in load_shard_manifest(course_id, rel_file)['shards']]
+    for name in [n for n in names if n.startswith(prefix)] + [rel_file]:
+        try:
+            os.remove(topic_path(course_id, name))
+            removed.append(name)
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(topic_path(course_id, prefix))
+    except OSError:
+        pass
+    return removed
+
+
+
+# ---------- Topic write log ----------
+# Patch saves append the changed questions to a sidecar log next to the topic file
+# (topic/.<name>.log: a "base" header naming the topic file it applies to, then journal
+# records, see replay_journal) instead of rewriting the topic. Readers replay the log on
+# top of the file. It is folded back into the file once it outgrows LOG_COMPACT_RATIO of
+# it, on every full save, and before publishing (compact command, build.py manifest).
+# Dot files are not published, so the site only ever sees compacted topics.
+# Folding first appends a "fold" record with the hash of the file about to be written, so a
+# log left behind by an interrupted fold is known to be in the file. A log whose file was
+# replaced without a fold (git checkout, an edit outside the editor) is never replayed or
+# overwritten: it is set aside to topic/.<name>.log.stale until the editor merges or drops it.
+
+LOG_COMPACT_RATIO = 0.25
+LOG_COMPACT_MIN = 64 * 1024
+
+
+def topic_log_rel(rel_file):
+    d, _, name = rel_file.rpartition('/')
+    return f'{d}/.{name}.log' if d else f'.{name}.log'
+
+
+def topic_log_path(course_id, rel_file):
+    return topic_path(course_id, topic_log_rel(rel_file))
+
+
+def topic_signature(course_id, rel_file):
+    """file_signature of a topic together with its write log's; changes when either does."""
+    return file_signature(topic_path(course_id, rel_file)), file_signature(topic_log_path(course_id, rel_file))
+
+
+def _topic_log_base_ok(course_id, rel_file, base):
+    # The log applies only to the exact file it was started on (not one replaced since, e.g.
+    # by git or an interrupted compaction); the stat is checked first to avoid hashing
+    path = topic_path(course_id, rel_file)
+    sig = file_signature(path)
+    if sig is None or not base:
+        return False
+    if [base.get('mtime_ns'), base.get('size')] == list(sig):
+        return True
+    return base.get('sha256') == file_sha256(path)
+
+
+def _read_log_records(path, skip_torn=False):
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    if not skip_torn:
+                        break  # torn last line after a crash
+    except OSError:
+        pass
+    return records
+
+
+def _topic_log_folded(course_id, rel_file, records):
+    # True when a fold record names the topic file as it is now
+    marks = {r.get('sha256') for r in records if r.get('op') == 'fold'}
+    return bool(marks) and file_sha256(topic_path(course_id, rel_file)) in marks
+
+
+def _topic_log_state(course_id, rel_file, records):
+    """'live' (records apply to the current file), 'folded' (already in it) or 'stale'."""
+    if records and records[0].get('op') == 'base' and _topic_log_base_ok(course_id, rel_file, records[0]):
+        return 'live'
+    if os.path.exists(topic_path(course_id, rel_file)) and _topic_log_folded(course_id, rel_file, records):
+        return 'folded'
+    return 'stale'
+
+
+def read_topic_log(course_id, rel_file):
+    """Records of a topic's write log; [] when there is none or it is already in the file.
+    A log that belongs to an older file is set aside (set_topic_log_aside), not replayed."""
+    records = _read_log_records(topic_log_path(course_id, rel_file))
+    if not records:
+        return []
+    state = _topic_log_state(course_id, rel_file, records)
+    if state == 'live':
+        return [r for r in records[1:] if r.get('op') != 'fold']
+    if state == 'stale':
+        set_topic_log_aside(course_id, rel_file)
+    return []
+
+
+def mark_topic_log_folded(course_id, rel_file, sha256):
+    """Record that the file about to be written (with hash sha256) holds the write log. Called
+    before the write; a stale log is set aside instead, since its records are not in it."""
+    p = topic_log_path(course_id, rel_file)
+    if not os.path.exists(p):
+        return
+    if _topic_log_state(course_id, rel_file, _read_log_records(p)) == 'stale':
+        set_topic_log_aside(course_id, rel_file)
+        return
+    append_topic_log(course_id, rel_file, [{'op': 'fold', 'sha256': sha256}])
+
+
+def append_topic_log(course_id, rel_file, records):
+    p = topic_log_path(course_id, rel_file)
+    try:
+        with open(p, 'r', encoding='utf-8') as f:
+            base = json.loads(f.readline())
+    except (OSError, ValueError):
+        base = None
+    lines = []
+    if not _topic_log_base_ok(course_id, rel_file, base):
+        # Start a new log on the current file; an old one is overwritten only once folded in
+        if os.path.exists(p) and _topic_log_state(course_id, rel_file, _read_log_records(p)) == 'stale':
+            set_topic_log_aside(course_id, rel_file)
+        path = topic_path(course_id, rel_file)
+        mtime_ns, size = file_signature(path)
+        lines.append({'op': 'base', 'sha256': file_sha256(path), 'mtime_ns': mtime_ns, 'size': size})
+    else:
+        # Cut a line torn by a crash, or everything appended after it would be unreadable
+        with open(p, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.seek(0)
+                f.truncate(f.read().rfind(b'\n') + 1)
+    lines.extend(records)
+    with open(p, 'w' if lines[0].get('op') == 'base' else 'a', encoding='utf-8') as f:
+        for rec in lines:
+            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def discard_topic_log(course_id, rel_file):
+    """Remove the write log once the topic file holds its records; True if there was one."""
+    try:
+        os.remove(topic_log_path(course_id, rel_file))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def stale_topic_log_path(course_id, rel_file):
+    return topic_log_path(course_id, rel_file) + '.stale'
+
+
+def set_topic_log_aside(course_id, rel_file):
+    # Keep a log made on an older file, after any kept before, until the user merges or
+    # drops it (read_stale_topic_log / discard_stale_topic_log)
+    p = topic_log_path(course_id, rel_file)
+    stale = stale_topic_log_path(course_id, rel_file)
+    try:
+        if not os.path.exists(stale):
+            os.replace(p, stale)
+            return
+        with open(p, 'rb') as f:
+            payload = f.read()
+    except FileNotFoundError:
+        return  # set aside by another reader meanwhile
+    with open(stale, 'ab') as f:
+        f.write(payload if payload.endswith(b'\n') else payload + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(p)
+
+
+def read_stale_topic_log(course_id, rel_file):
+    """Records (no base or fold headers) of the logs set aside for a topic; [] when none."""
+    records = _read_log_records(stale_topic_log_path(course_id, rel_file), skip_torn=True)
+    return [r for r in records if r.get('op') not in ('base', 'fold')]
+
+
+def discard_stale_topic_log(course_id, rel_file):
+    try:
+        os.remove(stale_topic_log_path(course_id, rel_file))
+    except FileNotFoundError:
+        pass
+
+
+def merge_topic_log(questions, records):
+    """Apply write-log records to a topic file other than the one they were made on, matching
+    questions by id rather than position: an edited or inserted question replaces the one
+    with its id (or is inserted at its index when there is none) and a delete removes its id.
+    Returns (questions, skipped) where skipped counts deletes without a known id."""
+    out = list(questions)
+    skipped = 0
+
+    def find(qid):
+        return next((i for i, q in enumerate(out) if qid is not None and q.get('id') == qid), None)
+
+    for rec in records:
+        op, i = rec.get('op'), rec.get('index')
+        if op in ('upsert', 'insert') and isinstance(rec.get('question'), dict):
+            q = rec['question']
+            at = find(q.get('id'))
+            if at is not None:
+                out[at] = q
+            else:
+                out.insert(max(0, min(i if isinstance(i, int) else len(out), len(out))), q)
+        elif op == 'delete':
+            at = find(rec.get('id'))
+            if at is not None:
+                del out[at]
+            else:
+                skipped += 1
+    return out, skipped
+
+
+def question_patch(old, new):
+    """Journal records (upsert/insert/delete by final index) that turn list old into new.
+    The common prefix and suffix are skipped by equality; only the rest is diffed."""
+    n = min(len(old), len(new))
+    lo = 0
+    while lo < n and (old[lo] is new[lo] or old[lo] == new[lo]):
+        lo += 1
+    hi = 0
+    while hi < n - lo and (old[-1 - hi] is new[-1 - hi] or old[-1 - hi] == new[-1 - hi]):
+        hi += 1
+    a, b = old[lo:len(old) - hi], new[lo:len(new) - hi]
+    if a and b:
+        matcher = difflib.SequenceMatcher(None, [_question_key(q) for q in a], [_question_key(q) for q in b],
+                                          autojunk=False)
+        ops = matcher.get_opcodes()
+    else:
+        ops = [('replace', 0, len(a), 0, len(b))] if a or b else []
+    records = []
+    for op, i1, i2, j1, j2 in ops:
+        if op == 'equal':
+            continue
+        common = min(i2 - i1, j2 - j1)
+        for k in range(j2 - j1):
+            records.append({'op': 'upsert' if k < common else 'insert', 'index': lo + j1 + k, 'question': b[j1 + k]})
+        # The id lets merge_topic_log find a deleted question in a file other than this one
+        records.extend({'op': 'delete', 'index': lo + j1 + common, 'id': q.get('id')}
+                       for q in a[i1 + common:i2])
+    return records
+
+
+def save_topic_patch(course_id, rel_file, base_topic, topic_data, records=None):
+    """Save topic_data by appending to the write log the records that turn the questions of
+    base_topic (the topic as last loaded or saved) into its questions; compacts when the
+    log passes its threshold. The log only carries questions[], so the other keys must be
+    those of the file (change them with save_topic_file). New and sharded topics get a
+    full save. records may hold a precomputed question_patch of the two. Returns the
+    files written, relative to the course folder.
+    """
+    path = topic_path(course_id, rel_file)
+    if is_sharded_topic(rel_file) or not os.path.exists(path):
+        return [rel_file] if save_topic_file(course_id, rel_file, topic_data) else []
+    if records is None:
+        records = question_patch(base_topic.get('questions', []), topic_data.get('questions', []))
+    if not records:
+        return []
+    append_topic_log(course_id, rel_file, records)
+    if os.path.getsize(topic_log_path(course_id, rel_file)) > max(LOG_COMPACT_MIN, os.path.getsize(path) * LOG_COMPACT_RATIO):
+        save_topic_file(course_id, rel_file, topic_data)
+        return [rel_file]
+    return [topic_log_rel(rel_file)]
+
+
+def compact_topic_log(course_id, rel_file):
+    """Fold a topic's write log into the topic file; True when there was one to fold."""
+    if not os.path.exists(topic_log_path(course_id, rel_file)):
+        return False
+    topic = load_topic_file(course_id, rel_file)
+    if not os.path.exists(topic_log_path(course_id, rel_file)):
+        return False  # made on an older file: set aside while reading
+    save_topic_file(course_id, rel_file, topic)
+    return True
+
+
+def compact_topic_logs(course_ids=None):
+    """Compact every write log of the given courses (default: all); returns [(course, rel_file)]."""
+    done = []
+    for cid, _tid, rel_file in collect_topic_entries()[0]:
+        if rel_file and (course_ids is None or cid in course_ids) and compact_topic_log(cid, rel_file):
+            done.append((cid, rel_file))
+    return done
+
+
+def copy_image_into_course(course_id, topic_id, src_path, content_addressed=False):
     if not src_path:
         return ""
-    if not os.path.isfile(src_path):
+    # Only files picked from outside the tree are imported. Relative values are JSON references
+    # ("<topic>/<file>", "images/cas/..."), never resolved against the working directory
+    if not os.path.isabs(src_path) or not os.path.isfile(src_path):
         return src_path
+    try:
+        rel = os.path.relpath(os.path.abspath(src_path), IMAGES_DIR)
+    except ValueError:  # another drive on Windows
+        rel = os.pardir + os.sep
+    if not rel.startswith(os.pardir + os.sep):
+        # Already under images/: reference it where it is
+        course, _, rest = rel.replace(os.sep, '/').partition('/')
+        return rest if course == course_id else f'images/{course}/{rest}'
+    if content_addressed:
+        return store_image_by_hash(src_path)
     # Copy into images/<course>/<topic>/
     dst_dir = os.path.join(IMAGES_DIR, course_id, topic_id)
     os.makedirs(dst_dir, exist_ok=True)
@@ -83,6 +788,58 @@ def copy_image_into_course(course_id, topic_id, src_path):
     return f"{topic_id}/{base}"
 
 
+def refresh_site_artifacts(course_id, logical_paths):
+    """Keep an existing bundle/manifest in sync after an editor save so the site never
+    serves stale content. logical_paths are root-relative ("data/os/topics.json");
+    only these entries are re-hashed. Safe to call from a worker thread.
+    """
+    try:
+        import build
+        # Dot files (write logs) are never published; a log-only save leaves the bundle and
+        # manifest for compact / build.py manifest to refresh
+        paths = [p for p in logical_paths if not os.path.basename(p).startswith('.')]
+        if not paths:
+            return
+        if os.path.exists(build.bundle_path(course_id)):
+            build.write_course_bundle(course_id)
+            paths.append(f'data/{course_id}/{build.BUNDLE_NAME}')
+        build.update_manifest(paths)
+    except Exception as e:
+        print('Site artifact refresh failed:', e)
+
+
+def site_image_path(course_id, p):
+    """Site-root-relative image path as resolved by js/data.js ("<topic>/<file>" -> "images/<course>/<topic>/<file>")."""
+    if not p or re.match(r'^https?://', p):
+        return p
+    p = str(p).replace('\\', '/')
+    if re.match(r'^/?images/', p):
+        return p.lstrip('/')
+    return f'images/{course_id}/{p}'
+
+
+def store_image_by_hash(src_path):
+    """Store an image once under images/cas/ keyed by its SHA-256 and return the
+    site-absolute path used in JSON ("images/cas/ab/ab12....png"). Identical files imported
+    into any topic or course map to the same path, so nothing is copied twice.
+    """
+    digest = file_sha256(src_path)
+    ext = os.path.splitext(src_path)[1].lower()
+    rel = f"cas/{digest[:2]}/{digest[:32]}{ext}"
+    dst_path = os.path.join(IMAGES_DIR, rel.replace('/', os.sep))
+    if not os.path.exists(dst_path):
+        try:
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            # Copy under a temp name first so a partial copy never sits at the final hash path
+            tmp = dst_path + '.tmp'
+            shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dst_path)
+        except Exception as e:
+            print('Image copy failed:', e)
+            return src_path
+    return f"images/{rel}"
+
+
 # ---------- Validation ----------
 
 def validate_question(q):
@@ -168,6 +925,1121 @@ def validate_question(q):
     return True, 'OK'
 
 
+# ---------- Headless validation ----------
+
+def collect_topic_entries():
+    """Walk courses.json -> topics.json and return (entries, errors).
+    entries: list of (course_id, topic_id, rel_file)
+    errors: report records for courses whose topics.json could not be read
+    """
+    entries = []
+    errors = []
+    for c in load_courses():
+        cid = c.get('id')
+        try:
+            topics_json = load_topics(cid)
+        except Exception as e:
+            errors.append({'course': cid, 'topic': None, 'file': 'topics.json', 'index': None, 'id': None, 'error': str(e)})
+            continue
+        for t in topics_json.get('topics', []):
+            entries.append((cid, t.get('id'), t.get('file')))
+    return entries, errors
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def topic_digest(course_id, rel_file):
+    """SHA-256 of a topic file (plus its write log, if any); None when the file is missing.
+    Shard manifests list each shard's hash, so the manifest alone covers a sharded topic."""
+    p = topic_path(course_id, rel_file)
+    if not os.path.isfile(p):
+        return None
+    digest = file_sha256(p)
+    log = topic_log_path(course_id, rel_file)
+    if os.path.isfile(log):
+        digest += '+' + file_sha256(log)
+    return digest
+
+
+def validate_topic_entry(entry):
+    """Validate one topic file; returns (question_count, [error records], elapsed_ms).
+    Module-level so it can run in a worker process.
+    """
+    t0 = time.perf_counter()
+    count, errors = _validate_topic_entry(entry)
+    return count, errors, round((time.perf_counter() - t0) * 1000, 3)
+
+
+def _validate_topic_entry(entry):
+    cid, tid, rel_file = entry
+    base = {'course': cid, 'topic': tid, 'file': rel_file}
+    if not rel_file:
+        return 0, [dict(base, index=None, id=None, error='Missing "file" in topics.json entry')]
+    p = os.path.join(DATA_DIR, cid, rel_file.replace('/', os.sep))
+    if not os.path.exists(p):
+        return 0, [dict(base, index=None, id=None, error=f'Missing {p}')]
+    # Streamed, so huge topics are validated in bounded memory
+    header, errors, count = {}, [], 0
+    try:
+        for i, q in enumerate(iter_topic_file(cid, rel_file, header)):
+            count += 1
+            if not isinstance(q, dict):
+                errors.append(dict(base, index=i, id=None, error='Question is not an object'))
+                continue
+            ok, msg = validate_question(q)
+            if not ok:
+                errors.append(dict(base, index=i, id=q.get('id'), error=msg))
+    except Exception as e:
+        return count, errors + [dict(base, index=None, id=None, error=f'Unreadable topic file: {e}')]
+    if 'questions' not in header:
+        return 0, [dict(base, index=None, id=None, error='Invalid topic file structure: missing questions[]')]
+    return count, errors
+
+
+def load_validation_cache(path=None):
+    """Return {"course/rel_file": {sha256, questions, errors, ms}}; empty when missing,
+    unreadable or written by a different VALIDATOR_VERSION."""
+    try:
+        with open(path or VALIDATION_CACHE_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    if data.get('validator_version') != VALIDATOR_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_validation_cache(files, path=None):
+    payload = json.dumps({'validator_version': VALIDATOR_VERSION, 'files': files}, ensure_ascii=False)
+    write_bytes_atomic(path or VALIDATION_CACHE_PATH, payload.encode('utf-8'))
+
+
+def validate_all(jobs=None, use_cache=True):
+    """Validate every topic of every course across a process pool.
+    Files whose SHA-256 matches the cache are not parsed again.
+    Returns report dict: {files, questions, cached, errors:[...], timings:{key: ms}}
+    with errors in data-tree order.
+    """
+    entries, errors = collect_topic_entries()
+    cache = load_validation_cache() if use_cache else {}
+    new_cache = {}
+    results = {}
+    pending = []
+    for entry in entries:
+        cid, _tid, rel_file = entry
+        key = f'{cid}/{rel_file}'
+        digest = topic_digest(cid, rel_file) if rel_file else None
+        hit = cache.get(key)
+        if digest and hit and hit.get('sha256') == digest:
+            results[key] = hit
+            new_cache[key] = hit
+        else:
+            pending.append((key, digest, entry))
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            runs = ex.map(validate_topic_entry, [e for _k, _d, e in pending], chunksize=4)
+            for (key, digest, _entry), (count, errs, ms) in zip(pending, runs):
+                rec = {'sha256': digest, 'questions': count, 'errors': errs, 'ms': ms}
+                results[key] = rec
+                # Missing/unreadable files have no digest and are always re-checked
+                if digest:
+                    new_cache[key] = rec
+    if use_cache:
+        try:
+            save_validation_cache(new_cache)
+        except Exception as e:
+            print('Validation cache write failed:', e, file=sys.stderr)
+    total_q = 0
+    timings = {}
+    for cid, _tid, rel_file in entries:
+        key = f'{cid}/{rel_file}'
+        rec = results[key]
+        total_q += rec['questions']
+        errors.extend(rec['errors'])
+        timings[key] = rec['ms']
+    return {'files': len(entries), 'questions': total_q, 'cached': len(entries) - len(pending),
+            'errors': errors, 'timings': timings}
+
+
+def cmd_validate(args):
+    report = validate_all(jobs=args.jobs, use_cache=not args.no_cache)
+    if args.timings:
+        # Slowest first; cached entries keep the timing of their last real run
+        for key, ms in sorted(report['timings'].items(), key=lambda kv: -kv[1]):
+            print(f'{ms:10.3f} ms  {key}', file=sys.stderr)
+    if args.format == 'json':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    else:
+        for rec in report['errors']:
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        print(f"Validated {report['questions']} questions in {report['files']} topic files "
+              f"({report['cached']} cached): {len(report['errors'])} error(s)", file=sys.stderr)
+    return 1 if report['errors'] else 0
+
+
+def cmd_shard(args):
+    """Convert a topic to sharded storage (or back with --undo) and repoint topics.json."""
+    topics_json = load_topics(args.course)
+    entry = next((t for t in topics_json.get('topics', []) if t.get('id') == args.topic), None)
+    if entry is None:
+        print(f'No topic {args.topic!r} in {args.course}/topics.json', file=sys.stderr)
+        return 1
+    old = entry['file']
+    stem = old[:-len(SHARDED_EXT)] if is_sharded_topic(old) else os.path.splitext(old)[0]
+    new = stem + ('.json' if args.undo else SHARDED_EXT)
+    if is_sharded_topic(old) != bool(args.undo):
+        print(f'{args.course}/{old} is already {"unsharded" if args.undo else "sharded"}')
+        return 0
+    if os.path.exists(topic_path(args.course, new)):
+        print(f'{args.course}/{new} already exists', file=sys.stderr)
+        return 1
+    topic = load_topic_file(args.course, old)
+    if args.undo:
+        save_topic_file(args.course, new, topic)
+        files = [new]
+    else:
+        files = save_sharded_topic(args.course, new, topic, shard_size=args.size)
+    entry['file'] = new
+    save_topics_json(args.course, topics_json)
+    if is_sharded_topic(old):
+        files += remove_sharded_topic(args.course, old)
+    else:
+        os.remove(topic_path(args.course, old))
+        discard_topic_log(args.course, old)
+        files.append(old)
+    refresh_site_artifacts(args.course, [f'data/{args.course}/{f}' for f in files + ['topics.json']])
+    shards = '' if args.undo else f" in {len(load_shard_manifest(args.course, new)['shards'])} shards"
+    print(f"{args.course}/{old} -> {new}: {len(topic.get('questions', []))} questions{shards}")
+    return 0
+
+
+def cmd_compact(args):
+    """Fold patch-save write logs into their topic files (run before publishing)."""
+    done = compact_topic_logs(args.course)
+    for cid, rel_file in done:
+        refresh_site_artifacts(cid, [f'data/{cid}/{rel_file}'])
+        print(f'{cid}/{rel_file}: write log compacted')
+    for cid, _tid, rel_file in collect_topic_entries()[0]:
+        if rel_file and (args.course is None or cid in args.course) \
+                and os.path.exists(stale_topic_log_path(cid, rel_file)):
+            print(f'{cid}/{rel_file}: saved edits for an older version of the file kept aside; '
+                  'open the topic in the editor to merge them', file=sys.stderr)
+    print(f'{len(done)} write log(s) compacted', file=sys.stderr)
+    return 0
+
+
+# ---------- Parsed topic cache ----------
+
+def _copy_topic(data):
+    # Callers may edit the topic dict and its questions list; question dicts are replaced, never mutated
+    return dict(data, questions=list(data.get('questions', [])))
+
+
+def _copy_topics_json(data):
+    return dict(data, topics=[dict(t) for t in data.get('topics', [])])
+
+
+_LoggedStat = namedtuple('_LoggedStat', 'st_mtime_ns st_size')
+
+
+def topic_stat(course_id, rel_file):
+    """os.stat of a topic file, folded with its write log's so that appends are noticed too."""
+    st = os.stat(topic_path(course_id, rel_file))
+    try:
+        log = os.stat(topic_log_path(course_id, rel_file))
+    except OSError:
+        return st
+    return _LoggedStat((st.st_mtime_ns, log.st_mtime_ns), st.st_size + log.st_size)
+
+
+class TopicCache:
+    """Bounded LRU cache of parsed topic files and topics.json, keyed by (course, rel_file).
+    Every lookup stats the file (and its write log) and re-parses only when mtime or size
+    changed, so edits from other tools are picked up. Eviction is by approximate memory footprint: the JSON
+    size times PARSED_OVERHEAD, summed against max_bytes. Thread-safe (used from I/O workers).
+    """
+    # Rough ratio of parsed Python objects to UTF-8 JSON bytes
+    PARSED_OVERHEAD = 6
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (mtime_ns, size, data, cost)
+        self._lock = threading.Lock()
+
+    def _fresh(self, key, st):
+        # Cached data for key if it was parsed from a file with this stat, else None
+        with self._lock:
+            e = self._entries.get(key)
+            if e and e[0] == st.st_mtime_ns and e[1] == st.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return e[2]
+            self.misses += 1
+            return None
+
+    def _get(self, key, stat, loader):
+        try:
+            st = stat()
+        except OSError:
+            return loader()
+        data = self._fresh(key, st)
+        if data is None:
+            data = loader()
+            self._put(key, st, data)
+        return data
+
+    def _put(self, key, st, data):
+        size = st.st_size
+        if is_sharded_topic(key[1]):
+            # The manifest is tiny; charge for the shards it lists
+            try:
+                size = sharded_topic_size(*key)
+            except (OSError, ValueError):
+                pass
+        cost = size * self.PARSED_OVERHEAD
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.used -= old[3]
+            if cost > self.max_bytes:
+                return
+            self._entries[key] = (st.st_mtime_ns, st.st_size, data, cost)
+            self.used += cost
+            while self.used > self.max_bytes:
+                _k, (_m, _s, _d, c) = self._entries.popitem(last=False)
+                self.used -= c
+
+    def load_topic(self, course_id, rel_file):
+        data = self._get((course_id, rel_file), lambda: topic_stat(course_id, rel_file),
+                         lambda: load_topic_file(course_id, rel_file))
+        return _copy_topic(data)
+
+    def iter_topic(self, course_id, rel_file, header):
+        """Streaming load_topic: yields the questions as iter_topic_file parses them (a fresh
+        cached copy is replayed instead) and caches the complete topic at the end."""
+        key = (course_id, rel_file)
+        try:
+            st = topic_stat(course_id, rel_file)
+        except OSError:
+            st = None
+        data = self._fresh(key, st) if st is not None else None
+        if data is not None:
+            header.update((k, None if k == 'questions' else v) for k, v in data.items())
+            yield from list(data.get('questions', []))
+            return
+        questions = []
+        for q in iter_topic_file(course_id, rel_file, header):
+            questions.append(q)
+            yield q
+        if st is not None and 'questions' in header:
+            self._put(key, st, {k: questions if k == 'questions' else v for k, v in header.items()})
+
+    def load_topics(self, course_id):
+        p = os.path.join(DATA_DIR, course_id, 'topics.json')
+        data = self._get((course_id, 'topics.json'), lambda: os.stat(p), lambda: load_topics(course_id))
+        return _copy_topics_json(data)
+
+    def put_topic(self, course_id, rel_file, data):
+        """Remember what was just written so reopening the topic does not parse it again."""
+        try:
+            st = topic_stat(course_id, rel_file)
+        except OSError:
+            return
+        self._put((course_id, rel_file), st, _copy_topic(data))
+
+    def invalidate(self, course_id, rel_file):
+        with self._lock:
+            e = self._entries.pop((course_id, rel_file), None)
+            if e:
+                self.used -= e[3]
+
+
+# ---------- External change watcher ----------
+
+class _Inotify:
+    """Minimal Linux inotify binding via ctypes (non-blocking; no threads, no extra services)."""
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_IGNORED = 0x8000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+    _EVENT = struct.Struct('iIII')
+
+    @classmethod
+    def create(cls):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self.fd = fd
+        self._dirs = {}  # wd -> directory
+
+    def add_dir(self, d):
+        if d in self._dirs.values():
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), self.MASK)
+        if wd >= 0:
+            self._dirs[wd] = d
+
+    def remove_dirs_except(self, keep):
+        """Drop the watches on every directory not in keep."""
+        for wd, d in list(self._dirs.items()):
+            if d not in keep:
+                # Fails harmlessly when the kernel already dropped it (directory deleted)
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def read_paths(self):
+        """Paths touched since the last call (empty when nothing happened)."""
+        out = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return out
+            except OSError:
+                return out
+            i = 0
+            while i + self._EVENT.size <= len(buf):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(buf, i)
+                i += self._EVENT.size
+                name = buf[i:i + length].rstrip(b'\0')
+                i += length
+                if mask & self.IN_IGNORED:
+                    # Watch removed by us or because the directory went away
+                    self._dirs.pop(wd, None)
+                elif wd in self._dirs and name:
+                    out.add(os.path.join(self._dirs[wd], os.fsdecode(name)))
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None when it does not exist."""
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """Reports watched files whose (mtime, size) no longer match the last known state.
+    With inotify only files named in events are stat-ed; otherwise (other platforms,
+    or inotify unavailable) every watched file is stat-ed per poll. Files are never read.
+    """
+
+    def __init__(self, use_inotify=True):
+        self._known = {}  # path -> (mtime_ns, size) or None when missing
+        self._suppressed = set()
+        self._inotify = _Inotify.create() if use_inotify else None
+
+    @property
+    def mode(self):
+        return 'inotify' if self._inotify else 'polling'
+
+    def watch_only(self, paths):
+        paths = [os.path.abspath(p) for p in paths]
+        self._known = {p: self._known.get(p, file_signature(p)) for p in paths}
+        if self._inotify:
+            dirs = {os.path.dirname(p) for p in paths}
+            self._inotify.remove_dirs_except(dirs)
+            for d in sorted(dirs):
+                if os.path.isdir(d):
+                    self._inotify.add_dir(d)
+
+    def suppress(self, path):
+        # Our own write is in flight; don't report it as an external change
+        self._suppressed.add(os.path.abspath(path))
+
+    def acknowledge(self, path):
+        """Accept the file's current state as known (after our own save or a reload)."""
+        path = os.path.abspath(path)
+        self._suppressed.discard(path)
+        if path in self._known:
+            self._known[path] = file_signature(path)
+
+    def poll(self):
+        """Return watched paths that changed since they were last known."""
+        if self._inotify:
+            candidates = self._inotify.read_paths() & set(self._known)
+        else:
+            candidates = set(self._known)
+        changed = []
+        for p in sorted(candidates - self._suppressed):
+            cur = file_signature(p)
+            if cur != self._known.get(p):
+                self._known[p] = cur
+                changed.append(p)
+        return changed
+
+
+def _keyed_questions(questions):
+    # Ids are not guaranteed unique, so the n-th occurrence of an id is its own key
+    seen = {}
+    out = OrderedDict()
+    for q in questions:
+        qid = str(q.get('id'))
+        n = seen.get(qid, 0)
+        seen[qid] = n + 1
+        out[(qid, n)] = q
+    return out
+
+
+def merge_questions(base, mine, theirs):
+    """Three-way, per-question merge keyed by question id.
+    Returns (entries, conflicts): entries is [(key, question or None)] in merged order
+    (theirs' order, then questions only we added), with our side filled in for conflicts;
+    conflicts is {key: (mine, theirs)} for questions both sides changed differently
+    (None on a side means deleted there).
+    """
+    B, M, T = _keyed_questions(base), _keyed_questions(mine), _keyed_questions(theirs)
+    entries = []
+    conflicts = {}
+    for key in list(T) + [k for k in M if k not in T]:
+        b, m, t = B.get(key), M.get(key), T.get(key)
+        if m == t or t == b:
+            result = m
+        elif m == b:
+            result = t
+        else:
+            conflicts[key] = (m, t)
+            result = m
+        entries.append((key, result))
+    return entries, conflicts
+
+
+# ---------- Image thumbnails ----------
+
+def resolve_image_file(course_id, p):
+    """Local file behind an image field value (a freshly picked absolute path or a
+    JSON image path), or None for URLs and missing files."""
+    if not p or re.match(r'^https?://', p):
+        return None
+    if os.path.isabs(p):
+        return p if os.path.isfile(p) else None
+    f = os.path.join(PROJECT_ROOT, *site_image_path(course_id, p).split('/'))
+    return f if os.path.isfile(f) else None
+
+
+class ThumbnailCache:
+    """Downscaled previews of image fields, stored as PNGs under tools/.cache/thumbs/ keyed
+    by the source's content hash, plus a small in-memory LRU of decoded Tk images.
+    A full-size screenshot is decoded once per content, not once per view.
+    prepare() runs on an I/O thread; photo() touches Tk and must run on the Tk thread.
+    """
+
+    def __init__(self, max_photos=64):
+        self.max_photos = max_photos
+        self._digests = {}  # source path -> ((mtime_ns, size), sha256)
+        self._photos = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def thumb_path(digest):
+        w, h = THUMB_MAX
+        return os.path.join(THUMB_DIR, digest[:2], f'{digest}_{w}x{h}.png')
+
+    def digest(self, src):
+        sig = file_signature(src)
+        with self._lock:
+            hit = self._digests.get(src)
+        if hit and hit[0] == sig:
+            return hit[1]
+        digest = file_sha256(src)
+        with self._lock:
+            self._digests[src] = (sig, digest)
+        return digest
+
+    def prepare(self, src):
+        """Hash src and, when Pillow is available, build its thumbnail on disk.
+        Returns (digest, thumbnail path or None if the Tk thread has to decode src itself).
+        """
+        digest = self.digest(src)
+        tp = self.thumb_path(digest)
+        if os.path.isfile(tp) or PILImage is None:
+            return digest, tp if os.path.isfile(tp) else None
+        try:
+            with PILImage.open(src) as im:
+                im.thumbnail(THUMB_MAX)
+                if im.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                    im = im.convert('RGBA')
+                buf = io.BytesIO()
+                im.save(buf, 'PNG')
+        except Exception:
+            return digest, None
+        write_bytes_atomic(tp, buf.getvalue())
+        return digest, tp
+
+    def photo(self, digest, thumb, src):
+        """Tk image for a prepared source, or None when it cannot be decoded."""
+        ph = self._photos.get(digest)
+        if ph is not None:
+            self._photos.move_to_end(digest)
+            return ph
+        try:
+            if thumb:
+                ph = tk.PhotoImage(file=thumb)
+            else:
+                # Tk decodes PNG/GIF natively; subsample and keep the result for next time
+                ph = tk.PhotoImage(file=src)
+                w, h = THUMB_MAX
+                factor = max(1, math.ceil(max(ph.width() / w, ph.height() / h)))
+                if factor > 1:
+                    ph = ph.subsample(factor)
+                tp = self.thumb_path(digest)
+                os.makedirs(os.path.dirname(tp), exist_ok=True)
+                ph.write(tp + '.tmp', format='png')
+                os.replace(tp + '.tmp', tp)
+        except (tk.TclError, OSError):
+            if ph is None:
+                return None
+        self._photos[digest] = ph
+        while len(self._photos) > self.max_photos:
+            self._photos.popitem(last=False)
+        return ph
+
+
+# ---------- Autosave journal ----------
+# Unsaved question edits are appended to tools/.cache/journal/<course>/<topic file>.ndjson,
+# one JSON record per line: a "base" header (topic file hash when editing started), then
+# {"op": "upsert", "index": i, "question": {...}} / {"op": "insert", ...} / {"op": "delete", "index": i}
+# or {"op": "reset", "questions": [...]} after a merge with external changes.
+# Replaying the records on the topic file reproduces the in-memory topic after a crash.
+# Saving the topic compacts the journal away.
+
+def journal_path(course_id, rel_file):
+    return os.path.join(JOURNAL_DIR, course_id, rel_file.replace('/', os.sep) + '.ndjson')
+
+
+def append_journal(course_id, topic_id, rel_file, record):
+    p = journal_path(course_id, rel_file)
+    new = not os.path.exists(p)
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    lines = []
+    if new:
+        tp = topic_path(course_id, rel_file)
+        base = file_sha256(tp) if os.path.isfile(tp) else None
+        lines.append({'op': 'base', 'course': course_id, 'topic': topic_id, 'file': rel_file, 'sha256': base})
+    lines.append(record)
+    with open(p, 'a', encoding='utf-8') as f:
+        for rec in lines:
+            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(course_id, rel_file):
+    """Return (header, [records]) including a journal set aside by an interrupted save."""
+    header, records = None, []
+    p = journal_path(course_id, rel_file)
+    for part in (p + '.saving', p):
+        try:
+            with open(part, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break  # torn last line after a crash
+                    if rec.get('op') == 'base':
+                        header = header or rec
+                    else:
+                        records.append(rec)
+        except OSError:
+            pass
+    return header, records
+
+
+def journal_base_changed(course_id, rel_file, header):
+    """True unless header (from read_journal) names the topic file as it is now. A journal
+    without a header (torn first line) has no known base and counts as changed."""
+    if not header:
+        return True
+    tp = topic_path(course_id, rel_file)
+    return (file_sha256(tp) if os.path.isfile(tp) else None) != header.get('sha256')
+
+
+def replay_journal(topic, records):
+    questions = topic.setdefault('questions', [])
+    for rec in records:
+        i = rec.get('index')
+        if rec.get('op') == 'upsert':
+            if isinstance(i, int) and 0 <= i < len(questions):
+                questions[i] = rec['question']
+            else:
+                questions.append(rec['question'])
+        elif rec.get('op') == 'reset':
+            questions[:] = rec['questions']
+        elif rec.get('op') == 'insert' and isinstance(i, int):
+            questions.insert(max(0, min(i, len(questions))), rec['question'])
+        elif rec.get('op') == 'delete' and isinstance(i, int) and 0 <= i < len(questions):
+            del questions[i]
+    return topic
+
+
+def set_journal_aside(course_id, rel_file):
+    # Called when a save starts: edits made during the write go to a fresh journal
+    p = journal_path(course_id, rel_file)
+    if os.path.exists(p):
+        os.replace(p, p + '.saving')
+
+
+def discard_journal(course_id, rel_file, aside_only=False):
+    p = journal_path(course_id, rel_file)
+    for part in ((p + '.saving',) if aside_only else (p + '.saving', p)):
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+
+
+def list_journals():
+    """Return [(course_id, rel_file)] of topics with unsaved journaled edits."""
+    out = []
+    for dirpath, _dirnames, filenames in os.walk(JOURNAL_DIR):
+        for fn in sorted(filenames):
+            if not fn.endswith(('.ndjson', '.ndjson.saving')):
+                continue
+            rel = os.path.relpath(os.path.join(dirpath, fn), JOURNAL_DIR).replace(os.sep, '/')
+            course_id, _, rel_file = rel.partition('/')
+            rel_file = rel_file[:-len('.saving')] if rel_file.endswith('.saving') else rel_file
+            key = (course_id, rel_file[:-len('.ndjson')])
+            if key not in out:
+                out.append(key)
+    return out
+
+
+# ---------- Undo/redo history ----------
+
+class PersistentVector:
+    """Immutable list stored as a tuple of small chunks (tuples).
+    set/insert/delete return a new vector that shares every untouched chunk with the
+    old one, so keeping many versions costs O(changed chunk + chunk count) each
+    instead of a full copy. Items themselves are shared, never copied.
+    """
+    CHUNK = 32
+
+    __slots__ = ('_chunks', '_len')
+
+    def __init__(self, chunks=(), length=0):
+        self._chunks = chunks
+        self._len = length
+
+    @classmethod
+    def from_list(cls, items):
+        items = list(items)
+        chunks = tuple(tuple(items[i:i + cls.CHUNK]) for i in range(0, len(items), cls.CHUNK))
+        return cls(chunks, len(items))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def to_list(self):
+        return [x for chunk in self._chunks for x in chunk]
+
+    def _locate(self, i):
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        for k, chunk in enumerate(self._chunks):
+            if i < len(chunk):
+                return k, i
+            i -= len(chunk)
+        raise IndexError(i)
+
+    def __getitem__(self, i):
+        k, j = self._locate(i)
+        return self._chunks[k][j]
+
+    def _replace_chunk(self, k, new_chunks, delta):
+        return PersistentVector(self._chunks[:k] + tuple(c for c in new_chunks if c) + self._chunks[k + 1:],
+                                self._len + delta)
+
+    def set(self, i, x):
+        k, j = self._locate(i)
+        c = self._chunks[k]
+        return self._replace_chunk(k, (c[:j] + (x,) + c[j + 1:],), 0)
+
+    def insert(self, i, x):
+        if i >= self._len:
+            if self._chunks and len(self._chunks[-1]) < self.CHUNK:
+                return self._replace_chunk(len(self._chunks) - 1, (self._chunks[-1] + (x,),), 1)
+            return PersistentVector(self._chunks + ((x,),), self._len + 1)
+        k, j = self._locate(i)
+        c = self._chunks[k]
+        c = c[:j] + (x,) + c[j:]
+        # Split oversized chunks so edits stay cheap
+        parts = (c[:len(c) // 2], c[len(c) // 2:]) if len(c) > 2 * self.CHUNK else (c,)
+        return self._replace_chunk(k, parts, 1)
+
+    def delete(self, i):
+        k, j = self._locate(i)
+        c = self._chunks[k]
+        return self._replace_chunk(k, (c[:j] + c[j + 1:],), -1)
+
+
+class EditHistory:
+    """Undo/redo over PersistentVector snapshots of a topic's questions.
+    Ops: ('set', i, old, new) / ('insert', i, q) / ('delete', i, q).
+    """
+
+    def __init__(self, limit=500):
+        self.limit = limit
+        self.current = PersistentVector()
+        self._undo = []  # (vector before op, op)
+        self._redo = []  # (vector after op, op)
+
+    def reset(self, items):
+        self.current = PersistentVector.from_list(items)
+        self._undo.clear()
+        self._redo.clear()
+
+    @staticmethod
+    def _apply(vec, op):
+        if op[0] == 'set':
+            return vec.set(op[1], op[3])
+        if op[0] == 'insert':
+            return vec.insert(op[1], op[2])
+        return vec.delete(op[1])
+
+    @staticmethod
+    def apply_to_list(items, op):
+        """Apply op to a plain list in place, as undo()/redo() did to the vector."""
+        if op[0] == 'set':
+            items[op[1]] = op[3]
+        elif op[0] == 'insert':
+            items.insert(op[1], op[2])
+        else:
+            del items[op[1]]
+
+    @staticmethod
+    def inverse(op):
+        if op[0] == 'set':
+            return ('set', op[1], op[3], op[2])
+        if op[0] == 'insert':
+            return ('delete', op[1], op[2])
+        return ('insert', op[1], op[2])
+
+    def record(self, op):
+        self._undo.append((self.current, op))
+        if len(self._undo) > self.limit:
+            del self._undo[0]
+        self._redo.clear()
+        self.current = self._apply(self.current, op)
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        """Return (restored vector, op that turns the old state into it) or None."""
+        if not self._undo:
+            return None
+        before, op = self._undo.pop()
+        self._redo.append((self.current, op))
+        self.current = before
+        return before, self.inverse(op)
+
+    def redo(self):
+        if not self._redo:
+            return None
+        after, op = self._redo.pop()
+        self._undo.append((self.current, op))
+        self.current = after
+        return after, op
+
+
+# ---------- Cross-course question index ----------
+
+QuestionLocation = namedtuple('QuestionLocation', 'course topic file index')
+
+
+class QuestionIndex:
+    """In-memory index over every question of every course.
+    Maps question id, type and referenced images to QuestionLocation(course, topic, file, index).
+    Built lazily on first lookup (the editor builds it on the I/O pool instead);
+    update_topic() re-indexes a single topic after a save.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.by_id = {}
+        self.by_type = {}
+        self.by_image = {}
+        # Sorted (lowercased id, id) of every key in by_id, for prefix lookups by bisection
+        self._sorted_ids = []
+        # (course, file) -> (topic_id, [(id, type, [images])]) so one topic can be dropped cheaply
+        self._topics = {}
+
+    def ensure_built(self):
+        if self.built:
+            return
+        entries, _errors = collect_topic_entries()
+        for cid, tid, rel_file in entries:
+            if not rel_file:
+                continue
+            try:
+                topic = load_topic_file(cid, rel_file)
+            except Exception:
+                continue
+            self.update_topic(cid, tid, rel_file, topic)
+        self.built = True
+
+    def update_topic(self, course_id, topic_id, rel_file, topic_data):
+        self.remove_topic(course_id, rel_file)
+        rows = []
+        for i, q in enumerate(topic_data.get('questions', []) if isinstance(topic_data, dict) else []):
+            if not isinstance(q, dict):
+                continue
+            loc = QuestionLocation(course_id, topic_id, rel_file, i)
+            qid, qtype = str(q.get('id') or ''), q.get('type') or ''
+            images = [site_image_path(course_id, q[k]) for k in ('image', 'explanation_image') if q.get(k)]
+            if qid not in self.by_id:
+                insort(self._sorted_ids, (qid.lower(), qid))
+            self.by_id.setdefault(qid, []).append(loc)
+            self.by_type.setdefault(qtype, []).append(loc)
+            for img in images:
+                self.by_image.setdefault(img, []).append(loc)
+            rows.append((qid, qtype, images))
+        self._topics[(course_id, rel_file)] = (topic_id, rows)
+
+    def remove_topic(self, course_id, rel_file):
+        old = self._topics.pop((course_id, rel_file), None)
+        if not old:
+            return
+        def drop(table, key):
+            locs = [l for l in table.get(key, []) if (l.course, l.file) != (course_id, rel_file)]
+            if locs:
+                table[key] = locs
+            else:
+                return table.pop(key, None) is not None
+        for qid, qtype, images in old[1]:
+            if drop(self.by_id, qid):
+                del self._sorted_ids[bisect_left(self._sorted_ids, (qid.lower(), qid))]
+            drop(self.by_type, qtype)
+            for img in images:
+                drop(self.by_image, img)
+
+    def find_id(self, qid):
+        self.ensure_built()
+        return list(self.by_id.get(qid, []))
+
+    def find_id_prefix(self, prefix, limit=200):
+        """Locations whose id starts with prefix (case-insensitive), sorted by id ignoring case."""
+        self.ensure_built()
+        prefix = prefix.lower()
+        out = []
+        i = bisect_left(self._sorted_ids, (prefix,))
+        while i < len(self._sorted_ids) and len(out) < limit:
+            folded, qid = self._sorted_ids[i]
+            if not folded.startswith(prefix):
+                break
+            out.extend((qid, loc) for loc in self.by_id[qid])
+            i += 1
+        return out[:limit]
+
+    def of_type(self, qtype):
+        self.ensure_built()
+        return list(self.by_type.get(qtype, []))
+
+    def referencing_image(self, path):
+        """Locations referencing an image, by site path ("images/os/processes/1.png")."""
+        self.ensure_built()
+        return list(self.by_image.get(path, []))
+
+
+# ---------- Full-text search ----------
+
+_TOKEN_RE = re.compile(r'\w+')
+# Relative weight of a match per field; ids and question text rank above explanations
+SEARCH_FIELD_WEIGHTS = {'id': 3.0, 'question': 2.0, 'options': 1.5, 'answers': 1.5, 'explanation': 1.0}
+
+
+def fold_text(text):
+    """Case- and diacritic-insensitive form used for searching ("Stránkovanie" -> "strankovanie")."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+def question_search_fields(q):
+    """Searchable text of a question per field (see SEARCH_FIELD_WEIGHTS)."""
+    options = list(q.get('options') or [])
+    for it in q.get('items') or []:
+        options.append(it.get('text', '') if isinstance(it, dict) else it)
+    for side in ('leftNodes', 'rightNodes'):
+        for n in q.get(side) or []:
+            options.append(n.get('label', '') if isinstance(n, dict) else n)
+    answers = list(q.get('answers') or [])
+    for row in ((q.get('table') or {}).get('answers') or []):
+        answers.extend(row if isinstance(row, list) else [row])
+    return {
+        'id': str(q.get('id') or ''),
+        'question': str(q.get('question') or ''),
+        'options': ' '.join(str(o) for o in options),
+        'answers': ' '.join(str(a) for a in answers),
+        'explanation': str(q.get('explanation') or ''),
+    }
+
+
+class SearchIndex:
+    """Inverted index over question text, options, answers and explanations.
+    Keys are caller-defined (list positions in the editor, QuestionLocation elsewhere).
+    Every query term must match; the last term also matches as a prefix so results
+    update while typing. Scores weight fields (SEARCH_FIELD_WEIGHTS) and rare terms (idf).
+    snapshot() gives an immutable view for searching on another thread.
+    """
+
+    def __init__(self):
+        self.postings = {}  # token -> {key: weight}
+        self._doc_tokens = {}  # key -> set of tokens, for removal
+        self._vocab = []
+        self._vocab_dirty = False
+        # Copy on write: after snapshot() the tables are shared with the view until the next
+        # change copies them; each shared bucket is copied the first time it changes.
+        # _own_buckets is None when no bucket is shared
+        self._shared = False
+        self._own_buckets = None
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def snapshot(self):
+        """Read-only view of the index as it is now. Searching it is safe from another
+        thread while this index keeps changing: shared tables are copied before a change."""
+        self._sorted_vocab()
+        view = SearchIndex()
+        view.postings, view._doc_tokens, view._vocab = self.postings, self._doc_tokens, self._vocab
+        view._shared = self._shared = True
+        return view
+
+    def _unshare(self):
+        if self._shared:
+            self.postings = dict(self.postings)
+            self._doc_tokens = dict(self._doc_tokens)
+            self._own_buckets = set()
+            self._shared = False
+
+    def _bucket(self, tok):
+        # Writable posting list of tok (created when missing)
+        bucket = self.postings.get(tok)
+        if bucket is None:
+            bucket = self.postings[tok] = {}
+            self._vocab_dirty = True
+        elif self._own_buckets is None or tok in self._own_buckets:
+            return bucket
+        else:
+            bucket = self.postings[tok] = dict(bucket)
+        if self._own_buckets is not None:
+            self._own_buckets.add(tok)
+        return bucket
+
+    def add(self, key, q):
+        self.remove(key)
+        weights = {}
+        for field, text in question_search_fields(q).items():
+            w = SEARCH_FIELD_WEIGHTS[field]
+            for tok in tokenize(text):
+                weights[tok] = weights.get(tok, 0.0) + w
+        for tok, w in weights.items():
+            self._bucket(tok)[key] = w
+        self._doc_tokens[key] = set(weights)
+
+    def remove(self, key):
+        self._unshare()
+        for tok in self._doc_tokens.pop(key, ()):
+            if tok not in self.postings:
+                continue
+            bucket = self._bucket(tok)
+            bucket.pop(key, None)
+            if not bucket:
+                del self.postings[tok]
+                self._vocab_dirty = True
+
+    def rebuild(self, keyed_questions):
+        # Fresh tables: a snapshot may still be reading the old ones
+        self.postings, self._doc_tokens = {}, {}
+        self._shared, self._own_buckets = False, None
+        for key, q in keyed_questions:
+            self.add(key, q)
+        self._vocab_dirty = True
+
+    def _sorted_vocab(self):
+        if self._vocab_dirty:
+            self._vocab = sorted(self.postings)
+            self._vocab_dirty = False
+        return self._vocab
+
+    def _prefix_tokens(self, prefix):
+        vocab = self._sorted_vocab()
+        i = bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            yield vocab[i]
+            i += 1
+
+    def _term_scores(self, tokens):
+        n = len(self._doc_tokens) or 1
+        scores = {}
+        for tok in tokens:
+            bucket = self.postings.get(tok, {})
+            idf = 1.0 + math.log(n / (1 + len(bucket)) + 1)
+            for key, w in bucket.items():
+                sc = w * idf
+                if sc > scores.get(key, 0.0):
+                    scores[key] = sc
+        return scores
+
+    def search(self, query, limit=50):
+        """Return [(score, key)] best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        total = None
+        for i, term in enumerate(terms):
+            last = i == len(terms) - 1
+            # Exact matches outrank prefix completions of the term being typed
+            tokens = list(self._prefix_tokens(term)) if last else [term]
+            scores = self._term_scores(tokens)
+            if last and term in self.postings:
+                for key in self.postings[term]:
+                    scores[key] *= 1.5
+            if total is None:
+                total = scores
+            else:
+                total = {k: v + scores[k] for k, v in total.items() if k in scores}
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda kv: -kv[1])[:limit]
+        return [(score, key) for key, score in ranked]
+
+
 # ---------- Helpers for connect_nodes ----------
 
 def _normalize_connect_nodes(q):
@@ -227,9 +2099,187 @@ def _normalize_connect_nodes(q):
 
 # ---------- GUI ----------
 
+class StartupProfile:
+    """Wall-clock phases of GUI startup, printed by --profile-startup."""
+
+    def __init__(self, t0):
+        self._t0 = self._last = t0
+        self.phases = []
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.phases.append((label, now - self._last))
+        self._last = now
+
+    def report(self, file=sys.stderr):
+        for label, dt in self.phases:
+            print(f'{label:<20}{dt * 1000:9.1f} ms', file=file)
+        print(f'{"total":<20}{(self._last - self._t0) * 1000:9.1f} ms', file=file)
+
+
+class VirtualList:
+    """Listbox look-alike that only materializes the visible rows.
+    Rows are produced on demand by row_text(i) and cached; update_row()/remove_row()
+    touch single rows instead of rebuilding the list. Supports the subset of the
+    tk.Listbox API the editor uses (curselection, selection_set/clear, see, size, bind);
+    place it with grid() like a widget.
+    """
+
+    def __init__(self, master, row_text, **kw):
+        self.frame = ttk.Frame(master, **kw)
+        self.row_text = row_text
+        self.count = 0
+        self.top = 0
+        self.visible = 1
+        self._selected = None
+        self._cache = {}
+        self.listbox = tk.Listbox(self.frame, activestyle='none', exportselection=False)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self._on_scrollbar)
+        self.listbox.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+        self.listbox.bind('<Configure>', self._on_configure)
+        self.listbox.bind('<<ListboxSelect>>', self._on_inner_select)
+        for seq, delta in (('<Up>', -1), ('<Down>', 1)):
+            self.listbox.bind(seq, lambda e, d=delta: self._move(d))
+        self.listbox.bind('<Prior>', lambda e: self._move(-self.visible))
+        self.listbox.bind('<Next>', lambda e: self._move(self.visible))
+        self.listbox.bind('<Home>', lambda e: self._move(-self.count))
+        self.listbox.bind('<End>', lambda e: self._move(self.count))
+        self.listbox.bind('<MouseWheel>', lambda e: self._scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.listbox.bind('<Button-4>', lambda e: self._scroll(-1, 'units'))
+        self.listbox.bind('<Button-5>', lambda e: self._scroll(1, 'units'))
+
+    def grid(self, **kw):
+        self.frame.grid(**kw)
+
+    # --- data ---
+    def set_count(self, n, keep_cache=False):
+        """Set the total row count; keep_cache=True when rows were only appended."""
+        self.count = n
+        if not keep_cache:
+            self._cache.clear()
+            self._selected = None
+        elif self._selected is not None and self._selected >= n:
+            self._selected = None
+        self.top = max(0, min(self.top, n - self.visible))
+        self._render()
+
+    def update_row(self, i):
+        self._cache.pop(i, None)
+        if self.top <= i < self.top + self.visible:
+            self._render()
+
+    def remove_row(self, i):
+        # Rows after i shift up, so only their cached text is stale
+        for k in [k for k in self._cache if k >= i]:
+            del self._cache[k]
+        if self._selected is not None and self._selected >= i:
+            self._selected = None if self._selected == i else self._selected - 1
+        self.set_count(self.count - 1, keep_cache=True)
+
+    def insert_row(self, i):
+        for k in [k for k in self._cache if k >= i]:
+            del self._cache[k]
+        if self._selected is not None and self._selected >= i:
+            self._selected += 1
+        self.set_count(self.count + 1, keep_cache=True)
+
+    def _text(self, i):
+        txt = self._cache.get(i)
+        if txt is None:
+            txt = self._cache[i] = self.row_text(i)
+        return txt
+
+    # --- Listbox-compatible API ---
+    def size(self):
+        return self.count
+
+    def curselection(self):
+        return () if self._selected is None else (self._selected,)
+
+    def selection_clear(self, first=0, last=None):
+        self._selected = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def selection_set(self, i):
+        if 0 <= i < self.count:
+            self._selected = i
+            self._render()
+
+    def see(self, i):
+        if i < self.top:
+            self.top = i
+        elif i >= self.top + self.visible:
+            self.top = i - self.visible + 1
+        self.top = max(0, min(self.top, self.count - self.visible))
+        self._render()
+
+    def get(self, i):
+        return self._text(i)
+
+    def bind(self, sequence=None, func=None, add=None):
+        # Bind on the inner listbox after our own handlers, so callers see translated selection
+        return self.listbox.bind(sequence, func, add='+')
+
+    def focus_set(self):
+        self.listbox.focus_set()
+
+    # --- rendering ---
+    def _render(self):
+        lb = self.listbox
+        lb.delete(0, tk.END)
+        end = min(self.count, self.top + self.visible)
+        if end > self.top:
+            lb.insert(tk.END, *(self._text(i) for i in range(self.top, end)))
+        if self._selected is not None and self.top <= self._selected < end:
+            lb.selection_set(self._selected - self.top)
+        if self.count:
+            self.scrollbar.set(self.top / self.count, end / self.count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_configure(self, event):
+        line = tkfont.Font(font=self.listbox.cget('font')).metrics('linespace') + 1
+        visible = max(1, (event.height - 4) // line)
+        if visible != self.visible:
+            self.visible = visible
+            self.top = max(0, min(self.top, self.count - self.visible))
+            self._render()
+
+    def _on_inner_select(self, _event):
+        sel = self.listbox.curselection()
+        if sel:
+            self._selected = self.top + sel[0]
+
+    def _move(self, delta):
+        if not self.count:
+            return 'break'
+        cur = self._selected if self._selected is not None else (self.top - 1 if delta > 0 else self.top)
+        self._selected = max(0, min(self.count - 1, cur + delta))
+        self.see(self._selected)
+        self.listbox.event_generate('<<ListboxSelect>>')
+        return 'break'
+
+    def _scroll(self, n, what):
+        step = n * (self.visible if what == 'pages' else 1)
+        self.top = max(0, min(self.top + step, self.count - self.visible))
+        self._render()
+        return 'break'
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.top = max(0, min(int(float(args[1]) * self.count), self.count - self.visible))
+            self._render()
+        elif args[0] == 'scroll':
+            self._scroll(int(args[1]), args[2])
+
+
 class EditorApp:
-    def __init__(self, root):
+    def __init__(self, root, profile=None):
         self.root = root
+        self.profile = profile
         root.title('Mastery Quiz Editor')
         root.geometry('1100x650')
 
@@ -240,15 +2290,50 @@ class EditorApp:
         self._prefs_path = os.path.join(PROJECT_ROOT, 'tools', 'editor_prefs.json')
         self.prefs = self._load_prefs()
 
-        self.courses = load_courses()
+        # Filled in the background once the window is up (see _load_startup_data)
+        self.courses = []
         self.current_course = None
+        # topics.json of the course shown in the Course/Topic pickers, and of every course seen
         self.topics_json = None
+        self._topics_course = None
+        self._course_topics = {}
         self.current_topic_relfile = None
         self.current_topic = {"topic_id": "", "topic_name": "", "questions": []}
         self.selected_question_index = None
+        # Images copied since the last topic save; their manifest entries are refreshed on save
+        self._pending_asset_paths = set()
+        self.question_index = QuestionIndex()
+        # Set while the index is built on the I/O pool (see _build_question_index): callbacks
+        # waiting for it and topics saved meanwhile
+        self._question_index_waiters = None
+        self._question_index_saved = []
+        # Background I/O (see run_io)
+        self._io_reader = ThreadPoolExecutor(max_workers=2, thread_name_prefix='editor-read')
+        self._io_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='editor-write')
+        self._io_results = queue.Queue()
+        self._io_gen = {}
+        self._io_pending = 0
+        self._io_polling = False
+        self._io_busy_shown = False
+        # Full-text index of the current topic, keyed by position in current_topic['questions']
+        self.search_index = SearchIndex()
+        self.history = EditHistory()
+        self.topic_cache = TopicCache()
+        # External edits (git pull, another editor): the open topic's on-disk questions and
+        # signature as last loaded/saved, used as the merge base
+        self.watcher = FileWatcher()
+        self.thumbnails = ThumbnailCache()
+        self._thumb_after = {}
+        # Open topics (see "Tabs"): notebook tab id -> {'key', 'topic_id', 'frame', 'state', ...}
+        self._tabs = {}
+        self._active_tab = None
+        self._base_questions = []
+        self._base_sig = None
 
         self.build_ui()
-        self.populate_courses()
+        self._mark('build UI')
+        self.root.after_idle(self._load_startup_data)
+        self.root.after(self.WATCH_INTERVAL_MS, self._poll_watcher)
 
         # Apply stored geometry and pane position
         try:
@@ -270,6 +2355,13 @@ class EditorApp:
         self.root.bind('<Control-f>', lambda e: (self.search_entry.focus_set(), 'break'))
         self.root.bind('<Control-F>', lambda e: (self.search_entry.focus_set(), 'break'))
         self.root.bind('<Control-Return>', lambda e: self.save_question())
+        self.root.bind('<Control-z>', lambda e: self._history_key(self.undo))
+        self.root.bind('<Control-y>', lambda e: self._history_key(self.redo))
+        self.root.bind('<Control-Z>', lambda e: self._history_key(self.redo))
+        self.root.bind('<Control-w>', lambda e: self.close_tab())
+        self.root.bind('<Control-W>', lambda e: self.close_tab())
+        self.root.bind('<Control-g>', lambda e: (self.goto_question_dialog(), 'break'))
+        self.root.bind('<Control-G>', lambda e: (self.goto_question_dialog(), 'break'))
         self.q_list.bind('<Delete>', lambda e: self.delete_question())
 
         # Close handler to persist settings
@@ -290,13 +2382,30 @@ class EditorApp:
         ttk.Button(tb, text='💾 Save Topic', command=self.save_topic_file).grid(row=0, column=1, padx=6)
         ttk.Button(tb, text='🧪 Validate', command=self.preview_question).grid(row=0, column=2, padx=6)
         ttk.Button(tb, text='👁️ Preview', command=self.preview_question).grid(row=0, column=3, padx=6)
+        ttk.Button(tb, text='🔎 Go to…', command=self.goto_question_dialog).grid(row=0, column=5, padx=6)
+        ttk.Button(tb, text='💾 Save All', command=self.save_all_topics).grid(row=0, column=6, padx=6)
         # spacer
+        self.cas_images_var = tk.BooleanVar(value=bool(self.prefs.get('content_addressed_images')))
+        ttk.Checkbutton(tb, text='Dedupe images', variable=self.cas_images_var,
+                        command=self._on_cas_toggle).grid(row=0, column=4, padx=6)
+        self.patch_saves_var = tk.BooleanVar(value=bool(self.prefs.get('patch_saves')))
+        ttk.Checkbutton(tb, text='Patch saves', variable=self.patch_saves_var,
+                        command=self._on_patch_saves_toggle).grid(row=0, column=7, padx=6)
         ttk.Label(tb, text='').grid(row=0, column=10, sticky='ew')
         self.search_var = tk.StringVar()
-        self.search_var.trace_add('write', lambda *args: self._search_in_list())
+        self.search_var.trace_add('write', lambda *args: self._schedule_search(jump=True))
         ttk.Label(tb, text='Search').grid(row=0, column=11, padx=(6,4))
         self.search_entry = ttk.Entry(tb, textvariable=self.search_var, width=28)
         self.search_entry.grid(row=0, column=12)
+        self.search_entry.bind('<Down>', lambda e: self._focus_search_results())
+        self.search_entry.bind('<Return>', lambda e: self._open_search_result(0))
+        self.search_entry.bind('<Escape>', lambda e: self.search_var.set(''))
+        # One tab per open topic; tabs have no content of their own, the panes show the active one
+        self.tab_bar = ttk.Notebook(tb)
+        self.tab_bar.grid(row=1, column=0, columnspan=13, sticky='ew', pady=(4,0))
+        self.tab_bar.enable_traversal()
+        self.tab_bar.bind('<<NotebookTabChanged>>', lambda e: self._on_tab_changed())
+        self.tab_bar.bind('<Button-2>', self._on_tab_middle_click)
 
         # Paned window with left (nav) and right (form)
         self.panes = ttk.Panedwindow(self.root, orient='horizontal')
@@ -320,16 +2429,35 @@ class EditorApp:
         btns.grid(row=4, column=0, pady=4, sticky='ew')
         ttk.Button(btns, text='Add', command=self.add_question).pack(side='left')
         ttk.Button(btns, text='Delete', command=self.delete_question).pack(side='left', padx=6)
+        ttk.Button(btns, text='↶', width=3, command=self.undo).pack(side='left')
+        ttk.Button(btns, text='↷', width=3, command=self.redo).pack(side='left', padx=(4,0))
+        ttk.Button(btns, text='Copy to…', command=lambda: self.transfer_question_dialog()).pack(side='left', padx=(6,0))
+        ttk.Button(btns, text='Move to…', command=lambda: self.transfer_question_dialog(move=True)).pack(side='left', padx=(4,0))
 
         ttk.Separator(left).grid(row=5, column=0, sticky='ew', pady=8)
 
         ttk.Label(left, text='Questions').grid(row=6, column=0, sticky='w')
-        self.q_list = tk.Listbox(left, height=25)
-        self._style_listbox(self.q_list)
+        self.q_list = VirtualList(left, self._question_row_text)
+        self._style_listbox(self.q_list.listbox)
         self.q_list.grid(row=7, column=0, sticky='nsew')
         left.rowconfigure(7, weight=1)
         self.q_list.bind('<<ListboxSelect>>', lambda e: self.on_select_question())
 
+        # Ranked search results (hidden while the search box is empty)
+        self.results_frame = ttk.Frame(left)
+        self.results_frame.columnconfigure(0, weight=1)
+        self.results_lbl = ttk.Label(self.results_frame, text='Search results')
+        self.results_lbl.grid(row=0, column=0, sticky='w', pady=(8,0))
+        self.results_list = tk.Listbox(self.results_frame, height=10, exportselection=False)
+        self._style_listbox(self.results_list)
+        self.results_list.grid(row=1, column=0, sticky='nsew')
+        self.results_list.bind('<Return>', lambda e: self._open_search_result())
+        self.results_list.bind('<Double-Button-1>', lambda e: self._open_search_result())
+        self.results_list.bind('<Escape>', lambda e: (self.search_var.set(''), self.search_entry.focus_set()))
+        self._search_hits = []
+        self._search_after_id = None
+        self._search_jump = False
+
         # Right panel (form)
         right = ttk.Frame(self.panes, padding=8)
         right.columnconfigure(1, weight=1)
@@ -366,6 +2494,9 @@ class EditorApp:
         self.image_var = tk.StringVar()
         ttk.Entry(img_row, textvariable=self.image_var).grid(row=0, column=0, sticky='ew')
         ttk.Button(img_row, text='Select…', command=self.select_image).grid(row=0, column=1, padx=4)
+        self.image_thumb = ttk.Label(img_row)
+        self.image_thumb.grid(row=1, column=0, columnspan=2, sticky='w')
+        self.image_var.trace_add('write', lambda *_: self._schedule_thumbnail('image'))
         r += 1
 
         ttk.Label(right, text='Explanation Image').grid(row=r, column=0, sticky='e')
@@ -375,9 +2506,14 @@ class EditorApp:
         self.expl_image_var = tk.StringVar()
         ttk.Entry(expl_img_row, textvariable=self.expl_image_var).grid(row=0, column=0, sticky='ew')
         ttk.Button(expl_img_row, text='Select…', command=self.select_expl_image).grid(row=0, column=1, padx=4)
+        self.expl_image_thumb = ttk.Label(expl_img_row)
+        self.expl_image_thumb.grid(row=1, column=0, columnspan=2, sticky='w')
+        self.expl_image_var.trace_add('write', lambda *_: self._schedule_thumbnail('expl_image'))
         r += 1
 
         self.dynamic_frame = ttk.Frame(right)
+        self._type_forms = {}
+        self._shown_form = None
         self.dynamic_frame.grid(row=r, column=0, columnspan=2, sticky='nsew', pady=4)
         right.rowconfigure(r, weight=1)
         r += 1
@@ -400,8 +2536,14 @@ class EditorApp:
         self.status_var = tk.StringVar(value='Ready')
         self.status_lbl = ttk.Label(sb, textvariable=self.status_var)
         self.status_lbl.pack(side='left')
+        # Shown only while background I/O is pending
+        self.io_progress = ttk.Progressbar(sb, mode='indeterminate', length=80)
 
     def _on_close(self):
+        if any(tab.get('pending_images') for tab in self._tabs.values()):
+            # The questions waiting for them are not in any topic or journal yet
+            self.set_status('Images are still being copied; close the editor once they are done')
+            return
         # Save geometry and pane position
         try:
             self.prefs['geometry'] = self.root.winfo_geometry()
@@ -412,8 +2554,19 @@ class EditorApp:
             self._save_prefs()
         except Exception:
             pass
+        # Let queued saves finish; reads still running are simply discarded
+        self._io_reader.shutdown(wait=False, cancel_futures=True)
+        self._io_writer.shutdown(wait=True)
         self.root.destroy()
 
+    def _on_cas_toggle(self):
+        self.prefs['content_addressed_images'] = bool(self.cas_images_var.get())
+        self._save_prefs()
+
+    def _on_patch_saves_toggle(self):
+        self.prefs['patch_saves'] = bool(self.patch_saves_var.get())
+        self._save_prefs()
+
     def _load_prefs(self):
         try:
             with open(self._prefs_path, 'r', encoding='utf-8') as f:
@@ -435,22 +2588,80 @@ class EditorApp:
         except Exception:
             pass
 
+    # ---------- Search ----------
+    # Typing is debounced; the query runs on the I/O reader thread against the topic's
+    # SearchIndex and the ranked hits are shown in the results panel under the list.
+    SEARCH_DEBOUNCE_MS = 150
+
+    def _schedule_search(self, jump=False):
+        # jump: also move the question list to the best hit (typing, not re-runs after edits)
+        self._search_jump = jump or self._search_jump
+        # Results of a search still running describe the index before this change
+        self.cancel_io('search')
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self._search_in_list)
+
     def _search_in_list(self):
-        # Simple search: select first matching item in the questions listbox
-        try:
-            needle = (self.search_var.get() or '').strip().lower()
-            if not needle:
-                return
-            n = self.q_list.size()
-            for i in range(n):
-                item = self.q_list.get(i)
-                if needle in str(item).lower():
-                    self.q_list.selection_clear(0, tk.END)
-                    self.q_list.selection_set(i)
-                    self.q_list.see(i)
-                    break
-        except Exception:
-            pass
+        self._search_after_id = None
+        jump, self._search_jump = self._search_jump, False
+        needle = (self.search_var.get() or '').strip()
+        if not needle:
+            self.cancel_io('search')
+            self._show_search_results([])
+            return
+        # The worker searches an immutable snapshot while edits keep updating search_index;
+        # an edit schedules a new search, and _drain_io drops the older result
+        index = self.search_index.snapshot()
+        topic = self.current_topic
+
+        def done(hits):
+            if topic is self.current_topic:
+                self._show_search_results(hits, jump)
+
+        self.run_io('search', lambda: index.search(needle, limit=100), on_done=done)
+
+    def _show_search_results(self, hits, jump=False):
+        # Drop hits past the end of the list (index not yet rebuilt after a delete)
+        qs = self.current_topic.get('questions', [])
+        hits = [(score, i) for score, i in hits if i < len(qs)]
+        self._search_hits = [i for _score, i in hits]
+        self.results_list.delete(0, tk.END)
+        if not (self.search_var.get() or '').strip():
+            self.results_frame.grid_remove()
+            return
+        for score, i in hits:
+            self.results_list.insert(tk.END, f"{score:5.1f}  {self._question_row_text(i)}")
+        self.results_lbl.configure(text=f'Search results ({len(self._search_hits)})')
+        self.results_frame.grid(row=8, column=0, sticky='nsew')
+        if self._search_hits:
+            self.results_list.selection_set(0)
+        if self._search_hits and jump:
+            # Keep the previous behavior of jumping to the best match in the question list
+            self.q_list.selection_clear(0, tk.END)
+            self.q_list.selection_set(self._search_hits[0])
+            self.q_list.see(self._search_hits[0])
+
+    def _focus_search_results(self):
+        if self._search_hits:
+            self.results_list.focus_set()
+            self.results_list.selection_clear(0, tk.END)
+            self.results_list.selection_set(0)
+            self.results_list.activate(0)
+        return 'break'
+
+    def _open_search_result(self, pos=None):
+        if pos is None:
+            sel = self.results_list.curselection()
+            pos = sel[0] if sel else 0
+        if not (0 <= pos < len(self._search_hits)):
+            return 'break'
+        i = self._search_hits[pos]
+        self.q_list.selection_clear(0, tk.END)
+        self.q_list.selection_set(i)
+        self.q_list.see(i)
+        self.on_select_question()
+        return 'break'
 
     def _apply_dark_theme(self):
         # Basic dark palette for ttk + Tk widgets
@@ -473,12 +2684,39 @@ class EditorApp:
         style.map('TCombobox', fieldbackground=[('readonly', bg)], foreground=[('readonly', fg)])
         style.configure('TSeparator', background='#2a2a2a')
 
-    def _style_text(self, widget: tk.Text):
+    def _style_text(self, widget: 'tk.Text'):
         widget.configure(bg='#121212', fg='#e6e6e6', insertbackground='#e6e6e6', highlightthickness=1, highlightbackground='#2a2a2a', relief='flat')
 
-    def _style_listbox(self, widget: tk.Listbox):
+    def _style_listbox(self, widget: 'tk.Listbox'):
         widget.configure(bg='#121212', fg='#e6e6e6', selectbackground='#2a2c30', selectforeground='#e6e6e6', highlightthickness=0, relief='flat')
 
+    # ---------- Image thumbnails ----------
+
+    THUMB_DEBOUNCE_MS = 150
+
+    def _schedule_thumbnail(self, field):
+        # field: 'image' or 'expl_image'; debounced so typing a path doesn't decode every prefix
+        if self._thumb_after.get(field):
+            self.root.after_cancel(self._thumb_after[field])
+        self._thumb_after[field] = self.root.after(self.THUMB_DEBOUNCE_MS, lambda: self._show_thumbnail(field))
+
+    def _show_thumbnail(self, field):
+        self._thumb_after[field] = None
+        label = getattr(self, f'{field}_thumb')
+        src = resolve_image_file(self.current_course, getattr(self, f'{field}_var').get().strip())
+        if not src:
+            self.cancel_io(f'thumb-{field}')
+            label.configure(image='', text='')
+            return
+
+        def done(prepared):
+            digest, thumb = prepared
+            ph = self.thumbnails.photo(digest, thumb, src)
+            label.configure(image=ph or '', text='' if ph else '(no preview)')
+
+        self.run_io(f'thumb-{field}', self.thumbnails.prepare, src, on_done=done,
+                    on_error=lambda _e: label.configure(image='', text='(no preview)'))
+
     def select_expl_image(self):
         p = filedialog.askopenfilename(title='Select explanation image', filetypes=[('Image files','*.png;*.jpg;*.jpeg;*.gif;*.webp;*.svg'),('All files','*.*')])
         if p:
@@ -486,32 +2724,69 @@ class EditorApp:
 
         # ---------- Data Binding ----------
 
-    def populate_courses(self):
+    def _mark(self, label):
+        if self.profile:
+            self.profile.mark(label)
+
+    def _load_startup_data(self):
+        # Runs once the window is drawn; courses, topics.json and the topic load off-thread
+        self._mark('window shown')
+        self.run_io('courses', load_courses, on_done=self.populate_courses, status='Loading courses…')
+
+    def _startup_done(self):
+        if self.profile:
+            self._mark('first topic')
+            self.profile.report()
+            self.profile = None
+
+    def populate_courses(self, courses):
+        self._mark('courses.json')
+        self.courses = courses
         ids = [c['id'] for c in self.courses]
         self.course_cmb['values'] = ids
-        if ids:
-            self.course_cmb.set(ids[0])
-            self.on_course_change()
+        if not ids:
+            self._startup_done()
+            return
+        # Unsaved edits win over the last-opened topic
+        if self._offer_journal_recovery(after=self._startup_done):
+            return
+        last = self.prefs.get('last_course')
+        self.course_cmb.set(last if last in ids else ids[0])
+        self.on_course_change(topic_id=self.prefs.get('last_topic'), after=self._startup_done)
 
-    def on_course_change(self):
+    def on_course_change(self, topic_id=None, after=None):
+        # topic_id: topic to open instead of the first one; after: called once it is shown
         cid = self.course_cmb.get()
         if not cid:
             return
-        self.current_course = cid
-        data = load_topics(cid)
-        self.topics_json = data
-        topics = data.get('topics', [])
-        self.topic_cmb['values'] = [t['id'] for t in topics]
-        if topics:
-            self.topic_cmb.set(topics[0]['id'])
-            self.on_topic_change()
-        else:
-            self.topic_cmb.set('')
-            self.current_topic_relfile = None
-            self.current_topic = {"topic_id": "", "topic_name": "", "questions": []}
-            self.refresh_question_list()
 
-    def on_topic_change(self):
+        def apply(data):
+            self._mark('topics.json')
+            self._course_topics[cid] = self.topics_json = data
+            self._topics_course = cid
+            self._watch_current()
+            self.watcher.acknowledge(os.path.join(DATA_DIR, cid, 'topics.json'))
+            topics = data.get('topics', [])
+            ids = [t['id'] for t in topics]
+            self.topic_cmb['values'] = ids
+            # Coming back to a course shows its most recent tab rather than opening another topic
+            open_tab = next((t for t in [self._active_tab] + self._tab_ids()[::-1]
+                             if t in self._tabs and self._tabs[t]['key'][0] == cid), None)
+            if topic_id is None and open_tab:
+                self._select_tab(open_tab)
+            elif topics:
+                self.topic_cmb.set(topic_id if topic_id in ids else ids[0])
+                self.on_topic_change(after=after)
+                return
+            else:
+                self.topic_cmb.set('')
+                self.set_status(f'{cid} has no topics yet — create one with New Topic')
+            if after:
+                after()
+
+        self.run_io('course', self.topic_cache.load_topics, cid, on_done=apply, status=f'Loading {cid}…')
+
+    def on_topic_change(self, after=None):
         tid = self.topic_cmb.get()
         if not tid:
             return
@@ -519,22 +2794,183 @@ class EditorApp:
         entry = next((t for t in self.topics_json.get('topics', []) if t['id'] == tid), None)
         if not entry:
             return
-        self.current_topic_relfile = entry['file']
-        self.current_topic = load_topic_file(self.current_course, self.current_topic_relfile)
-        if not self.current_topic.get('topic_id'):
-            self.current_topic['topic_id'] = tid
-        if not self.current_topic.get('topic_name'):
-            self.current_topic['topic_name'] = entry.get('topic_name', tid)
-        self.refresh_question_list()
+        course, rel_file = self._topics_course, entry['file']
+        if self._tab_for(course, rel_file):
+            self._select_tab(self._tab_for(course, rel_file))
+            if after:
+                after()
+            return
+
+        # The tab opens at once and fills in while the file is parsed
+        self._open_tab(course, rel_file, tid, {"topic_id": tid, "topic_name": entry.get('topic_name', tid), "questions": []})
+        self._stream_topic(self._active_tab, after)
+
+    def _stream_topic(self, t, after=None):
+        # Rows appear batch by batch; edits of the tab wait until it is complete (see _still_loading)
+        tab = self._tabs[t]
+        course, rel_file = tab['key']
+        topic = self._tab_state(t)['current_topic']
+        label = self._tab_label(t)
+        tab['loading'] = True
+        header = {}
+
+        def batch(items):
+            if t not in self._tabs:
+                return
+            if not topic['questions']:
+                self._mark('first rows')
+            topic['questions'].extend(items)
+            if t == self._active_tab:
+                self.q_list.set_count(len(topic['questions']), keep_cache=True)
+                self.set_status(f'Loading {label}… {len(topic["questions"])} questions')
+
+        def done(_result):
+            if t not in self._tabs:
+                return
+            tab['loading'] = False
+            questions = topic['questions']
+            defaults = {'topic_id': topic.get('topic_id'), 'topic_name': topic.get('topic_name')}
+            header.setdefault('questions', None)
+            # Keep the file's key order so saving an unchanged topic writes identical bytes
+            topic.clear()
+            topic.update((k, questions if k == 'questions' else v) for k, v in header.items())
+            for k, v in defaults.items():
+                if not topic.get(k):
+                    topic[k] = v
+            self._set_merge_base(questions, t)
+            if t == self._active_tab:
+                self.refresh_question_list()
+                self._check_journal()
+                self._check_stale_log()
+                if tab['external_change']:
+                    tab['external_change'] = False
+                    self._on_topic_file_changed()
+            else:
+                st = tab['state']
+                st['history'].reset(questions)
+                st['search_index'].rebuild(enumerate(questions))
+                tab['check_journal'] = True
+            self.set_status(f'Loaded {label} ({len(questions)} questions)')
+            if after:
+                after()
+
+        def failed(err):
+            self.set_status(f'Error: {err}')
+            messagebox.showerror('Error', f'Could not load {label}: {err}')
+            # A partial question list must never be saved over the file
+            self.close_tab(t, force=True)
+
+        self.run_io_stream(f'load:{t}', self.topic_cache.iter_topic, course, rel_file, header,
+                           on_batch=batch, on_done=done, on_error=failed, status=f'Loading {label}…')
+
+    def _still_loading(self, t=None):
+        t = t or self._active_tab
+        if t in self._tabs and self._tabs[t].get('loading'):
+            self.set_status(f'{self._tab_label(t)} is still loading')
+            return True
+        return False
+
+    # ---------- Background I/O ----------
+    # Disk work runs on worker threads; results are queued and applied on the Tk thread
+    # by a root.after() poll. Each job kind has a generation counter: starting a new job
+    # of the same kind (or cancel_io) makes older results stale, and they are dropped.
+
+    def run_io(self, kind, fn, *args, on_done=None, on_error=None, status=None, write=False):
+        gen = self._io_gen.get(kind, 0) + 1
+        self._io_gen[kind] = gen
+        # Writes go through a single thread so saves of the same file never reorder
+        ex = self._io_writer if write else self._io_reader
+        fut = ex.submit(fn, *args)
+        self._io_pending += 1
+        if status:
+            self.set_status(status)
+        self._set_busy(True)
+        fut.add_done_callback(lambda f: self._io_results.put((kind, gen, f, on_done, on_error, write)))
+        if not self._io_polling:
+            self._io_polling = True
+            self.root.after(30, self._drain_io)
+        return fut
+
+    def run_io_stream(self, kind, items, *args, on_batch, on_done=None, on_error=None, status=None, batch=500):
+        """run_io for a generator function: on_batch(list) runs on the Tk thread as items
+        arrive, at most `batch` at a time; on_done(None) once the generator is exhausted.
+        Cancelling the kind stops the generator at the next item."""
+        gen = self._io_gen.get(kind, 0) + 1  # the generation run_io is about to assign
+
+        def pump():
+            buf = []
+            for item in items(*args):
+                if self._io_gen.get(kind) != gen:
+                    return
+                buf.append(item)
+                if len(buf) >= batch:
+                    self._io_results.put((kind, gen, None, lambda b=buf: on_batch(b), None, False))
+                    buf = []
+            if buf:
+                self._io_results.put((kind, gen, None, lambda b=buf: on_batch(b), None, False))
+
+        return self.run_io(kind, pump, on_done=on_done, on_error=on_error, status=status)
+
+    def cancel_io(self, kind):
+        self._io_gen[kind] = self._io_gen.get(kind, 0) + 1
+
+    def _drain_io(self):
+        while True:
+            try:
+                kind, gen, fut, on_done, on_error, write = self._io_results.get_nowait()
+            except queue.Empty:
+                break
+            if fut is None:
+                # A batch from run_io_stream; its job is still pending
+                if gen == self._io_gen.get(kind):
+                    on_done()
+                continue
+            self._io_pending -= 1
+            # Stale reads are dropped; writes always report back
+            if not write and gen != self._io_gen.get(kind):
+                continue
+            err = fut.exception()
+            if err is not None:
+                if on_error:
+                    on_error(err)
+                else:
+                    self.set_status(f'Error: {err}')
+                    messagebox.showerror('Error', str(err))
+                continue
+            if on_done:
+                on_done(fut.result())
+        if not self._io_pending and self.status_var.get().endswith('…'):
+            self.set_status('Ready')
+        if self._io_pending:
+            self.root.after(30, self._drain_io)
+        else:
+            self._io_polling = False
+            self._set_busy(False)
+
+    def _set_busy(self, busy):
+        if busy and not self._io_busy_shown:
+            self.io_progress.pack(side='right')
+            self.io_progress.start(15)
+            self._io_busy_shown = True
+        elif not busy and self._io_busy_shown:
+            self.io_progress.stop()
+            self.io_progress.pack_forget()
+            self._io_busy_shown = False
 
     def refresh_question_list(self):
-        self.q_list.delete(0, tk.END)
-        for q in self.current_topic.get('questions', []):
-            snippet = (q.get('question') or '').strip().split('\n')[0]
-            if len(snippet) > 60:
-                snippet = snippet[:57] + '…'
-            self.q_list.insert(tk.END, f"{q.get('id')} — {snippet}")
+        # Full reset (topic switch); single edits go through update_row/remove_row instead
+        self.q_list.set_count(len(self.current_topic.get('questions', [])))
+        self.search_index.rebuild(enumerate(self.current_topic.get('questions', [])))
+        self.history.reset(self.current_topic.get('questions', []))
         self.selected_question_index = None
+        self._schedule_search()
+
+    def _question_row_text(self, i):
+        q = self.current_topic['questions'][i]
+        snippet = (q.get('question') or '').strip().split('\n')[0]
+        if len(snippet) > 60:
+            snippet = snippet[:57] + '…'
+        return f"{q.get('id')} — {snippet}"
 
     # ---------- Topics ----------
 
@@ -561,28 +2997,665 @@ class EditorApp:
                 return
             topics.append({"id": tid, "file": file_rel})
             self.topics_json['topics'] = topics
-            save_topics_json(self.current_course, self.topics_json)
+            course, payload = self._topics_course, dump_json_bytes(self.topics_json)
+
+            topics_path = os.path.join(DATA_DIR, course, 'topics.json')
+
+            def write():
+                if write_bytes_atomic(topics_path, payload):
+                    refresh_site_artifacts(course, [f'data/{course}/topics.json'])
+
+            self.watcher.suppress(topics_path)
+            self.run_io('save', write, status='Saving topics.json…', write=True,
+                        on_done=lambda _r: self.watcher.acknowledge(topics_path),
+                        on_error=lambda e: (self.watcher.acknowledge(topics_path), messagebox.showerror('Error', str(e))))
             self.topic_cmb['values'] = [t['id'] for t in topics]
             self.topic_cmb.set(tid)
-            self.current_topic_relfile = file_rel
-            self.current_topic = {"topic_id": tid, "topic_name": tname, "questions": []}
-            self.refresh_question_list()
+            self._open_tab(course, file_rel, tid, {"topic_id": tid, "topic_name": tname, "questions": []})
             dialog.destroy()
 
         ttk.Button(dialog, text='Create', command=create).grid(row=2, column=0, columnspan=2, pady=8)
 
     def save_topic_file(self):
-        if not self.current_course or not self.current_topic_relfile:
+        if self._active_tab is None:
             messagebox.showerror('Error', 'Select or create a topic first')
+            return False
+        return self._save_tab(self._active_tab)
+
+    def save_all_topics(self):
+        # Each modified tab's file is written exactly once, however many edits or moves touched it
+        dirty = [t for t in self._tab_ids() if not self._tabs[t].get('loading') and self._tab_dirty(t)]
+        if not dirty:
+            self.set_status('No unsaved topics')
             return
-        # Validate all questions
-        for i, q in enumerate(self.current_topic.get('questions', [])):
+        for t in dirty:
+            if not self._save_tab(t, quiet=True):
+                break
+
+    def _save_tab(self, t, quiet=False):
+        """Queue a write of tab t's topic; returns False when validation or the user stopped it."""
+        if self._still_loading(t):
+            return False
+        tab = self._tabs[t]
+        st = self._tab_state(t)
+        (course, rel_file), tid = tab['key'], tab['topic_id']
+        topic = st['current_topic']
+        path = topic_path(course, rel_file)
+        sharded = is_sharded_topic(rel_file)
+        # Patch saves append only what changed since the last load/save to the topic's write log
+        records = None
+        if self.patch_saves_var.get() and not sharded and os.path.exists(path):
+            records = question_patch(st['_base_questions'], topic.get('questions', []))
+        # Validate all questions (patch saves: the ones being written)
+        if records is None:
+            to_check = enumerate(topic.get('questions', []))
+        else:
+            to_check = ((r['index'], r['question']) for r in records if 'question' in r)
+        for i, q in to_check:
             ok, msg = validate_question(q)
             if not ok:
-                messagebox.showerror('Validation Error', f'Question #{i+1} ({q.get("id")}): {msg}')
+                self._select_tab(t)
+                messagebox.showerror('Validation Error', f'{course}/{tid} question #{i+1} ({q.get("id")}): {msg}')
+                return False
+        # Never silently overwrite edits made on disk since the topic was loaded
+        if topic_signature(course, rel_file) != st['_base_sig']:
+            choice = messagebox.askyesnocancel(
+                'Topic changed on disk',
+                f'{course}/{rel_file} was changed outside the editor since it was loaded.\n\n'
+                'Yes: merge those changes first\nNo: overwrite them\nCancel: do nothing')
+            if choice is None:
+                return False
+            if choice:
+                self._select_tab(t)
+                self._on_topic_file_changed()
+                return False
+        # Serialize on the Tk thread (a consistent snapshot), write on the I/O worker. Sharded
+        # topics are split against the shards on disk there, and patch saves compacted, from
+        # the snapshot copy.
+        payload = None if sharded or records is not None else encode_topic(rel_file, topic)
+        saved = _copy_topic(topic)
+        base = dict(saved, questions=st['_base_questions'])
+        assets = self._take_pending_assets()
+        try:
+            set_journal_aside(course, rel_file)
+        except OSError:
+            pass
+
+        def write():
+            if sharded:
+                files = save_sharded_topic(course, rel_file, saved)
+            elif payload is None:
+                files = save_topic_patch(course, rel_file, base, saved, records)
+            else:
+                changed = write_bytes_atomic(path, payload)
+                files = [rel_file] if discard_topic_log(course, rel_file) or changed else []
+            self.topic_cache.put_topic(course, rel_file, saved)
+            # The file now holds every edit journaled before this save
+            discard_journal(course, rel_file, aside_only=True)
+            if files:
+                refresh_site_artifacts(course, [f'data/{course}/{f}' for f in files] + assets)
+            return bool(files)
+
+        def done(changed):
+            self.watcher.acknowledge(path)
+            if t in self._tabs:
+                self._set_merge_base(saved.get('questions', []), t)
+            if not changed:
+                self.set_status(f'No changes in {rel_file}')
+                return
+            if self.question_index.built:
+                self.question_index.update_topic(course, tid, rel_file, saved)
+            elif self._question_index_waiters is not None:
+                # The build may have read the file before this save
+                self._question_index_saved.append((course, tid, rel_file, saved))
+            if quiet:
+                self.set_status(f'Saved {course}/{rel_file}')
+            else:
+                messagebox.showinfo('Saved', f'Saved {rel_file}')
+
+        def failed(err):
+            self.watcher.acknowledge(path)
+            self.set_status(f'Error: {err}')
+            messagebox.showerror('Error', str(err))
+
+        self.watcher.suppress(path)
+        self.run_io('save', write, on_done=done, on_error=failed, status=f'Saving {rel_file}…', write=True)
+        return True
+
+    # ---------- Tabs ----------
+    # Several topics can be open at once, all parsed through the shared topic_cache. The
+    # active tab's state lives in the usual attributes (current_topic, history, ...); the
+    # other tabs keep theirs in self._tabs[t]['state'] until they are activated again.
+
+    _TAB_STATE = ('current_course', 'current_topic_relfile', 'current_topic', 'history', 'search_index',
+                  '_base_questions', '_base_sig', 'selected_question_index')
+
+    def _tab_ids(self):
+        return [str(t) for t in self.tab_bar.tabs()]
+
+    def _tab_for(self, course, rel_file):
+        return next((t for t, tab in self._tabs.items() if tab['key'] == (course, rel_file)), None)
+
+    def _tab_label(self, t):
+        tab = self._tabs[t]
+        return f"{tab['key'][0]}/{tab['topic_id']}"
+
+    def _tab_state(self, t):
+        if t == self._active_tab:
+            return {name: getattr(self, name) for name in self._TAB_STATE}
+        return self._tabs[t]['state']
+
+    def _set_tab_attr(self, t, name, value):
+        if t == self._active_tab:
+            setattr(self, name, value)
+        else:
+            self._tabs[t]['state'][name] = value
+
+    def _tab_dirty(self, t):
+        st = self._tab_state(t)
+        return st['current_topic'].get('questions', []) != st['_base_questions']
+
+    def _update_tab_title(self, t):
+        if t in self._tabs:
+            self.tab_bar.tab(self._tabs[t]['frame'], text=self._tab_label(t) + (' •' if self._tab_dirty(t) else ''))
+
+    def _stash_active_tab(self):
+        tab = self._tabs.get(self._active_tab)
+        if tab is not None:
+            tab['state'] = self._tab_state(self._active_tab)
+
+    def _open_tab(self, course, rel_file, tid, topic):
+        """Show a freshly loaded (or new) topic in a new tab and make it active."""
+        self._stash_active_tab()
+        frame = ttk.Frame(self.tab_bar, height=0)
+        self.tab_bar.add(frame, text=f'{course}/{tid}')
+        t = str(frame)
+        self._tabs[t] = {'key': (course, rel_file), 'topic_id': tid, 'frame': frame, 'state': None,
+                         'external_change': False}
+        self._active_tab = t
+        self.current_course, self.current_topic_relfile, self.current_topic = course, rel_file, topic
+        self.history, self.search_index = EditHistory(), SearchIndex()
+        self.tab_bar.select(frame)
+        self.prefs['last_course'], self.prefs['last_topic'] = course, tid
+        self._set_merge_base(topic.get('questions', []))
+        self.refresh_question_list()
+        self.clear_form()
+
+    def _select_tab(self, t):
+        self.tab_bar.select(self._tabs[t]['frame'])
+        if t != self._active_tab:
+            self._activate_tab(t)
+
+    def _on_tab_changed(self):
+        t = str(self.tab_bar.select())
+        if t in self._tabs and t != self._active_tab:
+            self._activate_tab(t)
+
+    def _activate_tab(self, t):
+        self._stash_active_tab()
+        tab = self._tabs[t]
+        for name, value in tab['state'].items():
+            setattr(self, name, value)
+        tab['state'] = None
+        self._active_tab = t
+        course = tab['key'][0]
+        self.prefs['last_course'], self.prefs['last_topic'] = course, tab['topic_id']
+        if course in self._course_topics:
+            self.topics_json, self._topics_course = self._course_topics[course], course
+            self.topic_cmb['values'] = [x['id'] for x in self.topics_json.get('topics', [])]
+        self.course_cmb.set(course)
+        self.topic_cmb.set(tab['topic_id'])
+        # Redraw from the restored state; its history and search index are reused as they are
+        n = len(self.current_topic.get('questions', []))
+        self.q_list.set_count(n)
+        sel = self.selected_question_index
+        if sel is not None and sel < n:
+            self.q_list.selection_set(sel)
+            self.q_list.see(sel)
+            self.load_question_into_form(self.current_topic['questions'][sel])
+        else:
+            self.selected_question_index = None
+            self.clear_form()
+        self._schedule_search()
+        if tab.get('loading'):
+            return
+        if tab.pop('check_journal', False):
+            self._check_journal()
+            self._check_stale_log()
+        if tab['external_change']:
+            tab['external_change'] = False
+            self._on_topic_file_changed()
+
+    def _on_tab_middle_click(self, event):
+        try:
+            i = self.tab_bar.index(f'@{event.x},{event.y}')
+        except tk.TclError:
+            return
+        self.close_tab(self._tab_ids()[i])
+
+    def close_tab(self, t=None, force=False):
+        # force: close without asking (and without touching the journal)
+        t = t or self._active_tab
+        if t not in self._tabs:
+            return
+        tab = self._tabs[t]
+        course, rel_file = tab['key']
+        if tab.get('pending_images'):
+            # Never closed under a question waiting for its images (see save_question)
+            self.set_status(f'Images for {self._tab_label(t)} are still being copied; close it once they are done')
+            return
+        self.cancel_io(f'load:{t}')
+        if not force and not tab.get('loading') and self._tab_dirty(t):
+            choice = messagebox.askyesnocancel('Unsaved changes', f'Save changes to {self._tab_label(t)} before closing?')
+            if choice is None or (choice and not self._save_tab(t)):
+                return
+            if choice is False:
+                discard_journal(course, rel_file)
+        was_active = t == self._active_tab
+        if was_active:
+            self._active_tab = None
+        del self._tabs[t]
+        self.tab_bar.forget(tab['frame'])
+        tab['frame'].destroy()
+        self._watch_current()
+        if not was_active:
+            return
+        remaining = self._tab_ids()
+        if remaining:
+            self._select_tab(remaining[-1])
+            return
+        self.current_topic_relfile = None
+        self.current_topic = {"topic_id": "", "topic_name": "", "questions": []}
+        self.history, self.search_index = EditHistory(), SearchIndex()
+        self.topic_cmb.set('')
+        self.refresh_question_list()
+        self.clear_form()
+
+    def transfer_question_dialog(self, move=False):
+        idx = self.selected_question_index
+        label = 'Move' if move else 'Copy'
+        if self._still_loading():
+            return
+        if idx is None:
+            messagebox.showinfo(f'{label} question', 'Select a question first')
+            return
+        targets = [t for t in self._tab_ids() if t != self._active_tab and not self._tabs[t].get('loading')]
+        if not targets:
+            messagebox.showinfo(f'{label} question', 'Open the target topic first; it appears as another tab')
+            return
+        # The source tab and the question itself (not its position) are what the user picked;
+        # both are looked up again when the button is pressed
+        src, q = self._active_tab, self.current_topic['questions'][idx]
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f'{label} question to')
+        dialog.transient(self.root)
+        names = [self._tab_label(t) for t in targets]
+        var = tk.StringVar(value=names[0])
+        ttk.Combobox(dialog, values=names, textvariable=var, state='readonly', width=40).pack(padx=8, pady=8)
+
+        def go(*_):
+            t = targets[names.index(var.get())]
+            dialog.destroy()
+            if src not in self._tabs or t not in self._tabs:
+                self.set_status(f'{label} cancelled: a tab was closed')
+                return
+            if src != self._active_tab:
+                self._select_tab(src)
+            i = next((i for i, x in enumerate(self.current_topic.get('questions', [])) if x is q), None)
+            if i is None:
+                self.set_status(f'{label} cancelled: {q.get("id")} was edited or deleted meanwhile')
+                return
+            self._transfer_question(i, t, move)
+
+        ttk.Button(dialog, text=label, command=go).pack(pady=(0,8))
+        dialog.bind('<Return>', go)
+        dialog.bind('<Escape>', lambda e: dialog.destroy())
+
+    def _transfer_question(self, idx, t, move):
+        # In-memory only: the target tab gets an undoable, journaled insert; nothing is written until save
+        q = copy.deepcopy(self.current_topic['questions'][idx])
+        tab = self._tabs[t]
+        st = tab['state']
+        course, rel_file = tab['key']
+        if course != self.current_course:
+            # Bare image paths resolve against the course; pin them to this course's files
+            for k in ('image', 'explanation_image'):
+                if q.get(k):
+                    q[k] = site_image_path(self.current_course, q[k])
+        questions = st['current_topic'].setdefault('questions', [])
+        taken = {x.get('id') for x in questions}
+        qid, n = q.get('id'), 2
+        while q.get('id') in taken:
+            q['id'] = f'{qid}-{n}'
+            n += 1
+        i = len(questions)
+        questions.append(q)
+        st['history'].record(('insert', i, q))
+        st['search_index'].add(i, q)
+        try:
+            append_journal(course, tab['topic_id'], rel_file, {'op': 'insert', 'index': i, 'question': q})
+        except Exception as e:
+            print('Journal write failed:', e)
+        self._update_tab_title(t)
+        if move:
+            self._remove_question(idx)
+        self.set_status(f"{'Moved' if move else 'Copied'} {q.get('id')} to {self._tab_label(t)} — Save All writes both topics")
+
+    # ---------- External changes ----------
+    # The watcher only stats files; a changed topic is re-read once and merged per question
+    # against the last loaded/saved version (see merge_questions).
+
+    WATCH_INTERVAL_MS = 1000
+
+    def _watch_current(self):
+        # Every open tab's file, plus topics.json of their courses and of the picked course
+        courses = {self._topics_course} - {None}
+        paths = set()
+        for tab in self._tabs.values():
+            courses.add(tab['key'][0])
+            paths.add(topic_path(*tab['key']))
+        paths.update(os.path.join(DATA_DIR, c, 'topics.json') for c in courses)
+        self.watcher.watch_only(sorted(paths))
+
+    def _set_merge_base(self, questions, t=None):
+        # Called with tab t's questions as they are on disk (load, save, merge)
+        t = t or self._active_tab
+        path = topic_path(*self._tabs[t]['key'])
+        self._set_tab_attr(t, '_base_questions', [dict(q) for q in questions])
+        self._set_tab_attr(t, '_base_sig', topic_signature(*self._tabs[t]['key']))
+        self._watch_current()
+        self.watcher.acknowledge(path)
+        self._update_tab_title(t)
+
+    def _poll_watcher(self):
+        try:
+            for path in self.watcher.poll():
+                if os.path.basename(path) == 'topics.json':
+                    self._on_topics_json_changed(os.path.basename(os.path.dirname(path)))
+                    continue
+                t = next((t for t, tab in self._tabs.items()
+                          if os.path.abspath(topic_path(*tab['key'])) == path), None)
+                if t is not None and t == self._active_tab and not self._tabs[t].get('loading'):
+                    self._on_topic_file_changed()
+                elif t is not None:
+                    # Handled once the tab is active and loaded
+                    self._tabs[t]['external_change'] = True
+        finally:
+            self.root.after(self.WATCH_INTERVAL_MS, self._poll_watcher)
+
+    def _on_topics_json_changed(self, cid):
+        def apply(data):
+            self._course_topics[cid] = data
+            if cid != self._topics_course:
+                return
+            self.topics_json = data
+            ids = [t['id'] for t in data.get('topics', [])]
+            self.topic_cmb['values'] = ids
+            tid = self.topic_cmb.get()
+            if tid and tid not in ids:
+                self.set_status(f'topics.json changed on disk; {tid} is no longer listed')
+            else:
+                self.set_status('topics.json changed on disk; topic list reloaded')
+
+        self.run_io(f'external-topics-{cid}', self.topic_cache.load_topics, cid, on_done=apply)
+
+    def _on_topic_file_changed(self):
+        course, rel_file = self.current_course, self.current_topic_relfile
+        if not course or not rel_file:
+            return
+
+        def apply(theirs):
+            if (course, rel_file) != (self.current_course, self.current_topic_relfile):
+                return
+            mine = self.current_topic.get('questions', [])
+            their_qs = theirs.get('questions', [])
+            if mine == self._base_questions:
+                # No local edits: just take the new version
+                self._apply_merge(their_qs, their_qs)
+                self.set_status(f'{rel_file} changed on disk; reloaded')
+                return
+            entries, conflicts = merge_questions(self._base_questions, mine, their_qs)
+            if conflicts:
+                self._merge_dialog(entries, conflicts, their_qs)
+            else:
+                self._apply_merge([q for _k, q in entries if q is not None], their_qs)
+                self.set_status(f'{rel_file} changed on disk; merged with your unsaved edits')
+
+        def gone(_err):
+            self.set_status(f'{rel_file} was removed on disk; Save Topic will recreate it')
+
+        self.run_io('external', self.topic_cache.load_topic, course, rel_file, on_done=apply, on_error=gone)
+
+    def _apply_merge(self, merged, theirs):
+        course, rel_file = self.current_course, self.current_topic_relfile
+        self.current_topic['questions'] = merged
+        self._set_merge_base(theirs)
+        self.refresh_question_list()
+        # The journal was relative to the old file; restart it from the new one
+        discard_journal(course, rel_file)
+        if merged != theirs:
+            self._journal({'op': 'reset', 'questions': merged})
+
+    def _merge_dialog(self, entries, conflicts, theirs):
+        # One row per conflicting question; double-click (or the buttons) picks a side
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Merge external changes')
+        dialog.transient(self.root)
+        ttk.Label(dialog, text=f'{self.current_topic_relfile} changed on disk. '
+                               f'{len(conflicts)} question(s) were changed on both sides:').pack(anchor='w', padx=8, pady=(8, 4))
+        tree = ttk.Treeview(dialog, columns=('id', 'mine', 'theirs', 'use'), show='headings', height=min(12, len(conflicts)))
+        for col, text, width in (('id', 'Id', 120), ('mine', 'Mine', 260), ('theirs', 'On disk', 260), ('use', 'Use', 70)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width, stretch=col in ('mine', 'theirs'))
+        tree.pack(fill='both', expand=True, padx=8)
+        choice = {}
+
+        def summary(q):
+            if q is None:
+                return '(deleted)'
+            return (q.get('question') or '').strip().split('\n')[0][:80]
+
+        for n, (key, (m, t)) in enumerate(conflicts.items()):
+            choice[str(n)] = key
+            tree.insert('', 'end', iid=str(n), values=(key[0], summary(m), summary(t), 'mine'))
+
+        def use(side, iids=None):
+            for iid in iids if iids is not None else tree.selection():
+                tree.set(iid, 'use', side)
+
+        def toggle(_e):
+            iid = tree.focus()
+            if iid:
+                use('theirs' if tree.set(iid, 'use') == 'mine' else 'mine', [iid])
+
+        def apply():
+            picked = {choice[iid]: conflicts[choice[iid]][0 if tree.set(iid, 'use') == 'mine' else 1]
+                      for iid in tree.get_children()}
+            merged = [picked.get(k, q) for k, q in entries]
+            self._apply_merge([q for q in merged if q is not None], theirs)
+            self.set_status('External changes merged — click Save Topic to keep the result')
+            dialog.destroy()
+
+        def cancel():
+            self.set_status('External changes not merged; saving will ask again')
+            dialog.destroy()
+
+        tree.bind('<Double-1>', toggle)
+        btns = ttk.Frame(dialog)
+        btns.pack(fill='x', padx=8, pady=8)
+        ttk.Button(btns, text='Use mine', command=lambda: use('mine')).pack(side='left')
+        ttk.Button(btns, text='Use on-disk', command=lambda: use('theirs')).pack(side='left', padx=4)
+        ttk.Button(btns, text='All on-disk', command=lambda: use('theirs', tree.get_children())).pack(side='left')
+        ttk.Button(btns, text='Cancel', command=cancel).pack(side='right')
+        ttk.Button(btns, text='Apply merge', command=apply).pack(side='right', padx=4)
+        dialog.protocol('WM_DELETE_WINDOW', cancel)
+
+    def _journal(self, record):
+        # Cheap append-only record of an unsaved edit (see "Autosave journal")
+        if not self.current_course or not self.current_topic_relfile:
+            return
+        try:
+            append_journal(self.current_course, self._tabs[self._active_tab]['topic_id'], self.current_topic_relfile, record)
+        except Exception as e:
+            print('Journal write failed:', e)
+        self._update_tab_title(self._active_tab)
+
+    def _offer_journal_recovery(self, after=None):
+        # At startup open the first topic with journaled edits; opening it offers recovery.
+        # Other topics offer theirs whenever they are opened. Returns True if a topic is opening.
+        journals = list_journals()
+        if not journals:
+            return False
+        course_id, rel_file = journals[0]
+        header, _records = read_journal(course_id, rel_file)
+        if self._tab_for(course_id, rel_file):
+            return False  # already open, its load has checked the journal
+        self.course_cmb.set(course_id)
+        self.on_course_change(topic_id=(header or {}).get('topic'), after=after)
+        return True
+
+    def _check_journal(self):
+        # Called whenever a topic is loaded from disk
+        course_id, rel_file = self.current_course, self.current_topic_relfile
+        header, records = read_journal(course_id, rel_file)
+        if not records:
+            if header:
+                discard_journal(course_id, rel_file)
+            return
+        note = '\n\nThe topic file has changed since; edits may land on different questions.' if journal_base_changed(course_id, rel_file, header) else ''
+        if messagebox.askyesno('Recover unsaved edits',
+                               f'{len(records)} unsaved edit(s) found for {course_id}/{rel_file}. Recover them?{note}'):
+            replay_journal(self.current_topic, records)
+            self.refresh_question_list()
+            self._update_tab_title(self._active_tab)
+            self.set_status(f'Recovered {len(records)} edit(s) — click Save Topic to keep them')
+        else:
+            discard_journal(course_id, rel_file)
+
+    def _check_stale_log(self):
+        # Called after _check_journal: saved edits whose topic file was replaced before they
+        # were folded in (see "Topic write log") are offered for merging by question id
+        course_id, rel_file = self.current_course, self.current_topic_relfile
+        records = read_stale_topic_log(course_id, rel_file)
+        if not records:
+            return
+        answer = messagebox.askyesnocancel(
+            'Saved edits for an older file',
+            f'{len(records)} saved edit(s) of {course_id}/{rel_file} were made to a version of the file '
+            'that has since been replaced (e.g. by git), so they are not in it.\n\n'
+            'Yes: merge them in by question id\nNo: discard them\nCancel: keep them for later')
+        if answer is None:
+            self.set_status('Saved edits for an older file kept aside; reopen the topic to merge them')
+            return
+        if answer:
+            merged, skipped = merge_topic_log(self.current_topic.get('questions', []), records)
+            self.current_topic['questions'] = merged
+            # The journal keeps the merge until the topic is saved
+            self._journal({'op': 'reset', 'questions': merged})
+            self.refresh_question_list()
+            note = f' ({skipped} delete(s) could not be matched)' if skipped else ''
+            self.set_status(f'Merged {len(records)} saved edit(s){note} — click Save Topic to keep them')
+        discard_stale_topic_log(course_id, rel_file)
+
+    def _take_pending_assets(self):
+        paths = sorted(self._pending_asset_paths)
+        self._pending_asset_paths.clear()
+        return paths
+
+    def goto_question_dialog(self):
+        # Jump to any question in any course by id (prefix match over the QuestionIndex)
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Go to question')
+        dialog.columnconfigure(0, weight=1)
+        dialog.rowconfigure(1, weight=1)
+        q_var = tk.StringVar()
+        entry = ttk.Entry(dialog, textvariable=q_var, width=50)
+        entry.grid(row=0, column=0, sticky='ew', padx=8, pady=(8,4))
+        lb = tk.Listbox(dialog, height=15)
+        self._style_listbox(lb)
+        lb.grid(row=1, column=0, sticky='nsew', padx=8, pady=(0,8))
+        matches = []
+
+        def refresh(*_):
+            lb.delete(0, tk.END)
+            if not self.question_index.built:
+                matches.clear()
+                lb.insert(tk.END, 'Indexing questions…')
                 return
-        save_topic_file(self.current_course, self.current_topic_relfile, self.current_topic)
-        messagebox.showinfo('Saved', f'Saved {self.current_topic_relfile}')
+            matches[:] = self.question_index.find_id_prefix(q_var.get().strip())
+            for qid, loc in matches:
+                lb.insert(tk.END, f"{qid} — {loc.course}/{loc.topic}")
+            if matches:
+                lb.selection_set(0)
+
+        def go(*_):
+            sel = lb.curselection()
+            if not sel or sel[0] >= len(matches):
+                return
+            _qid, loc = matches[sel[0]]
+            dialog.destroy()
+            self.goto_location(loc)
+
+        q_var.trace_add('write', refresh)
+        entry.bind('<Return>', go)
+        entry.bind('<Down>', lambda e: (lb.focus_set(), 'break'))
+        lb.bind('<Return>', go)
+        lb.bind('<Double-Button-1>', go)
+        dialog.bind('<Escape>', lambda e: dialog.destroy())
+        refresh()
+        entry.focus_set()
+        self._build_question_index(lambda: dialog.winfo_exists() and refresh())
+
+    def _build_question_index(self, then):
+        """Build the cross-course QuestionIndex on the I/O pool (it reads every topic) and
+        call then() once it is ready; right away when it already is."""
+        if self.question_index.built:
+            then()
+            return
+        if self._question_index_waiters is not None:
+            self._question_index_waiters.append(then)
+            return
+        self._question_index_waiters = [then]
+        self._question_index_saved = []
+
+        def build():
+            index = QuestionIndex()
+            index.ensure_built()
+            return index
+
+        def done(index):
+            for args in self._question_index_saved:
+                index.update_topic(*args)
+            self.question_index = index
+            waiters, self._question_index_waiters = self._question_index_waiters, None
+            self._question_index_saved = []
+            for fn in waiters:
+                fn()
+
+        def failed(err):
+            self._question_index_waiters = None
+            self._question_index_saved = []
+            self.set_status(f'Indexing questions failed: {err}')
+
+        self.run_io('question_index', build, on_done=done, on_error=failed, status='Indexing questions…')
+
+    def goto_location(self, loc):
+        def select():
+            if 0 <= loc.index < len(self.current_topic.get('questions', [])):
+                self.q_list.selection_clear(0, tk.END)
+                self.q_list.selection_set(loc.index)
+                self.q_list.see(loc.index)
+                self.on_select_question()
+        t = self._tab_for(loc.course, loc.file)
+        if t:
+            self._select_tab(t)
+            select()
+        elif self._topics_course != loc.course:
+            self.course_cmb.set(loc.course)
+            self.on_course_change(topic_id=loc.topic, after=select)
+        else:
+            self.topic_cmb.set(loc.topic)
+            self.on_topic_change(after=select)
 
     # ---------- Questions ----------
 
@@ -604,10 +3677,66 @@ class EditorApp:
         sel = self.q_list.curselection()
         if not sel:
             return
-        idx = sel[0]
+        if self._still_loading():
+            return
         if messagebox.askyesno('Delete', 'Delete selected question?'):
-            del self.current_topic['questions'][idx]
-            self.refresh_question_list()
+            self._remove_question(sel[0])
+
+    def _remove_question(self, idx):
+        removed = self.current_topic['questions'].pop(idx)
+        self.history.record(('delete', idx, removed))
+        self._journal({'op': 'delete', 'index': idx})
+        self.q_list.remove_row(idx)
+        # Positions after idx shift, so the position-keyed search index is rebuilt
+        self.search_index.rebuild(enumerate(self.current_topic['questions']))
+        self.selected_question_index = None
+        self._schedule_search()
+
+    def _history_key(self, action):
+        # Inside text fields Ctrl+Z belongs to the field, not to the question history
+        w = self.root.focus_get()
+        if isinstance(w, (tk.Text, tk.Entry, ttk.Entry)):
+            return None
+        action()
+        return 'break'
+
+    def undo(self):
+        if not self._still_loading():
+            self._apply_history(self.history.undo(), 'Undo')
+
+    def redo(self):
+        if not self._still_loading():
+            self._apply_history(self.history.redo(), 'Redo')
+
+    def _apply_history(self, result, label):
+        if result is None:
+            self.set_status(f'Nothing to {label.lower()}')
+            return
+        # Only the op's question changes; the editor's list is not rebuilt from the vector
+        _vec, op = result
+        EditHistory.apply_to_list(self.current_topic['questions'], op)
+        kind, i = op[0], op[1]
+        if kind == 'set':
+            self.q_list.update_row(i)
+            self.search_index.add(i, op[3])
+            self._journal({'op': 'upsert', 'index': i, 'question': op[3]})
+        else:
+            if kind == 'insert':
+                self.q_list.insert_row(i)
+                self._journal({'op': 'insert', 'index': i, 'question': op[2]})
+            else:
+                self.q_list.remove_row(i)
+                self._journal({'op': 'delete', 'index': i})
+            # Positions shift, so the position-keyed search index is rebuilt
+            self.search_index.rebuild(enumerate(self.current_topic['questions']))
+        self.selected_question_index = None
+        self._schedule_search()
+        if kind != 'delete':
+            self.q_list.selection_clear(0, tk.END)
+            self.q_list.selection_set(i)
+            self.q_list.see(i)
+            self.on_select_question()
+        self.set_status(f'{label}: {kind} #{i + 1}')
 
     def clear_form(self):
         self.id_var.set('')
@@ -632,178 +3761,221 @@ class EditorApp:
         self.refresh_form_fields(q)
 
     def refresh_form_fields(self, q=None):
-        for w in self.dynamic_frame.winfo_children():
-            w.destroy()
+        # Each type's sub-form is built once and kept; switching type/selection only swaps
+        # the visible frame and re-binds the question's data to its widgets.
         t = self.type_var.get()
-        if t == 'true_false':
-            self.tf_var = tk.BooleanVar(value=(q.get('correct') if q else False))
-            ttk.Radiobutton(self.dynamic_frame, text='True', variable=self.tf_var, value=True).pack(anchor='w')
-            ttk.Radiobutton(self.dynamic_frame, text='False', variable=self.tf_var, value=False).pack(anchor='w')
-        elif t == 'mc_single':
-            ttk.Label(self.dynamic_frame, text='Options (one per line)').pack(anchor='w')
-            opts = ''
-            correct_idx = 0
-            if q:
-                opts = '\n'.join(q.get('options', []))
-                correct_idx = q.get('correct', 0)
-            self.opts_text = tk.Text(self.dynamic_frame, height=6)
-            self._style_text(self.opts_text)
-            self.opts_text.insert('1.0', opts)
-            self.opts_text.pack(fill='x')
-            ttk.Label(self.dynamic_frame, text='Correct option index (0-based)').pack(anchor='w', pady=(6,0))
-            self.correct_idx_var = tk.IntVar(value=correct_idx)
-            ttk.Entry(self.dynamic_frame, textvariable=self.correct_idx_var).pack(anchor='w')
-        elif t == 'mc_multi':
-            ttk.Label(self.dynamic_frame, text='Options (one per line)').pack(anchor='w')
-            opts = ''
-            corr = ''
-            if q:
-                opts = '\n'.join(q.get('options', []))
-                corr = ','.join(str(i) for i in q.get('correct', []))
-            self.opts_text = tk.Text(self.dynamic_frame, height=6)
-            self._style_text(self.opts_text)
-            self.opts_text.insert('1.0', opts)
-            self.opts_text.pack(fill='x')
-            ttk.Label(self.dynamic_frame, text='Correct indices (comma-separated, 0-based)').pack(anchor='w', pady=(6,0))
-            self.correct_multi_var = tk.StringVar(value=corr)
-            ttk.Entry(self.dynamic_frame, textvariable=self.correct_multi_var).pack(anchor='w')
-        elif t == 'fill_text':
-            ttk.Label(self.dynamic_frame, text='Accepted answers (comma-separated)').pack(anchor='w')
-            ans = ''
-            if q:
-                ans = ','.join(q.get('answers', []))
-            self.answers_var = tk.StringVar(value=ans)
-            ttk.Entry(self.dynamic_frame, textvariable=self.answers_var).pack(fill='x')
-        elif t == 'fill_table':
-            ttk.Label(self.dynamic_frame, text='Table answers (rows; separate cells with commas)').pack(anchor='w')
-            table_txt = ''
-            if q and q.get('table') and q['table'].get('answers'):
-                rows = q['table']['answers']
-                table_txt = '\n'.join(','.join(str(c) for c in row) for row in rows)
-            self.table_text = tk.Text(self.dynamic_frame, height=8)
-            self._style_text(self.table_text)
-            self.table_text.insert('1.0', table_txt)
-            self.table_text.pack(fill='x')
-        elif t == 'sort':
-            ttk.Label(self.dynamic_frame, text='Items to sort (one per line, displayed initially in this order)').pack(anchor='w')
-            items_txt = ''
-            corr_txt = ''
-            if q:
-                items = q.get('items', [])
-                if items and isinstance(items[0], dict):
-                    items_txt = '\n'.join(it.get('text','') for it in items)
-                    # When items are objects, correct might be ids; convert to indices by mapping current order
-                    id_to_idx = {str(it.get('id')): i for i, it in enumerate(items)}
-                    corr_src = q.get('correct', [])
-                    try:
-                        corr_idx = [str(id_to_idx[str(v)]) for v in corr_src]
-                        corr_txt = ','.join(corr_idx)
-                    except Exception:
-                        corr_txt = ','.join(str(v) for v in corr_src)
-                else:
-                    items_txt = '\n'.join(str(it) for it in items)
-                    corr_txt = ','.join(str(v) for v in (q.get('correct', [])))
-            self.sort_items_text = tk.Text(self.dynamic_frame, height=8)
-            self._style_text(self.sort_items_text)
-            self.sort_items_text.insert('1.0', items_txt)
-            self.sort_items_text.pack(fill='x')
-            ttk.Label(self.dynamic_frame, text='Correct final order as indices (comma-separated permutation of 0..n-1)').pack(anchor='w', pady=(6,0))
-            self.sort_correct_var = tk.StringVar(value=corr_txt)
-            ttk.Entry(self.dynamic_frame, textvariable=self.sort_correct_var).pack(fill='x')
-        elif t == 'connect_nodes':
-            # Build Connect Nodes UI
-            data = _normalize_connect_nodes(q or {})
-            # Keep state
-            self.cn_left = data['leftNodes'][:]
-            self.cn_right = data['rightNodes'][:]
-            self.cn_pairs = data['correctPairs'][:]
-
-            # Left/Right nodes section
-            cols = ttk.Frame(self.dynamic_frame)
-            cols.pack(fill='x', pady=(0,6))
-            ttk.Label(cols, text='Left nodes').grid(row=0, column=0, sticky='w')
-            ttk.Label(cols, text='Right nodes').grid(row=0, column=1, sticky='w')
-
-            left_col = ttk.Frame(cols)
-            right_col = ttk.Frame(cols)
-            left_col.grid(row=1, column=0, padx=(0,6), sticky='nsew')
-            right_col.grid(row=1, column=1, padx=(6,0), sticky='nsew')
-            cols.columnconfigure(0, weight=1)
-            cols.columnconfigure(1, weight=1)
-
-            self.cn_left_list = tk.Listbox(left_col, height=8)
-            self._style_listbox(self.cn_left_list)
-            self.cn_left_list.pack(fill='both', expand=True)
-
-            self.cn_right_list = tk.Listbox(right_col, height=8)
-            self._style_listbox(self.cn_right_list)
-            self.cn_right_list.pack(fill='both', expand=True)
-
-            def refresh_lists():
-                self.cn_left_list.delete(0, tk.END)
-                for n in self.cn_left:
-                    self.cn_left_list.insert(tk.END, f"{n['id']}: {n['label']}")
-                self.cn_right_list.delete(0, tk.END)
-                for n in self.cn_right:
-                    self.cn_right_list.insert(tk.END, f"{n['id']}: {n['label']}")
-                refresh_pairs()
-
-            # Buttons for left
-            lbtns = ttk.Frame(left_col)
-            lbtns.pack(fill='x', pady=(6,0))
-            ttk.Button(lbtns, text='Add', command=lambda: self._cn_add_node('left')).pack(side='left')
-            ttk.Button(lbtns, text='Rename', command=lambda: self._cn_rename_node('left')).pack(side='left', padx=6)
-            ttk.Button(lbtns, text='Delete', command=lambda: self._cn_delete_node('left')).pack(side='left')
-
-            # Buttons for right
-            rbtns = ttk.Frame(right_col)
-            rbtns.pack(fill='x', pady=(6,0))
-            ttk.Button(rbtns, text='Add', command=lambda: self._cn_add_node('right')).pack(side='left')
-            ttk.Button(rbtns, text='Rename', command=lambda: self._cn_rename_node('right')).pack(side='left', padx=6)
-            ttk.Button(rbtns, text='Delete', command=lambda: self._cn_delete_node('right')).pack(side='left')
-
-            # Pairs section
-            pair_box = ttk.Frame(self.dynamic_frame)
-            pair_box.pack(fill='x', pady=(8,0))
-            ttk.Label(pair_box, text='Pairs (one-to-one)').grid(row=0, column=0, columnspan=4, sticky='w')
-            ttk.Label(pair_box, text='Left').grid(row=1, column=0, sticky='w')
-            ttk.Label(pair_box, text='Right').grid(row=1, column=1, sticky='w')
-            self.cn_left_sel = ttk.Combobox(pair_box, state='readonly')
-            self.cn_right_sel = ttk.Combobox(pair_box, state='readonly')
-            self.cn_left_sel.grid(row=2, column=0, sticky='ew', padx=(0,6))
-            self.cn_right_sel.grid(row=2, column=1, sticky='ew', padx=(6,0))
-            pair_box.columnconfigure(0, weight=1)
-            pair_box.columnconfigure(1, weight=1)
-            ttk.Button(pair_box, text='Add Pair', command=lambda: self._cn_add_pair()).grid(row=2, column=2, padx=8)
-
-            self.cn_pairs_list = tk.Listbox(pair_box, height=6)
-            self._style_listbox(self.cn_pairs_list)
-            self.cn_pairs_list.grid(row=3, column=0, columnspan=3, sticky='nsew', pady=(6,0))
-            pair_box.rowconfigure(3, weight=1)
-            ttk.Button(pair_box, text='Remove Selected Pair', command=lambda: self._cn_remove_pair()).grid(row=4, column=2, pady=6, sticky='e')
-
-            def refresh_pair_selects():
-                self.cn_left_sel['values'] = [f"{n['id']} — {n['label']}" for n in self.cn_left]
-                self.cn_right_sel['values'] = [f"{n['id']} — {n['label']}" for n in self.cn_right]
-
-            def refresh_pairs():
-                self.cn_pairs_list.delete(0, tk.END)
-                id_to_label_l = {n['id']: n['label'] for n in self.cn_left}
-                id_to_label_r = {n['id']: n['label'] for n in self.cn_right}
-                for pr in self.cn_pairs:
-                    ltxt = f"{pr['leftId']} — {id_to_label_l.get(pr['leftId'], '')}"
-                    rtxt = f"{pr['rightId']} — {id_to_label_r.get(pr['rightId'], '')}"
-                    self.cn_pairs_list.insert(tk.END, f"{ltxt}  ↔  {rtxt}")
-                refresh_pair_selects()
-
-            # Methods used by buttons (bound to self so other methods can call)
-            self._cn_refresh_lists = refresh_lists
-            self._cn_refresh_pairs = refresh_pairs
-
-            # Initialize view
-            refresh_lists()
-        else:
-            ttk.Label(self.dynamic_frame, text='Unknown type').pack()
+        key = t if t in self._FORM_BUILDERS else None
+        form = self._type_forms.get(key)
+        if form is None:
+            form = self._type_forms[key] = ttk.Frame(self.dynamic_frame)
+            getattr(self, self._FORM_BUILDERS.get(key, '_build_unknown_form'))(form)
+        if self._shown_form is not form:
+            if self._shown_form is not None:
+                self._shown_form.pack_forget()
+            form.pack(fill='both', expand=True)
+            self._shown_form = form
+        binder = getattr(self, f'_bind_{key}_form', None)
+        if binder:
+            binder(q)
+
+    _FORM_BUILDERS = {
+        'true_false': '_build_true_false_form',
+        'mc_single': '_build_mc_single_form',
+        'mc_multi': '_build_mc_multi_form',
+        'fill_text': '_build_fill_text_form',
+        'fill_table': '_build_fill_table_form',
+        'sort': '_build_sort_form',
+        'connect_nodes': '_build_connect_nodes_form',
+    }
+
+    @staticmethod
+    def _set_text(widget, value):
+        widget.delete('1.0', tk.END)
+        widget.insert('1.0', value)
+
+    def _build_unknown_form(self, frame):
+        ttk.Label(frame, text='Unknown type').pack()
+
+    def _build_true_false_form(self, frame):
+        self.tf_var = tk.BooleanVar(value=False)
+        ttk.Radiobutton(frame, text='True', variable=self.tf_var, value=True).pack(anchor='w')
+        ttk.Radiobutton(frame, text='False', variable=self.tf_var, value=False).pack(anchor='w')
+
+    def _bind_true_false_form(self, q):
+        self.tf_var.set(bool(q.get('correct')) if q else False)
+
+    def _build_mc_single_form(self, frame):
+        ttk.Label(frame, text='Options (one per line)').pack(anchor='w')
+        self.mc_single_opts_text = tk.Text(frame, height=6)
+        self._style_text(self.mc_single_opts_text)
+        self.mc_single_opts_text.pack(fill='x')
+        ttk.Label(frame, text='Correct option index (0-based)').pack(anchor='w', pady=(6,0))
+        self.correct_idx_var = tk.IntVar(value=0)
+        ttk.Entry(frame, textvariable=self.correct_idx_var).pack(anchor='w')
+
+    def _bind_mc_single_form(self, q):
+        # mc_single and mc_multi keep separate widgets; opts_text points at the visible one
+        self.opts_text = self.mc_single_opts_text
+        self._set_text(self.opts_text, '\n'.join(q.get('options', [])) if q else '')
+        self.correct_idx_var.set(q.get('correct', 0) if q else 0)
+
+    def _build_mc_multi_form(self, frame):
+        ttk.Label(frame, text='Options (one per line)').pack(anchor='w')
+        self.mc_multi_opts_text = tk.Text(frame, height=6)
+        self._style_text(self.mc_multi_opts_text)
+        self.mc_multi_opts_text.pack(fill='x')
+        ttk.Label(frame, text='Correct indices (comma-separated, 0-based)').pack(anchor='w', pady=(6,0))
+        self.correct_multi_var = tk.StringVar(value='')
+        ttk.Entry(frame, textvariable=self.correct_multi_var).pack(anchor='w')
+
+    def _bind_mc_multi_form(self, q):
+        self.opts_text = self.mc_multi_opts_text
+        self._set_text(self.opts_text, '\n'.join(q.get('options', [])) if q else '')
+        self.correct_multi_var.set(','.join(str(i) for i in q.get('correct', [])) if q else '')
+
+    def _build_fill_text_form(self, frame):
+        ttk.Label(frame, text='Accepted answers (comma-separated)').pack(anchor='w')
+        self.answers_var = tk.StringVar(value='')
+        ttk.Entry(frame, textvariable=self.answers_var).pack(fill='x')
+
+    def _bind_fill_text_form(self, q):
+        self.answers_var.set(','.join(q.get('answers', [])) if q else '')
+
+    def _build_fill_table_form(self, frame):
+        ttk.Label(frame, text='Table answers (rows; separate cells with commas)').pack(anchor='w')
+        self.table_text = tk.Text(frame, height=8)
+        self._style_text(self.table_text)
+        self.table_text.pack(fill='x')
+
+    def _bind_fill_table_form(self, q):
+        table_txt = ''
+        if q and q.get('table') and q['table'].get('answers'):
+            rows = q['table']['answers']
+            table_txt = '\n'.join(','.join(str(c) for c in row) for row in rows)
+        self._set_text(self.table_text, table_txt)
+
+    def _build_sort_form(self, frame):
+        ttk.Label(frame, text='Items to sort (one per line, displayed initially in this order)').pack(anchor='w')
+        self.sort_items_text = tk.Text(frame, height=8)
+        self._style_text(self.sort_items_text)
+        self.sort_items_text.pack(fill='x')
+        ttk.Label(frame, text='Correct final order as indices (comma-separated permutation of 0..n-1)').pack(anchor='w', pady=(6,0))
+        self.sort_correct_var = tk.StringVar(value='')
+        ttk.Entry(frame, textvariable=self.sort_correct_var).pack(fill='x')
+
+    def _bind_sort_form(self, q):
+        items_txt = ''
+        corr_txt = ''
+        if q:
+            items = q.get('items', [])
+            if items and isinstance(items[0], dict):
+                items_txt = '\n'.join(it.get('text','') for it in items)
+                # When items are objects, correct might be ids; convert to indices by mapping current order
+                id_to_idx = {str(it.get('id')): i for i, it in enumerate(items)}
+                corr_src = q.get('correct', [])
+                try:
+                    corr_idx = [str(id_to_idx[str(v)]) for v in corr_src]
+                    corr_txt = ','.join(corr_idx)
+                except Exception:
+                    corr_txt = ','.join(str(v) for v in corr_src)
+            else:
+                items_txt = '\n'.join(str(it) for it in items)
+                corr_txt = ','.join(str(v) for v in (q.get('correct', [])))
+        self._set_text(self.sort_items_text, items_txt)
+        self.sort_correct_var.set(corr_txt)
+
+    def _build_connect_nodes_form(self, frame):
+        # Left/Right nodes section
+        cols = ttk.Frame(frame)
+        cols.pack(fill='x', pady=(0,6))
+        ttk.Label(cols, text='Left nodes').grid(row=0, column=0, sticky='w')
+        ttk.Label(cols, text='Right nodes').grid(row=0, column=1, sticky='w')
+
+        left_col = ttk.Frame(cols)
+        right_col = ttk.Frame(cols)
+        left_col.grid(row=1, column=0, padx=(0,6), sticky='nsew')
+        right_col.grid(row=1, column=1, padx=(6,0), sticky='nsew')
+        cols.columnconfigure(0, weight=1)
+        cols.columnconfigure(1, weight=1)
+
+        self.cn_left_list = tk.Listbox(left_col, height=8)
+        self._style_listbox(self.cn_left_list)
+        self.cn_left_list.pack(fill='both', expand=True)
+
+        self.cn_right_list = tk.Listbox(right_col, height=8)
+        self._style_listbox(self.cn_right_list)
+        self.cn_right_list.pack(fill='both', expand=True)
+
+        def refresh_lists():
+            self.cn_left_list.delete(0, tk.END)
+            for n in self.cn_left:
+                self.cn_left_list.insert(tk.END, f"{n['id']}: {n['label']}")
+            self.cn_right_list.delete(0, tk.END)
+            for n in self.cn_right:
+                self.cn_right_list.insert(tk.END, f"{n['id']}: {n['label']}")
+            refresh_pairs()
+
+        # Buttons for left
+        lbtns = ttk.Frame(left_col)
+        lbtns.pack(fill='x', pady=(6,0))
+        ttk.Button(lbtns, text='Add', command=lambda: self._cn_add_node('left')).pack(side='left')
+        ttk.Button(lbtns, text='Rename', command=lambda: self._cn_rename_node('left')).pack(side='left', padx=6)
+        ttk.Button(lbtns, text='Delete', command=lambda: self._cn_delete_node('left')).pack(side='left')
+
+        # Buttons for right
+        rbtns = ttk.Frame(right_col)
+        rbtns.pack(fill='x', pady=(6,0))
+        ttk.Button(rbtns, text='Add', command=lambda: self._cn_add_node('right')).pack(side='left')
+        ttk.Button(rbtns, text='Rename', command=lambda: self._cn_rename_node('right')).pack(side='left', padx=6)
+        ttk.Button(rbtns, text='Delete', command=lambda: self._cn_delete_node('right')).pack(side='left')
+
+        # Pairs section
+        pair_box = ttk.Frame(frame)
+        pair_box.pack(fill='x', pady=(8,0))
+        ttk.Label(pair_box, text='Pairs (one-to-one)').grid(row=0, column=0, columnspan=4, sticky='w')
+        ttk.Label(pair_box, text='Left').grid(row=1, column=0, sticky='w')
+        ttk.Label(pair_box, text='Right').grid(row=1, column=1, sticky='w')
+        self.cn_left_sel = ttk.Combobox(pair_box, state='readonly')
+        self.cn_right_sel = ttk.Combobox(pair_box, state='readonly')
+        self.cn_left_sel.grid(row=2, column=0, sticky='ew', padx=(0,6))
+        self.cn_right_sel.grid(row=2, column=1, sticky='ew', padx=(6,0))
+        pair_box.columnconfigure(0, weight=1)
+        pair_box.columnconfigure(1, weight=1)
+        ttk.Button(pair_box, text='Add Pair', command=lambda: self._cn_add_pair()).grid(row=2, column=2, padx=8)
+
+        self.cn_pairs_list = tk.Listbox(pair_box, height=6)
+        self._style_listbox(self.cn_pairs_list)
+        self.cn_pairs_list.grid(row=3, column=0, columnspan=3, sticky='nsew', pady=(6,0))
+        pair_box.rowconfigure(3, weight=1)
+        ttk.Button(pair_box, text='Remove Selected Pair', command=lambda: self._cn_remove_pair()).grid(row=4, column=2, pady=6, sticky='e')
+
+        def refresh_pair_selects():
+            self.cn_left_sel['values'] = [f"{n['id']} — {n['label']}" for n in self.cn_left]
+            self.cn_right_sel['values'] = [f"{n['id']} — {n['label']}" for n in self.cn_right]
+
+        def refresh_pairs():
+            self.cn_pairs_list.delete(0, tk.END)
+            id_to_label_l = {n['id']: n['label'] for n in self.cn_left}
+            id_to_label_r = {n['id']: n['label'] for n in self.cn_right}
+            for pr in self.cn_pairs:
+                ltxt = f"{pr['leftId']} — {id_to_label_l.get(pr['leftId'], '')}"
+                rtxt = f"{pr['rightId']} — {id_to_label_r.get(pr['rightId'], '')}"
+                self.cn_pairs_list.insert(tk.END, f"{ltxt}  ↔  {rtxt}")
+            refresh_pair_selects()
+
+        # Methods used by buttons (bound to self so other methods can call)
+        self._cn_refresh_lists = refresh_lists
+        self._cn_refresh_pairs = refresh_pairs
+
+    def _bind_connect_nodes_form(self, q):
+        data = _normalize_connect_nodes(q or {})
+        # Keep state
+        self.cn_left = data['leftNodes'][:]
+        self.cn_right = data['rightNodes'][:]
+        self.cn_pairs = data['correctPairs'][:]
+        self.cn_left_sel.set('')
+        self.cn_right_sel.set('')
+        self._cn_refresh_lists()
 
     def select_image(self):
         p = filedialog.askopenfilename(title='Select image', filetypes=[('Image files','*.png;*.jpg;*.jpeg;*.gif;*.webp;*.svg'),('All files','*.*')])
@@ -1011,36 +4183,134 @@ class EditorApp:
         ttk.Button(frm, text='Close', command=win.destroy).pack(pady=6, anchor='e')
 
     def save_question(self):
-        if not self.current_course:
-            messagebox.showerror('Error', 'Select a course')
-            return
-        if not self.topic_cmb.get():
+        if self._active_tab is None:
             messagebox.showerror('Error', 'Select or create a topic')
             return
+        if self._still_loading():
+            return
         q = self.build_question_from_form()
         ok, msg = validate_question(q)
         if not ok:
             messagebox.showerror('Validation error', msg)
             return
         # Copy images into images/<course>/<topic>/ and set relative JSON image path(s)
-        topic_id = self.current_topic.get('topic_id') or self.topic_cmb.get()
-        if q.get('image'):
-            rel_img = copy_image_into_course(self.current_course, topic_id, q['image'])
-            q['image'] = rel_img
-        if q.get('explanation_image'):
-            rel_expl_img = copy_image_into_course(self.current_course, topic_id, q['explanation_image'])
-            q['explanation_image'] = rel_expl_img
-        # Upsert into list
-        if self.selected_question_index is not None:
-            self.current_topic['questions'][self.selected_question_index] = q
+        # or, with "Dedupe images", into the shared images/cas/ store (on the I/O worker)
+        course = self.current_course
+        topic = self.current_topic
+        tab = self._tabs[self._active_tab]
+        topic_id = topic.get('topic_id') or tab['topic_id']
+        cas = bool(self.cas_images_var.get())
+        idx = self.selected_question_index
+        images = {k: q[k] for k in ('image', 'explanation_image') if q.get(k)}
+        if not images:
+            self._upsert_question(topic, idx, q)
+            return
+
+        def copy():
+            return {k: copy_image_into_course(course, topic_id, v, content_addressed=cas) for k, v in images.items()}
+
+        # Until the copy is done neither the tab nor the editor can be closed, so the
+        # question always has a topic to go to
+        tab['pending_images'] = tab.get('pending_images', 0) + 1
+
+        def settle():
+            tab['pending_images'] -= 1
+
+        def failed(err):
+            settle()
+            self.set_status(f'Error: {err}')
+            messagebox.showerror('Error', f'Copying images failed; question {q.get("id")} was not saved: {err}')
+
+        def done(rel_paths):
+            settle()
+            q.update(rel_paths)
+            for rel_img in rel_paths.values():
+                self._pending_asset_paths.add(rel_img if rel_img.startswith('images/') else f'images/{course}/{rel_img}')
+            self._upsert_question(topic, idx, q)
+
+        self.run_io('image', copy, on_done=done, on_error=failed, status='Copying images…', write=True)
+
+    def _upsert_question(self, topic, idx, q):
+        # Upsert into list; only the affected row is redrawn
+        if topic is not self.current_topic:
+            # The user switched tabs while images were copied; keep the edit with its topic
+            if idx is not None and idx < len(topic['questions']):
+                op = ('set', idx, topic['questions'][idx], q)
+                topic['questions'][idx] = q
+            else:
+                idx = len(topic['questions'])
+                op = ('insert', idx, q)
+                topic['questions'].append(q)
+            # Still open: tabs are not closed while their images copy
+            t = next(t for t, tab in self._tabs.items() if tab['state'] and tab['state']['current_topic'] is topic)
+            st, (course, rel_file) = self._tabs[t]['state'], self._tabs[t]['key']
+            st['history'].record(op)
+            st['search_index'].add(idx, q)
+            try:
+                append_journal(course, self._tabs[t]['topic_id'], rel_file, {'op': 'upsert', 'index': idx, 'question': q})
+            except Exception as e:
+                print('Journal write failed:', e)
+            self._update_tab_title(t)
+            self.set_status(f'Question {q["id"]} saved to {self._tab_label(t)}')
+            return
+        if idx is not None:
+            self.history.record(('set', idx, self.current_topic['questions'][idx], q))
+            self.current_topic['questions'][idx] = q
+            self.q_list.update_row(idx)
         else:
             self.current_topic['questions'].append(q)
-            self.selected_question_index = len(self.current_topic['questions']) - 1
-        self.refresh_question_list()
+            idx = len(self.current_topic['questions']) - 1
+            self.history.record(('insert', idx, q))
+            self.q_list.set_count(len(self.current_topic['questions']), keep_cache=True)
+        self._journal({'op': 'upsert', 'index': idx, 'question': q})
+        self.selected_question_index = idx
+        self.search_index.add(idx, q)
+        self._schedule_search()
+        self.q_list.selection_set(idx)
+        self.q_list.see(idx)
         messagebox.showinfo('Saved', f'Question {q["id"]} saved to topic (not yet written to file). Click "Save Topic File" to write JSON.')
 
 
-if __name__ == '__main__':
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Mastery Quiz editor (GUI by default)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Print import/UI/data-load timings to stderr once the first topic is shown')
+    sub = parser.add_subparsers(dest='command')
+    p_val = sub.add_parser('validate', help='Validate all topics headlessly and print a report')
+    p_val.add_argument('--jobs', type=int, default=None, help='Worker processes (default: CPU count)')
+    p_val.add_argument('--format', choices=['ndjson', 'json'], default='ndjson', help='Report format (default: ndjson)')
+    p_val.add_argument('--no-cache', action='store_true', help='Ignore and do not update the validation cache')
+    p_val.add_argument('--timings', action='store_true', help='Print per-file validation time (slowest first) to stderr')
+    p_val.set_defaults(func=cmd_validate)
+    p_shard = sub.add_parser('shard', help='Split a large topic into shard files (or merge it back)')
+    p_shard.add_argument('course', help='Course id')
+    p_shard.add_argument('topic', help='Topic id from topics.json')
+    p_shard.add_argument('--size', type=int, default=SHARD_SIZE,
+                         help=f'Questions per shard (default: {SHARD_SIZE})')
+    p_shard.add_argument('--undo', action='store_true', help='Merge the shards back into one JSON file')
+    p_shard.set_defaults(func=cmd_shard)
+    p_compact = sub.add_parser('compact', help='Fold patch-save write logs into their topic files')
+    p_compact.add_argument('--course', action='append', help='Only this course (repeatable)')
+    p_compact.set_defaults(func=cmd_compact)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if getattr(args, 'func', None):
+        return args.func(args)
+    _import_gui()
+    profile = None
+    if args.profile_startup:
+        profile = StartupProfile(_IMPORT_T0)
+        profile.mark('imports')
     root = tk.Tk()
-    app = EditorApp(root)
+    if profile:
+        profile.mark('Tk init')
+    EditorApp(root, profile=profile)
     root.mainloop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
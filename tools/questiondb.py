@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+ Local SQLite mirror of the question bank (standard library only)
+- `sync` mirrors data/ (courses.json -> topics.json -> topic files, write logs and shards
+  included) into tools/.cache/questions.sqlite. Topics whose content hash is unchanged
+  are skipped, so re-syncing after an edit only re-imports the edited topics
+- Questions are indexed by course, topic, type, id and image paths, and their text
+  (question, options, answers, explanation) is searchable through FTS5, folding case
+  and diacritics like the editor's search
+- `query` filters questions from the command line; `sql` runs any read-only statement
+  (json_extract() works on the stored question JSON)
+- `export` writes the mirror back out in the data/ layout that load_topic_file reads.
+  Output depends only on the database, so exporting an unchanged mirror reproduces
+  editor-written files byte for byte
+
+Run: python tools/questiondb.py sync
+     python tools/questiondb.py query --course os --type mc_multi --has-image
+     python tools/questiondb.py query --text 'explanation:P3'
+     python tools/questiondb.py sql "SELECT type, count(*) FROM questions GROUP BY type"
+     python tools/questiondb.py export /tmp/data [--course ID ...]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from editor import (CACHE_DIR, DATA_DIR, dump_json_bytes, encode_topic, is_sharded_topic, load_shard_manifest,
+                    load_topic_file, question_search_fields, read_shard, shard_digest, site_image_path,
+                    topic_digest, write_bytes_atomic)
+
+DB_PATH = os.path.join(CACHE_DIR, 'questions.sqlite')
+# Bump when the schema changes; an older mirror is dropped and rebuilt by the next sync
+SCHEMA_VERSION = 1
+
+# Top-level JSON documents are stored with their list replaced by null (keeping key
+# order) and the list items as rows, so export can put them back exactly
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE courses (
+    course TEXT PRIMARY KEY,
+    pos INTEGER NOT NULL,
+    entry TEXT NOT NULL,    -- courses.json entry
+    header TEXT             -- topics.json with "topics": null; NULL when it is missing
+);
+CREATE TABLE topics (
+    course TEXT NOT NULL,
+    file TEXT NOT NULL,
+    topic TEXT,
+    pos INTEGER NOT NULL,
+    entry TEXT NOT NULL,    -- topics.json entry
+    header TEXT,            -- topic file with "questions" (shard manifest: "shards") null
+    digest TEXT,            -- topic_digest() at the last import
+    PRIMARY KEY (course, file)
+);
+CREATE TABLE questions (
+    qid INTEGER PRIMARY KEY,
+    course TEXT NOT NULL,
+    topic TEXT,
+    file TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    shard TEXT,             -- shard file of a sharded topic
+    id TEXT,
+    type TEXT,
+    image TEXT,             -- site-root-relative, as resolved by js/data.js
+    explanation_image TEXT,
+    body TEXT NOT NULL      -- the question as JSON
+);
+CREATE INDEX questions_course ON questions (course, topic);
+CREATE INDEX questions_file ON questions (course, file, pos);
+CREATE INDEX questions_type ON questions (type);
+CREATE INDEX questions_id ON questions (id);
+CREATE INDEX questions_image ON questions (image);
+CREATE INDEX questions_explanation_image ON questions (explanation_image);
+CREATE VIRTUAL TABLE question_text USING fts5(
+    id, question, options, answers, explanation,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+'''
+
+
+def connect(path=None, readonly=False):
+    path = path or DB_PATH
+    if readonly:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'No question database at {path}; run "questiondb.py sync" first')
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        version = conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+    except sqlite3.DatabaseError:
+        version = None
+    if version is None or version[0] != str(SCHEMA_VERSION):
+        # Only a mirror: start over rather than migrate
+        conn.close()
+        os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("INSERT INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+    return conn
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _read_topic(course_id, rel_file):
+    """(header, [(shard file or None, question)]) of one topic file."""
+    if is_sharded_topic(rel_file):
+        manifest = load_shard_manifest(course_id, rel_file)
+        rows = [(s['file'], q) for s in manifest['shards'] for q in read_shard(course_id, s)]
+        return dict(manifest, shards=None), rows
+    topic = load_topic_file(course_id, rel_file)
+    return dict(topic, questions=None), [(None, q) for q in topic.get('questions', [])]
+
+
+def _drop_questions(conn, course_id, rel_file=None):
+    where, args = ('course = ? AND file = ?', (course_id, rel_file)) if rel_file else ('course = ?', (course_id,))
+    conn.execute(f'DELETE FROM question_text WHERE rowid IN (SELECT qid FROM questions WHERE {where})', args)
+    conn.execute(f'DELETE FROM questions WHERE {where}', args)
+
+
+def _import_topic(conn, course_id, topic_id, rel_file, rows):
+    for pos, (shard, q) in enumerate(rows):
+        d = q if isinstance(q, dict) else {}
+        images = [site_image_path(course_id, d[k]) if d.get(k) else None for k in ('image', 'explanation_image')]
+        cur = conn.execute(
+            'INSERT INTO questions (course, topic, file, pos, shard, id, type, image, explanation_image, body) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (course_id, topic_id, rel_file, pos, shard, None if d.get('id') is None else str(d['id']),
+             d.get('type'), *images, _dumps(q)))
+        fields = question_search_fields(d)
+        conn.execute('INSERT INTO question_text (rowid, id, question, options, answers, explanation) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     (cur.lastrowid, fields['id'], fields['question'], fields['options'], fields['answers'],
+                      fields['explanation']))
+
+
+def sync(conn):
+    """Bring the mirror in line with data/ in one transaction.
+    Returns {topics, imported, questions, errors: [message]}.
+    """
+    stats = {'topics': 0, 'imported': 0, 'errors': []}
+    with open(os.path.join(DATA_DIR, 'courses.json'), 'r', encoding='utf-8') as f:
+        courses_json = json.load(f)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('courses', ?)", (_dumps(dict(courses_json, courses=None)),))
+        known = {cid for (cid,) in conn.execute('SELECT course FROM courses')}
+        seen_courses = set()
+        for cpos, c in enumerate(courses_json.get('courses', [])):
+            cid = c.get('id')
+            seen_courses.add(cid)
+            try:
+                with open(os.path.join(DATA_DIR, cid, 'topics.json'), 'r', encoding='utf-8') as f:
+                    topics_json = json.load(f)
+            except (OSError, ValueError) as e:
+                stats['errors'].append(f'{cid}/topics.json: {e}')
+                topics_json = None
+            conn.execute('INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?)',
+                         (cid, cpos, _dumps(c), None if topics_json is None else _dumps(dict(topics_json, topics=None))))
+            digests = dict(conn.execute('SELECT file, digest FROM topics WHERE course = ?', (cid,)).fetchall())
+            seen = set()
+            for tpos, t in enumerate((topics_json or {}).get('topics', [])):
+                rel_file = t.get('file')
+                if not rel_file or rel_file in seen:
+                    stats['errors'].append(f'{cid}/topics.json: skipped entry {t.get("id")!r} without a unique file')
+                    continue
+                seen.add(rel_file)
+                stats['topics'] += 1
+                digest = topic_digest(cid, rel_file)
+                if rel_file in digests and digest is not None and digests[rel_file] == digest:
+                    conn.execute('UPDATE topics SET topic = ?, pos = ?, entry = ? WHERE course = ? AND file = ?',
+                                 (t.get('id'), tpos, _dumps(t), cid, rel_file))
+                    conn.execute('UPDATE questions SET topic = ? WHERE course = ? AND file = ?',
+                                 (t.get('id'), cid, rel_file))
+                    continue
+                header, rows = None, []
+                if digest is not None:
+                    try:
+                        header, rows = _read_topic(cid, rel_file)
+                    except (OSError, ValueError) as e:
+                        # Left as last imported; retried by the next sync
+                        stats['errors'].append(f'{cid}/{rel_file}: {e}')
+                        if rel_file in digests:
+                            continue
+                        digest = None
+                _drop_questions(conn, cid, rel_file)
+                conn.execute('INSERT OR REPLACE INTO topics VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (cid, rel_file, t.get('id'), tpos, _dumps(t), None if header is None else _dumps(header), digest))
+                _import_topic(conn, cid, t.get('id'), rel_file, rows)
+                stats['imported'] += 1
+            for rel_file in set(digests) - seen:
+                _drop_questions(conn, cid, rel_file)
+                conn.execute('DELETE FROM topics WHERE course = ? AND file = ?', (cid, rel_file))
+        for cid in known - seen_courses:
+            _drop_questions(conn, cid)
+            conn.execute('DELETE FROM topics WHERE course = ?', (cid,))
+            conn.execute('DELETE FROM courses WHERE course = ?', (cid,))
+    stats['questions'] = conn.execute('SELECT count(*) FROM questions').fetchone()[0]
+    return stats
+
+
+def query(conn, course=None, topic=None, qtype=None, qid=None, image=None, has_image=False, text=None, limit=None):
+    """Questions matching every given filter as dicts, in data-tree order (best FTS match
+    first with text). image is a glob matched against both image fields."""
+    where, args = [], []
+    for column, value in (('q.course', course), ('q.topic', topic), ('q.type', qtype), ('q.id', qid)):
+        if value is not None:
+            where.append(f'{column} = ?')
+            args.append(value)
+    if image is not None:
+        where.append('(q.image GLOB ? OR q.explanation_image GLOB ?)')
+        args += [image, image]
+    if has_image:
+        where.append('(q.image IS NOT NULL OR q.explanation_image IS NOT NULL)')
+    order = 'c.pos, t.pos, q.pos'
+    join = ''
+    if text is not None:
+        join = 'JOIN question_text ON question_text.rowid = q.qid'
+        where.append('question_text MATCH ?')
+        args.append(text)
+        order = 'question_text.rank, ' + order
+    sql = (f'SELECT q.course, q.topic, q.file, q.pos, q.body FROM questions q '
+           f'JOIN courses c ON c.course = q.course JOIN topics t ON t.course = q.course AND t.file = q.file {join} '
+           f'{"WHERE " + " AND ".join(where) if where else ""} ORDER BY {order}')
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    return [{'course': cid, 'topic': tid, 'file': rel_file, 'index': pos, 'question': json.loads(body)}
+            for cid, tid, rel_file, pos, body in conn.execute(sql, args)]
+
+
+def _topic_files(conn, course_id, rel_file, header):
+    """{relative path: bytes} of one topic as load_topic_file expects it."""
+    rows = conn.execute('SELECT shard, body FROM questions WHERE course = ? AND file = ? ORDER BY pos',
+                        (course_id, rel_file)).fetchall()
+    questions = [json.loads(body) for _shard, body in rows]
+    if not is_sharded_topic(rel_file):
+        return {rel_file: encode_topic(rel_file, dict(header, questions=questions))}
+    out, shards = {}, []
+    for (shard, _body), q in zip(rows, questions):
+        if not shards or shards[-1][0] != shard:
+            shards.append((shard, []))
+        shards[-1][1].append(q)
+    entries = []
+    for shard, qs in shards:
+        payload = dump_json_bytes({'questions': qs})
+        out[shard] = payload
+        entries.append({'file': shard, 'count': len(qs), 'sha': shard_digest(payload)})
+    out[rel_file] = dump_json_bytes(dict(header, shards=entries))
+    return out
+
+
+def export(conn, out_dir, course_ids=None):
+    """Write courses.json, topics.json and topic files under out_dir (data/ layout).
+    Returns the number of files actually written (identical files are left alone)."""
+    written = 0
+
+    def put(rel, payload):
+        nonlocal written
+        if write_bytes_atomic(os.path.join(out_dir, rel.replace('/', os.sep)), payload):
+            written += 1
+
+    courses_header = json.loads(conn.execute("SELECT value FROM meta WHERE key = 'courses'").fetchone()[0])
+    courses = conn.execute('SELECT course, entry, header FROM courses ORDER BY pos').fetchall()
+    if course_ids is None:
+        put('courses.json', dump_json_bytes(dict(courses_header, courses=[json.loads(e) for _c, e, _h in courses])))
+    for cid, _entry, header in courses:
+        if course_ids is not None and cid not in course_ids or header is None:
+            continue
+        topics = conn.execute('SELECT file, entry, header FROM topics WHERE course = ? ORDER BY pos', (cid,)).fetchall()
+        put(f'{cid}/topics.json', dump_json_bytes(dict(json.loads(header), topics=[json.loads(e) for _f, e, _h in topics])))
+        for rel_file, _entry, theader in topics:
+            if theader is None:
+                continue  # the topic file was missing
+            for rel, payload in _topic_files(conn, cid, rel_file, json.loads(theader)).items():
+                put(f'{cid}/{rel}', payload)
+    return written
+
+
+# ---------- CLI ----------
+
+def cmd_sync(args):
+    conn = connect(args.db)
+    stats = sync(conn)
+    for msg in stats['errors']:
+        print(msg, file=sys.stderr)
+    print(f"{stats['questions']} questions from {stats['topics']} topics in {args.db} "
+          f"({stats['imported']} re-imported)")
+    return 1 if stats['errors'] else 0
+
+
+def cmd_query(args):
+    conn = connect(args.db, readonly=True)
+    try:
+        rows = query(conn, course=args.course, topic=args.topic, qtype=args.type, qid=args.id, image=args.image,
+                     has_image=args.has_image, text=args.text, limit=args.limit)
+    except sqlite3.OperationalError as e:
+        print(f'Query failed: {e}', file=sys.stderr)
+        return 2
+    if args.format == 'json':
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    elif args.format == 'ndjson':
+        for rec in rows:
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + '\n')
+    else:
+        for rec in rows:
+            q = rec['question'] if isinstance(rec['question'], dict) else {}
+            text = ' '.join(str(q.get('question') or '').split())
+            print(f"{rec['course']}/{rec['topic']}\t{q.get('id')}\t{q.get('type')}\t{text[:80]}")
+    print(f'{len(rows)} question(s)', file=sys.stderr)
+    return 0
+
+
+def cmd_sql(args):
+    conn = connect(args.db, readonly=True)
+    try:
+        cur = conn.execute(args.statement)
+    except sqlite3.Error as e:
+        print(f'SQL failed: {e}', file=sys.stderr)
+        return 2
+    if cur.description:
+        print('\t'.join(d[0] for d in cur.description))
+    for row in cur:
+        print('\t'.join('' if v is None else str(v) for v in row))
+    return 0
+
+
+def cmd_export(args):
+    conn = connect(args.db, readonly=True)
+    written = export(conn, args.out_dir, args.course)
+    print(f'{written} file(s) written to {args.out_dir}')
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='SQLite mirror of the question bank in data/')
+    parser.add_argument('--db', default=DB_PATH, help=f'Database file (default: {os.path.relpath(DB_PATH)})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_s = sub.add_parser('sync', help='Mirror data/ into the database (only changed topics are re-imported)')
+    p_s.set_defaults(func=cmd_sync)
+    p_q = sub.add_parser('query', help='List questions matching all given filters')
+    p_q.add_argument('--course', help='Course id')
+    p_q.add_argument('--topic', help='Topic id')
+    p_q.add_argument('--type', help='Question type, e.g. mc_multi')
+    p_q.add_argument('--id', help='Question id')
+    p_q.add_argument('--image', help='Glob on the image paths, e.g. "images/os/*"')
+    p_q.add_argument('--has-image', action='store_true', help='Only questions with an image or explanation image')
+    p_q.add_argument('--text', help='FTS5 query on id, question, options, answers and explanation '
+                                    '(e.g. "strankovanie", "explanation:P3")')
+    p_q.add_argument('--limit', type=int, default=None, help='At most this many results')
+    p_q.add_argument('--format', choices=['table', 'ndjson', 'json'], default='table',
+                     help='Output format (default: table)')
+    p_q.set_defaults(func=cmd_query)
+    p_sql = sub.add_parser('sql', help='Run a read-only SQL statement and print tab-separated rows')
+    p_sql.add_argument('statement')
+    p_sql.set_defaults(func=cmd_sql)
+    p_e = sub.add_parser('export', help='Write the mirror back out in the data/ layout')
+    p_e.add_argument('out_dir', help='Target folder (e.g. a scratch copy of data/)')
+    p_e.add_argument('--course', action='append', help='Course id (repeatable; default: all courses)')
+    p_e.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except FileNotFoundError as e:
+        # No database yet (query/sql/export) or no data/courses.json (sync)
+        print(e, file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+ Unit tests for build.py (standard library only)
+
+Run: npm test
+"""
+import gzip
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import build  # noqa: E402
+import editor  # noqa: E402
+from test_editor import TempTreeTestCase, make_question  # noqa: E402
+
+
+class BundleTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        pic = dict(make_question(1), image='basics/pic.png', explanation_image='images/cas/ab/ab.png')
+        self.write_course('c', {'basics': [make_question(0), pic], 'more': [make_question(2)]})
+
+    def read_bundle(self):
+        with open(build.bundle_path('c'), 'rb') as f:
+            payload = f.read()
+        with open(build.bundle_path('c') + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), payload)
+        return json.loads(payload)
+
+    def test_bundle_matches_what_the_site_builds(self):
+        build.write_course_bundle('c')
+        bundle = self.read_bundle()
+        self.assertEqual(bundle['format'], build.BUNDLE_FORMAT)
+        self.assertEqual([t['id'] for t in bundle['topics']], ['basics', 'more'])
+        self.assertEqual([q['id'] for q in bundle['questions']], ['basics::q0', 'basics::q1', 'more::q2'])
+        q = bundle['questions'][1]
+        self.assertEqual((q['_topicId'], q['_topicName']), ('basics', 'Basics'))
+        self.assertEqual(q['image'], 'images/c/basics/pic.png')
+        self.assertEqual(q['explanation_image'], 'images/cas/ab/ab.png')
+
+    def test_rewrite_only_when_content_changes(self):
+        self.assertTrue(build.write_course_bundle('c'))
+        self.assertEqual(build.write_course_bundle('c'), [])
+        editor.save_topic_file('c', 'topic/more.json', {'topic_id': 'more', 'questions': []})
+        self.assertIn(build.bundle_path('c'), build.write_course_bundle('c'))
+        self.assertEqual(len(self.read_bundle()['questions']), 2)
+
+    def test_sharded_topics_are_listed_not_inlined(self):
+        topics = editor.load_topics('c')
+        topics['topics'].append({'id': 'big', 'file': 'topic/big.shards.json'})
+        editor.save_topics_json('c', topics)
+        editor.save_sharded_topic('c', 'topic/big.shards.json',
+                                  {'topic_id': 'big', 'questions': [make_question(i) for i in range(5)]})
+        build.write_course_bundle('c')
+        bundle = self.read_bundle()
+        self.assertEqual(bundle['topics'][-1], {'id': 'big', 'file': 'topic/big.shards.json',
+                                                'topic_name': 'big', 'sharded': True})
+        self.assertEqual(len(bundle['questions']), 3)
+
+
+class ManifestTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_course('c', {'basics': [make_question(0)]})
+        os.makedirs(os.path.join(editor.IMAGES_DIR, 'c', 'basics'))
+        self.write(os.path.join(editor.IMAGES_DIR, 'c', 'basics', 'pic.png'), b'png bytes')
+
+    def write(self, path, payload):
+        with open(path, 'wb') as f:
+            f.write(payload)
+
+    def read_logical(self, logical):
+        with open(os.path.join(self.root, *logical.split('/')), 'rb') as f:
+            return f.read()
+
+    def test_every_asset_gets_a_content_hashed_copy(self):
+        files = build.build_manifest()
+        self.assertEqual(sorted(files), ['data/c/topic/basics.json', 'data/c/topics.json',
+                                         'data/courses.json', 'images/c/basics/pic.png'])
+        self.assertEqual(build.load_manifest(), files)
+        for logical, hashed in files.items():
+            digest = editor.file_sha256(os.path.join(self.root, *logical.split('/')))
+            self.assertEqual(hashed, build.hashed_name(logical, digest))
+            self.assertEqual(self.read_logical(hashed), self.read_logical(logical))
+
+    def test_update_rehashes_only_changed_paths(self):
+        self.assertEqual(build.update_manifest(['data/courses.json']), [])  # no manifest yet
+        before = build.build_manifest()
+        pic = 'images/c/basics/pic.png'
+        self.write(os.path.join(self.root, *pic.split('/')), b'new png bytes')
+        self.assertEqual(build.update_manifest([pic, 'data/courses.json']), [pic])
+        after = build.load_manifest()
+        self.assertNotEqual(after[pic], before[pic])
+        self.assertEqual(self.read_logical(after[pic]), b'new png bytes')
+        # The superseded copy is removed once nothing refers to it
+        self.assertFalse(os.path.exists(os.path.join(self.root, *before[pic].split('/'))))
+
+    def test_rebuild_prunes_copies_of_deleted_files(self):
+        before = build.build_manifest()
+        os.remove(os.path.join(editor.IMAGES_DIR, 'c', 'basics', 'pic.png'))
+        after = build.build_manifest()
+        self.assertNotIn('images/c/basics/pic.png', after)
+        self.assertFalse(os.path.exists(os.path.join(self.root, *before['images/c/basics/pic.png'].split('/'))))
+
+    def test_dot_files_and_compressed_siblings_are_not_listed(self):
+        self.write(os.path.join(editor.DATA_DIR, 'c', 'topic', '.basics.json.log'), b'{}')
+        build.write_course_bundle('c')
+        files = build.build_manifest()
+        self.assertIn('data/c/bundle.json', files)
+        self.assertNotIn('data/c/bundle.json.gz', files)
+        self.assertNotIn('data/c/topic/.basics.json.log', files)
+        # The precompressed sibling travels with its hashed copy
+        self.assertTrue(os.path.exists(os.path.join(self.root, *files['data/c/bundle.json'].split('/')) + '.gz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
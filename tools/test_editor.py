@@ -0,0 +1,868 @@
+#!/usr/bin/env python3
+"""
+ Unit tests for the headless parts of editor.py (standard library only, no Tk needed)
+
+Run: npm test
+     python -m unittest discover -s tools -p 'test_*.py'
+"""
+import copy
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import editor  # noqa: E402
+
+
+def make_question(i, text=None):
+    return {'id': f'q{i}', 'type': 'mc_single', 'question': text or f'Question {i}?',
+            'options': ['a', 'b', 'c'], 'correct': i % 3, 'explanation': f'Because {i}.'}
+
+
+class TempTreeTestCase(unittest.TestCase):
+    """Points editor.py (and build.py / questiondb.py when imported) at an empty project
+    tree in a temp directory; write_course() fills it."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        data = os.path.join(self.root, 'data')
+        images = os.path.join(self.root, 'images')
+        cache = os.path.join(self.root, 'tools', '.cache')
+        paths = {
+            'PROJECT_ROOT': self.root, 'DATA_DIR': data, 'IMAGES_DIR': images,
+            'CAS_DIR': os.path.join(images, 'cas'), 'CACHE_DIR': cache,
+            'VALIDATION_CACHE_PATH': os.path.join(cache, 'validation.json'),
+            'JOURNAL_DIR': os.path.join(cache, 'journal'), 'THUMB_DIR': os.path.join(cache, 'thumbs'),
+            'MANIFEST_PATH': os.path.join(data, 'manifest.json'), 'HASHED_DIR': os.path.join(self.root, 'hashed'),
+            'DB_PATH': os.path.join(cache, 'questions.sqlite'),
+        }
+        for name in ('editor', 'build', 'questiondb'):
+            module = sys.modules.get(name)
+            for attr, value in paths.items():
+                if module is not None and hasattr(module, attr):
+                    patcher = mock.patch.object(module, attr, value)
+                    patcher.start()
+                    self.addCleanup(patcher.stop)
+        os.makedirs(data)
+        os.makedirs(images)
+
+    def write_course(self, course_id, topics):
+        """topics: {topic_id: [question, ...]}, stored as topic/<topic_id>.json."""
+        courses_path = os.path.join(editor.DATA_DIR, 'courses.json')
+        try:
+            courses = editor.load_courses()
+        except FileNotFoundError:
+            courses = []
+        courses.append({'id': course_id, 'course_name': course_id.upper()})
+        editor.write_json_atomic(courses_path, {'courses': courses})
+        entries = []
+        for tid, questions in topics.items():
+            rel_file = f'topic/{tid}.json'
+            entries.append({'id': tid, 'file': rel_file})
+            editor.save_topic_file(course_id, rel_file, {'topic_id': tid, 'topic_name': tid.title(),
+                                                         'questions': questions})
+        editor.save_topics_json(course_id, {'course': course_id, 'course_name': course_id.upper(),
+                                            'topics': entries})
+
+
+class AtomicWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'sub', 'topic.json')
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_writes_and_skips_identical_content(self):
+        self.assertTrue(editor.write_bytes_atomic(self.path, b'one'))
+        mtime = os.stat(self.path).st_mtime_ns
+        self.assertFalse(editor.write_bytes_atomic(self.path, b'one'))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+        self.assertTrue(editor.write_bytes_atomic(self.path, b'two'))
+        self.assertEqual(self.read(), b'two')
+        # Same size, different bytes is still a change
+        self.assertTrue(editor.write_bytes_atomic(self.path, b'six'))
+        self.assertEqual(self.read(), b'six')
+
+    def test_failed_write_keeps_the_old_file(self):
+        editor.write_bytes_atomic(self.path, b'old')
+        with mock.patch.object(editor.os, 'replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                editor.write_bytes_atomic(self.path, b'new')
+        self.assertEqual(self.read(), b'old')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['topic.json'])
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_keeps_the_file_mode(self):
+        editor.write_bytes_atomic(self.path, b'old')
+        os.chmod(self.path, 0o640)
+        editor.write_bytes_atomic(self.path, b'new')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+
+    def test_json_uses_the_canonical_form(self):
+        data = {'topic_name': 'Pamäť', 'questions': []}
+        self.assertTrue(editor.write_json_atomic(self.path, data))
+        self.assertEqual(self.read(), editor.dump_json_bytes(data))
+        self.assertIn('Pamäť'.encode('utf-8'), self.read())
+        self.assertFalse(editor.write_json_atomic(self.path, dict(data)))
+
+
+class ImageImportTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.outside)
+
+    def picture(self, name, payload=b'png bytes'):
+        path = os.path.join(self.outside, name)
+        with open(path, 'wb') as f:
+            f.write(payload)
+        return path
+
+    def site_file(self, json_path, course_id='c'):
+        return os.path.join(self.root, *editor.site_image_path(course_id, json_path).split('/'))
+
+    def test_identical_files_are_stored_once(self):
+        a = editor.store_image_by_hash(self.picture('a.PNG'))
+        b = editor.copy_image_into_course('other', 't', self.picture('b.png'), content_addressed=True)
+        self.assertEqual(a, b)
+        self.assertRegex(a, r'^images/cas/([0-9a-f]{2})/\1[0-9a-f]{30}\.png$')
+        with open(self.site_file(a), 'rb') as f:
+            self.assertEqual(f.read(), b'png bytes')
+        self.assertNotEqual(editor.store_image_by_hash(self.picture('c.png', b'other')), a)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.site_file(a)))), 1)
+
+    def test_topic_folder_copy(self):
+        rel = editor.copy_image_into_course('c', 'basics', self.picture('pic.png'))
+        self.assertEqual(rel, 'basics/pic.png')
+        self.assertTrue(os.path.isfile(self.site_file(rel)))
+
+    def test_images_in_the_tree_are_referenced_not_copied(self):
+        stored = editor.store_image_by_hash(self.picture('a.png'))
+        self.assertEqual(editor.copy_image_into_course('c', 't', self.site_file(stored)), stored)
+        own = editor.copy_image_into_course('c', 'basics', self.picture('pic.png'))
+        self.assertEqual(editor.copy_image_into_course('c', 'other', self.site_file(own)), own)
+        self.assertEqual(editor.copy_image_into_course('d', 't', self.site_file(own)), 'images/c/basics/pic.png')
+        self.assertEqual(sorted(os.listdir(editor.IMAGES_DIR)), ['c', 'cas'])
+
+    def test_json_references_are_returned_unchanged(self):
+        # Relative values are never resolved against the working directory
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.outside)
+        self.picture('pic.png')
+        for value in ('pic.png', 'basics/pic.png', 'images/cas/ab/ab.png', 'https://example.com/x.png', ''):
+            self.assertEqual(editor.copy_image_into_course('c', 't', value), value)
+        self.assertEqual(os.listdir(editor.IMAGES_DIR), [])
+
+
+class QuestionIndexTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        pic = dict(make_question(3), id='Net-3', type='true_false', image='net/pic.png')
+        self.write_course('os', {'mem': [make_question(1), dict(make_question(2), id='Mem-2')]})
+        self.write_course('ps', {'net': [pic, make_question(1)]})
+        self.index = editor.QuestionIndex()
+
+    def ids(self, prefix, **kw):
+        return [(qid, loc.course, loc.index) for qid, loc in self.index.find_id_prefix(prefix, **kw)]
+
+    def test_lookups_build_the_index_once(self):
+        self.assertEqual(self.index.find_id('q1'), [editor.QuestionLocation('os', 'mem', 'topic/mem.json', 0),
+                                                    editor.QuestionLocation('ps', 'net', 'topic/net.json', 1)])
+        self.assertTrue(self.index.built)
+        self.assertEqual([loc.course for loc in self.index.of_type('true_false')], ['ps'])
+        self.assertEqual([loc.index for loc in self.index.referencing_image('images/ps/net/pic.png')], [0])
+
+    def test_prefix_lookup_ignores_case_and_is_sorted(self):
+        self.assertEqual(self.ids('m'), [('Mem-2', 'os', 1)])
+        self.assertEqual(self.ids('Q'), [('q1', 'os', 0), ('q1', 'ps', 1)])
+        self.assertEqual(self.ids(''), [('Mem-2', 'os', 1), ('Net-3', 'ps', 0), ('q1', 'os', 0), ('q1', 'ps', 1)])
+        self.assertEqual(self.ids('', limit=2), [('Mem-2', 'os', 1), ('Net-3', 'ps', 0)])
+        self.assertEqual(self.ids('x'), [])
+
+    def test_update_topic_replaces_only_that_topic(self):
+        self.index.ensure_built()
+        self.index.update_topic('os', 'mem', 'topic/mem.json', {'questions': [make_question(9)]})
+        self.assertEqual(self.ids('m'), [])
+        self.assertEqual(self.ids('q'), [('q1', 'ps', 1), ('q9', 'os', 0)])
+        self.index.remove_topic('ps', 'topic/net.json')
+        self.assertEqual(self.ids(''), [('q9', 'os', 0)])
+        self.assertEqual(self.index.of_type('true_false'), [])
+        self.assertEqual(self.index.referencing_image('images/ps/net/pic.png'), [])
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.questions = [
+            dict(make_question(0, 'Čo robí plánovač procesov?'), explanation='Prideľuje procesor.'),
+            dict(make_question(1, 'Stránkovanie pamäte'), options=['Rámec', 'Stránka']),
+            dict(make_question(2, 'Semafor a zámok'), explanation='Plánovanie nie je synchronizácia.'),
+        ]
+        self.index = editor.SearchIndex()
+        self.index.rebuild(enumerate(self.questions))
+
+    def keys(self, query):
+        return [key for _score, key in self.index.search(query)]
+
+    def test_fold_text_drops_case_and_diacritics(self):
+        self.assertEqual(editor.fold_text('Stránkovanie PAMÄTE ĽŠČŤŽ'), 'strankovanie pamate lsctz')
+        self.assertEqual(editor.tokenize('Čo robí, plánovač?'), ['co', 'robi', 'planovac'])
+
+    def test_queries_match_without_diacritics(self):
+        self.assertEqual(self.keys('strankovanie'), [1])
+        self.assertEqual(self.keys('RAMEC'), [1])
+        self.assertEqual(self.keys('zámok semafor'), [2])
+        self.assertEqual(self.keys('zamok pamat'), [])
+        self.assertEqual(self.keys('  '), [])
+
+    def test_last_term_matches_as_a_prefix_and_fields_are_weighted(self):
+        # "plánovač" in the question text outranks "plánovanie" in an explanation
+        self.assertEqual(self.keys('plano'), [0, 2])
+        self.assertEqual(self.keys('planovanie'), [2])
+
+    def test_add_and_remove_keep_the_index_current(self):
+        self.index.add(1, make_question(1, 'Deadlock'))
+        self.assertEqual(self.keys('strankovanie'), [])
+        self.assertEqual(self.keys('dead'), [1])
+        self.index.remove(1)
+        self.assertEqual(self.keys('dead'), [])
+        self.assertEqual(len(self.index), 2)
+
+
+class SearchSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.index = editor.SearchIndex()
+        self.index.rebuild((i, make_question(i, f'Proces {i} semafor')) for i in range(50))
+
+    def test_snapshot_keeps_the_state_it_was_taken_in(self):
+        view = self.index.snapshot()
+        self.index.add(3, make_question(3, 'Deadlock'))
+        self.index.add(60, make_question(60, 'Semafor navyše'))
+        self.index.remove(7)
+        before = {key for _score, key in view.search('semafor', limit=100)}
+        after = {key for _score, key in self.index.search('semafor', limit=100)}
+        self.assertEqual(before, set(range(50)))
+        self.assertEqual(after, set(range(50)) - {3, 7} | {60})
+        self.assertEqual(view.search('deadlock'), [])
+        # A second snapshot shares the buckets copied since the first one
+        view2 = self.index.snapshot()
+        self.index.remove(60)
+        self.assertIn(60, [key for _score, key in view2.search('navyse')])
+        self.index.rebuild([])
+        self.assertEqual(len(view2), 50)
+
+    def test_search_on_another_thread_while_editing(self):
+        import threading
+        errors = []
+        stop = threading.Event()
+
+        def searcher():
+            while not stop.is_set():
+                try:
+                    views[-1].search('semafor pro', limit=100)
+                except Exception as e:  # reported below
+                    errors.append(e)
+                    return
+
+        views = [self.index.snapshot()]
+        worker = threading.Thread(target=searcher)
+        worker.start()
+        try:
+            for n in range(2000):
+                self.index.add(n % 60, make_question(n, f'Proces {n} semafor proxy{n}'))
+                if n % 50 == 0:
+                    views.append(self.index.snapshot())
+        finally:
+            stop.set()
+            worker.join()
+        self.assertEqual(errors, [])
+
+
+class EditHistoryTest(unittest.TestCase):
+    def test_vector_matches_a_list_under_random_edits(self):
+        rnd = random.Random(3)
+        items = list(range(100))
+        vec = editor.PersistentVector.from_list(items)
+        for n in range(1000):
+            op = rnd.choice(('set', 'insert', 'delete'))
+            if op == 'insert' or not items:
+                i = rnd.randrange(len(items) + 1)
+                items.insert(i, -n)
+                vec = vec.insert(i, -n)
+            elif op == 'set':
+                i = rnd.randrange(len(items))
+                items[i] = -n
+                vec = vec.set(i, -n)
+            else:
+                i = rnd.randrange(len(items))
+                del items[i]
+                vec = vec.delete(i)
+        self.assertEqual(vec.to_list(), items)
+        self.assertEqual(list(vec), items)
+        self.assertEqual(len(vec), len(items))
+        self.assertEqual(vec[len(items) - 1], items[-1])
+        with self.assertRaises(IndexError):
+            vec[len(items)]
+
+    def test_versions_share_untouched_chunks(self):
+        old = editor.PersistentVector.from_list(range(10 * editor.PersistentVector.CHUNK))
+        new = old.set(5, 'x')
+        self.assertEqual(old[5], 5)
+        self.assertIsNot(new._chunks[0], old._chunks[0])
+        self.assertTrue(all(a is b for a, b in zip(new._chunks[1:], old._chunks[1:])))
+
+    def test_undo_redo_ops_replay_onto_the_editor_list(self):
+        qs = [make_question(i) for i in range(5)]
+        history = editor.EditHistory()
+        history.reset(qs)
+        live = list(qs)
+        for op in (('set', 1, qs[1], make_question(1, 'Edited?')), ('insert', 2, make_question(7)),
+                   ('delete', 0, qs[0])):
+            history.record(op)
+            editor.EditHistory.apply_to_list(live, op)
+        states = [history.current.to_list()]
+        while history.can_undo():
+            vec, op = history.undo()
+            editor.EditHistory.apply_to_list(live, op)
+            self.assertEqual(live, vec.to_list())
+            states.append(live[:])
+        self.assertEqual(live, qs)
+        self.assertIsNone(history.undo())
+        while history.can_redo():
+            vec, op = history.redo()
+            editor.EditHistory.apply_to_list(live, op)
+            self.assertEqual(live, vec.to_list())
+        self.assertEqual(live, states[0])
+        history.undo()
+        history.record(('delete', 0, live[0]))
+        self.assertFalse(history.can_redo())
+
+    def test_limit_drops_the_oldest_steps(self):
+        history = editor.EditHistory(limit=3)
+        history.reset([])
+        for n in range(5):
+            history.record(('insert', n, n))
+        steps = 0
+        while history.undo():
+            steps += 1
+        self.assertEqual((steps, history.current.to_list()), (3, [0, 1]))
+
+
+class TopicCacheTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_course('c', {t: [make_question(i) for i in range(3)] for t in ('a', 'b', 'd')})
+        self.cache = editor.TopicCache()
+
+    def rewrite(self, tid, questions):
+        path = editor.topic_path('c', f'topic/{tid}.json')
+        st = os.stat(path)
+        editor.save_topic_file('c', f'topic/{tid}.json', {'topic_id': tid, 'questions': questions})
+        # Coarse file system clocks: make sure the mtime moves
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    def test_hits_return_copies(self):
+        first = self.cache.load_topic('c', 'topic/a.json')
+        # The list is the caller's; question dicts are replaced, never mutated
+        first['questions'].append('junk')
+        first['questions'][0] = make_question(5)
+        first['topic_name'] = 'Renamed'
+        again = self.cache.load_topic('c', 'topic/a.json')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(again['questions'], [make_question(i) for i in range(3)])
+        self.assertEqual(again['topic_name'], 'A')
+
+    def test_changed_file_or_write_log_is_parsed_again(self):
+        self.cache.load_topic('c', 'topic/a.json')
+        self.rewrite('a', [make_question(9)])
+        self.assertEqual(self.cache.load_topic('c', 'topic/a.json')['questions'], [make_question(9)])
+        editor.append_topic_log('c', 'topic/a.json', [{'op': 'insert', 'index': 0, 'question': make_question(8)}])
+        self.assertEqual([q['id'] for q in self.cache.load_topic('c', 'topic/a.json')['questions']], ['q8', 'q9'])
+        self.assertEqual(self.cache.hits, 0)
+        topics = self.cache.load_topics('c')
+        self.assertEqual([t['id'] for t in topics['topics']], ['a', 'b', 'd'])
+        self.assertEqual([t['id'] for t in self.cache.load_topics('c')['topics']], ['a', 'b', 'd'])
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_least_recently_used_topic_is_evicted(self):
+        cost = os.path.getsize(editor.topic_path('c', 'topic/a.json')) * editor.TopicCache.PARSED_OVERHEAD
+        self.cache.max_bytes = 2 * cost
+        for tid in ('a', 'b', 'a', 'd'):
+            self.cache.load_topic('c', f'topic/{tid}.json')
+        self.assertEqual(list(self.cache._entries), [('c', 'topic/a.json'), ('c', 'topic/d.json')])
+        self.assertEqual(self.cache.used, 2 * cost)
+        # A topic larger than the whole budget is never cached
+        self.cache.max_bytes = cost - 1
+        self.cache.load_topic('c', 'topic/b.json')
+        self.assertNotIn(('c', 'topic/b.json'), self.cache._entries)
+
+    def test_streamed_topics_are_cached_at_the_end(self):
+        header = {}
+        streamed = list(self.cache.iter_topic('c', 'topic/b.json', header))
+        self.assertEqual(streamed, [make_question(i) for i in range(3)])
+        self.assertEqual(header, {'topic_id': 'b', 'topic_name': 'B', 'questions': None})
+        header = {}
+        self.assertEqual(list(self.cache.iter_topic('c', 'topic/b.json', header)), streamed)
+        self.assertEqual((self.cache.hits, header['topic_id']), (1, 'b'))
+
+
+class MergeQuestionsTest(unittest.TestCase):
+    def setUp(self):
+        self.base = [make_question(i) for i in range(4)]
+
+    def test_changes_on_both_sides_combine(self):
+        mine = copy.deepcopy(self.base)
+        mine[0]['question'] = 'Mine?'
+        mine.append(make_question(10))
+        theirs = copy.deepcopy(self.base)
+        theirs[2]['question'] = 'Theirs?'
+        del theirs[3]
+        entries, conflicts = editor.merge_questions(self.base, mine, theirs)
+        self.assertEqual(conflicts, {})
+        merged = [q for _key, q in entries if q is not None]
+        self.assertEqual([q['question'] for q in merged], ['Mine?', 'Question 1?', 'Theirs?', 'Question 10?'])
+
+    def test_same_question_changed_differently_conflicts(self):
+        mine = copy.deepcopy(self.base)
+        mine[1]['question'] = 'Mine?'
+        theirs = copy.deepcopy(self.base)
+        theirs[1]['question'] = 'Theirs?'
+        entries, conflicts = editor.merge_questions(self.base, mine, theirs)
+        self.assertEqual(len(conflicts), 1)
+        (key, (m, t)), = conflicts.items()
+        self.assertEqual((m['question'], t['question']), ('Mine?', 'Theirs?'))
+        # Our side is kept in place until the conflict is resolved
+        self.assertEqual(dict(entries)[key]['question'], 'Mine?')
+
+    def test_edit_against_delete_conflicts(self):
+        mine = copy.deepcopy(self.base)
+        mine[3]['question'] = 'Mine?'
+        _entries, conflicts = editor.merge_questions(self.base, mine, self.base[:3])
+        self.assertEqual([(m['question'], t) for m, t in conflicts.values()], [('Mine?', None)])
+
+
+class FileWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dirs = [tempfile.mkdtemp() for _ in range(2)]
+        for d in self.dirs:
+            self.addCleanup(shutil.rmtree, d, True)
+        self.paths = [os.path.join(d, 'topic.json') for d in self.dirs]
+        for p in self.paths:
+            self.write(p, '{}')
+
+    def write(self, path, text):
+        st = os.stat(path) if os.path.exists(path) else None
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        if st:
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    def watcher(self, use_inotify):
+        w = editor.FileWatcher(use_inotify=use_inotify)
+        if use_inotify and w.mode != 'inotify':
+            self.skipTest('inotify not available')
+        if w._inotify:
+            self.addCleanup(os.close, w._inotify.fd)
+        return w
+
+    def check_reports_external_changes_only(self, w):
+        w.watch_only(self.paths)
+        self.assertEqual(w.poll(), [])
+        self.write(self.paths[0], '{"a": 1}')
+        self.assertEqual(w.poll(), [self.paths[0]])
+        self.assertEqual(w.poll(), [])
+        # Our own save: suppressed while in flight, then acknowledged
+        w.suppress(self.paths[1])
+        self.write(self.paths[1], '{"b": 1}')
+        self.assertEqual(w.poll(), [])
+        w.acknowledge(self.paths[1])
+        self.assertEqual(w.poll(), [])
+
+    def test_polling(self):
+        self.check_reports_external_changes_only(self.watcher(False))
+
+    def test_inotify(self):
+        self.check_reports_external_changes_only(self.watcher(True))
+
+    def test_inotify_drops_watches_of_directories_left_behind(self):
+        w = self.watcher(True)
+        w.watch_only(self.paths)
+        self.assertEqual(sorted(w._inotify._dirs.values()), sorted(self.dirs))
+        w.watch_only(self.paths[1:])
+        self.assertEqual(list(w._inotify._dirs.values()), [self.dirs[1]])
+        self.write(self.paths[0], '{"a": 2}')
+        self.assertEqual(w.poll(), [])
+        # A deleted directory's watch is dropped by the kernel and forgotten
+        shutil.rmtree(self.dirs[1])
+        w.poll()
+        self.assertEqual(w._inotify._dirs, {})
+
+
+class StreamingTopicTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.topic = {
+            'topic_id': 'pam', 'topic_name': 'Pamäť \u201cquoted\u201d \\ "escaped"',
+            'questions': [
+                make_question(0),
+                dict(make_question(1, 'Čo je {rámec} [stránka], "tlačidlo"?'), correct=1234567890123),
+                {'id': 'q2', 'type': 'fill_table', 'question': 'Tabuľka', 'explanation': '',
+                 'table': {'answers': [['a', None], [True, False], [-1.5e-3, 0]]}},
+                make_question(3),
+            ],
+            'tags': ['after', 'questions'], 'version': 3,
+        }
+        self.write_course('c', {})
+        editor.write_json_atomic(editor.topic_path('c', 'topic/t.json'), self.topic)
+
+    def stream(self, rel_file='topic/t.json', **kw):
+        header = {}
+        return list(editor.iter_topic_file('c', rel_file, header, **kw)), header
+
+    def test_any_chunk_size_gives_json_load(self):
+        for chunk_size in (1, 2, 3, 7, 64, 64 * 1024):
+            questions, header = self.stream(chunk_size=chunk_size)
+            self.assertEqual(questions, self.topic['questions'], chunk_size)
+            self.assertEqual(list(header), ['topic_id', 'topic_name', 'questions', 'tags', 'version'])
+            self.assertEqual(header['topic_name'], self.topic['topic_name'])
+            self.assertEqual((header['questions'], header['tags'], header['version']), (None, ['after', 'questions'], 3))
+
+    def test_compact_and_empty_topics(self):
+        for text, questions, header in (
+                ('{"questions":[],"topic_id":"x"}', [], {'questions': None, 'topic_id': 'x'}),
+                ('{}', [], {}),
+                ('{"topic_id":7,"questions":[1,"two",null]}', [1, 'two', None], {'topic_id': 7, 'questions': None})):
+            with open(editor.topic_path('c', 'topic/t.json'), 'w', encoding='utf-8') as f:
+                f.write(text)
+            self.assertEqual(self.stream(chunk_size=2), (questions, header), text)
+
+    def test_truncated_or_malformed_files_raise(self):
+        good = editor.dump_json_bytes(self.topic).decode('utf-8')
+        for text in (good[:len(good) // 2], '[1, 2]', '{"questions": {"a": 1}}', '{"questions": [1 2]}', ''):
+            with open(editor.topic_path('c', 'topic/t.json'), 'w', encoding='utf-8') as f:
+                f.write(text)
+            with self.assertRaises(ValueError, msg=text):
+                self.stream(chunk_size=5)
+
+    def test_missing_file_and_write_log(self):
+        self.assertEqual(self.stream('topic/none.json'), ([], {'topic_id': '', 'topic_name': '', 'questions': None}))
+        editor.append_topic_log('c', 'topic/t.json', [{'op': 'delete', 'index': 0}])
+        questions, header = self.stream()
+        self.assertEqual(questions, self.topic['questions'][1:])
+        self.assertEqual(header['version'], 3)
+
+
+class ShardedTopicTest(TempTreeTestCase):
+    rel = 'topic/big.shards.json'
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(editor.DATA_DIR, 'c', 'topic'))
+        self.topic = {'topic_id': 'big', 'topic_name': 'Big',
+                      'questions': [make_question(i) for i in range(10)]}
+        editor.save_sharded_topic('c', self.rel, self.topic, shard_size=3)
+
+    def manifest(self):
+        return editor.load_shard_manifest('c', self.rel)
+
+    def shard_files(self):
+        return sorted(os.listdir(os.path.join(editor.DATA_DIR, 'c', 'topic', 'big')))
+
+    def load(self):
+        return editor.load_topic_file('c', self.rel)['questions']
+
+    def test_split_and_load(self):
+        self.assertEqual([s['count'] for s in self.manifest()['shards']], [3, 3, 3, 1])
+        self.assertEqual(self.load(), self.topic['questions'])
+
+    def test_edit_rewrites_one_shard_under_a_new_name(self):
+        before = [s['file'] for s in self.manifest()['shards']]
+        self.topic['questions'][4] = make_question(4, 'Edited?')
+        written = editor.save_sharded_topic('c', self.rel, self.topic)
+        after = [s['file'] for s in self.manifest()['shards']]
+        self.assertEqual([a == b for a, b in zip(before, after)], [True, False, True, True])
+        self.assertEqual(sorted(written), sorted([after[1], self.rel, before[1]]))
+        self.assertNotIn(os.path.basename(before[1]), self.shard_files())
+        self.assertEqual(self.load(), self.topic['questions'])
+
+    def test_insert_joins_the_shard_of_its_neighbour(self):
+        before = [s['file'] for s in self.manifest()['shards']]
+        self.topic['questions'].insert(1, make_question(100))
+        editor.save_sharded_topic('c', self.rel, self.topic)
+        shards = self.manifest()['shards']
+        self.assertEqual([s['count'] for s in shards], [4, 3, 3, 1])
+        self.assertEqual([s['file'] for s in shards][1:], before[1:])
+        self.assertEqual(self.load(), self.topic['questions'])
+
+    def test_unchanged_save_writes_nothing(self):
+        self.assertEqual(editor.save_sharded_topic('c', self.rel, self.topic), [])
+
+    def test_shard_edited_behind_the_manifest_is_rejected(self):
+        shard = self.manifest()['shards'][0]
+        with open(editor.topic_path('c', shard['file']), 'ab') as f:
+            f.write(b' ')
+        with self.assertRaises(ValueError):
+            self.load()
+
+
+class QuestionPatchTest(unittest.TestCase):
+    def assert_patches(self, old, new):
+        records = editor.question_patch(old, new)
+        topic = {'questions': copy.deepcopy(old)}
+        editor.replay_journal(topic, records)
+        self.assertEqual(topic['questions'], new)
+        return records
+
+    def test_no_change_gives_no_records(self):
+        qs = [make_question(i) for i in range(5)]
+        self.assertEqual(editor.question_patch(qs, copy.deepcopy(qs)), [])
+
+    def test_single_edit_is_one_upsert(self):
+        old = [make_question(i) for i in range(50)]
+        new = copy.deepcopy(old)
+        new[20]['question'] = 'Edited?'
+        records = self.assert_patches(old, new)
+        self.assertEqual([(r['op'], r['index']) for r in records], [('upsert', 20)])
+
+    def test_insert_delete_and_move(self):
+        old = [make_question(i) for i in range(10)]
+        new = old[:3] + [make_question(100)] + old[4:8] + [old[3]] + old[9:]
+        self.assert_patches(old, new)
+        self.assert_patches(old, [])
+        self.assert_patches([], old)
+
+    def test_random_edits_replay_to_the_new_list(self):
+        rnd = random.Random(7)
+        for _ in range(200):
+            old = [make_question(i) for i in range(rnd.randrange(12))]
+            new = copy.deepcopy(old)
+            for _ in range(rnd.randrange(6)):
+                op = rnd.choice(('edit', 'insert', 'delete', 'move'))
+                if op == 'insert' or not new:
+                    new.insert(rnd.randrange(len(new) + 1), make_question(rnd.randrange(1000, 2000)))
+                elif op == 'edit':
+                    new[rnd.randrange(len(new))]['question'] = f'Edited {rnd.random()}'
+                elif op == 'delete':
+                    del new[rnd.randrange(len(new))]
+                else:
+                    new.insert(rnd.randrange(len(new)), new.pop(rnd.randrange(len(new))))
+            self.assert_patches(old, new)
+
+
+class WriteLogTest(TempTreeTestCase):
+    rel = 'topic/a.json'
+
+    def setUp(self):
+        super().setUp()
+        self.questions = [make_question(i) for i in range(10)]
+        self.write_course('c', {'a': self.questions})
+        self.topic = editor.load_topic_file('c', self.rel)
+
+    def patch_save(self, questions):
+        new = dict(self.topic, questions=questions)
+        written = editor.save_topic_patch('c', self.rel, self.topic, new)
+        self.topic = new
+        return written
+
+    def edited(self, i, text):
+        qs = list(self.topic['questions'])
+        qs[i] = make_question(i, text)
+        return qs
+
+    def replace_file(self, questions):
+        # A new version of the topic file arriving from outside the editor (e.g. git)
+        editor.write_json_atomic(editor.topic_path('c', self.rel),
+                                 {'topic_id': 'a', 'topic_name': 'A', 'questions': questions})
+
+    def test_patch_save_appends_to_the_log(self):
+        before = editor.file_sha256(editor.topic_path('c', self.rel))
+        self.assertEqual(self.patch_save(self.edited(3, 'Edited?')), ['topic/.a.json.log'])
+        self.assertEqual(editor.file_sha256(editor.topic_path('c', self.rel)), before)
+        self.assertEqual(editor.load_topic_file('c', self.rel), self.topic)
+
+    def test_base_is_checked_by_content_when_the_stat_differs(self):
+        self.patch_save(self.edited(3, 'Edited?'))
+        path = editor.topic_path('c', self.rel)
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(editor.load_topic_file('c', self.rel), self.topic)
+
+    def test_log_of_a_replaced_file_is_set_aside_not_replayed(self):
+        self.patch_save(self.edited(3, 'Edited?'))
+        self.replace_file(self.questions[:5])
+        self.assertEqual(editor.load_topic_file('c', self.rel)['questions'], self.questions[:5])
+        self.assertFalse(os.path.exists(editor.topic_log_path('c', self.rel)))
+        self.assertEqual(editor.read_stale_topic_log('c', self.rel),
+                         [{'op': 'upsert', 'index': 3, 'question': make_question(3, 'Edited?')}])
+
+    def test_stale_log_is_never_overwritten(self):
+        self.patch_save(self.edited(3, 'Edited?'))
+        self.replace_file(self.questions[:8])
+        self.topic = editor.load_topic_file('c', self.rel)
+        self.patch_save(self.edited(4, 'Later?'))
+        self.replace_file(self.questions[:6])
+        # Neither a new patch save nor a full save may drop the second log either
+        editor.save_topic_file('c', self.rel, dict(self.topic, questions=self.questions[:2]))
+        self.assertEqual([r['question']['question'] for r in editor.read_stale_topic_log('c', self.rel)],
+                         ['Edited?', 'Later?'])
+        self.assertFalse(editor.compact_topic_log('c', self.rel))
+        editor.discard_stale_topic_log('c', self.rel)
+        self.assertEqual(editor.read_stale_topic_log('c', self.rel), [])
+
+    def test_interrupted_fold_is_recognised(self):
+        self.patch_save(self.edited(3, 'Edited?'))
+        payload = editor.encode_topic(self.rel, self.topic)
+        editor.mark_topic_log_folded('c', self.rel, hashlib.sha256(payload).hexdigest())
+        editor.write_bytes_atomic(editor.topic_path('c', self.rel), payload)
+        # Stopped before the log was removed: it is in the file, so it is neither replayed nor kept
+        self.assertEqual(editor.load_topic_file('c', self.rel), self.topic)
+        self.assertEqual(editor.read_stale_topic_log('c', self.rel), [])
+        self.patch_save(self.edited(5, 'Next?'))
+        self.assertEqual(editor.load_topic_file('c', self.rel), self.topic)
+
+    def test_compaction(self):
+        with mock.patch.object(editor, 'LOG_COMPACT_MIN', 0):
+            self.assertEqual(self.patch_save(self.edited(3, 'Edited?')), ['topic/.a.json.log'])
+            # A log past LOG_COMPACT_RATIO of the file is folded in by the save itself
+            self.assertEqual(self.patch_save(self.topic['questions'] + [make_question(i) for i in range(10, 20)]),
+                             [self.rel])
+        self.assertFalse(os.path.exists(editor.topic_log_path('c', self.rel)))
+        self.patch_save(self.edited(0, 'Edited?'))
+        self.assertEqual(editor.compact_topic_logs(), [('c', self.rel)])
+        with open(editor.topic_path('c', self.rel), 'rb') as f:
+            self.assertEqual(f.read(), editor.dump_json_bytes(self.topic))
+        self.assertEqual(editor.compact_topic_logs(), [])
+
+    def test_log_only_save_leaves_site_artifacts_alone(self):
+        import build
+        build.write_course_bundle('c')
+        bundle = build.bundle_path('c')
+        before = editor.file_signature(bundle)
+        written = self.patch_save(self.edited(3, 'Edited?'))
+        editor.refresh_site_artifacts('c', [f'data/c/{w}' for w in written])
+        self.assertEqual(editor.file_signature(bundle), before)
+
+    def test_merge_by_question_id(self):
+        self.patch_save(self.edited(3, 'Edited?'))
+        qs = list(self.topic['questions'])
+        del qs[7]
+        qs.insert(0, make_question(100))
+        self.patch_save(qs)
+        records = editor.read_topic_log('c', self.rel)
+        # Upstream removed the first two questions meanwhile
+        merged, skipped = editor.merge_topic_log(self.questions[2:], records)
+        self.assertEqual(skipped, 0)
+        self.assertEqual([q['id'] for q in merged], ['q100'] + [f'q{i}' for i in (2, 3, 4, 5, 6, 8, 9)])
+        self.assertEqual(merged[2]['question'], 'Edited?')
+        self.assertEqual(editor.merge_topic_log(self.questions, [{'op': 'delete', 'index': 0}]),
+                         (self.questions, 1))
+
+
+class JournalTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_course('c', {'t': [make_question(i) for i in range(3)]})
+        self.rel = 'topic/t.json'
+
+    def journal(self, record):
+        editor.append_journal('c', 't', self.rel, record)
+
+    def test_records_replay_onto_the_loaded_topic(self):
+        self.journal({'op': 'upsert', 'index': 1, 'question': make_question(1, 'Edited?')})
+        self.journal({'op': 'insert', 'index': 0, 'question': make_question(9)})
+        self.journal({'op': 'delete', 'index': 3})
+        header, records = editor.read_journal('c', self.rel)
+        self.assertEqual(header['sha256'], editor.file_sha256(editor.topic_path('c', self.rel)))
+        topic = editor.replay_journal(editor.load_topic_file('c', self.rel), records)
+        self.assertEqual([q['question'] for q in topic['questions']], ['Question 9?', 'Question 0?', 'Edited?'])
+        self.assertFalse(editor.journal_base_changed('c', self.rel, header))
+        self.assertEqual(editor.list_journals(), [('c', self.rel)])
+
+    def test_torn_last_line_is_ignored(self):
+        self.journal({'op': 'upsert', 'index': 0, 'question': make_question(0, 'Kept?')})
+        with open(editor.journal_path('c', self.rel), 'a', encoding='utf-8') as f:
+            f.write('{"op": "upsert", "ind')
+        _header, records = editor.read_journal('c', self.rel)
+        self.assertEqual([r['question']['question'] for r in records], ['Kept?'])
+
+    def test_changed_or_unknown_base_is_reported(self):
+        self.journal({'op': 'upsert', 'index': 0, 'question': make_question(0, 'Mine?')})
+        header, _records = editor.read_journal('c', self.rel)
+        editor.save_topic_file('c', self.rel, {'topic_id': 't', 'questions': []})
+        self.assertTrue(editor.journal_base_changed('c', self.rel, header))
+        # No header: the base is unknown, even when the topic file is missing too
+        os.remove(editor.topic_path('c', self.rel))
+        self.assertTrue(editor.journal_base_changed('c', self.rel, None))
+        self.assertFalse(editor.journal_base_changed('c', self.rel, dict(header, sha256=None)))
+
+    def test_edits_during_a_save_survive_it(self):
+        self.journal({'op': 'upsert', 'index': 0, 'question': make_question(0, 'Saved?')})
+        editor.set_journal_aside('c', self.rel)
+        self.journal({'op': 'upsert', 'index': 1, 'question': make_question(1, 'During?')})
+        # An interrupted save leaves both parts; recovery sees them in order
+        _header, records = editor.read_journal('c', self.rel)
+        self.assertEqual([r['question']['question'] for r in records], ['Saved?', 'During?'])
+        editor.discard_journal('c', self.rel, aside_only=True)
+        _header, records = editor.read_journal('c', self.rel)
+        self.assertEqual([r['question']['question'] for r in records], ['During?'])
+        editor.discard_journal('c', self.rel)
+        self.assertEqual(editor.read_journal('c', self.rel), (None, []))
+        self.assertEqual(editor.list_journals(), [])
+
+
+
+class ValidationCacheTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_course('c', {'a': [make_question(i) for i in range(3)], 'b': [make_question(5)]})
+
+    def validate(self):
+        return editor.validate_all(jobs=1)
+
+    def test_unchanged_files_come_from_the_cache(self):
+        first = self.validate()
+        self.assertEqual((first['files'], first['questions'], first['cached']), (2, 4, 0))
+        again = self.validate()
+        self.assertEqual((again['questions'], again['cached'], again['errors']), (4, 2, []))
+
+    def test_edited_file_is_validated_again(self):
+        self.validate()
+        bad = dict(make_question(7), correct=9)
+        editor.save_topic_file('c', 'topic/b.json', {'topic_id': 'b', 'questions': [bad]})
+        report = self.validate()
+        self.assertEqual(report['cached'], 1)
+        self.assertEqual([(e['file'], e['index']) for e in report['errors']], [('topic/b.json', 0)])
+        # Errors are cached along with the file's hash
+        self.assertEqual(self.validate()['errors'], report['errors'])
+
+    def test_write_log_invalidates_the_entry(self):
+        self.validate()
+        editor.append_topic_log('c', 'topic/a.json', [{'op': 'delete', 'index': 0}])
+        report = self.validate()
+        self.assertEqual((report['cached'], report['questions']), (1, 3))
+
+    def test_other_validator_version_discards_the_cache(self):
+        self.validate()
+        with mock.patch.object(editor, 'VALIDATOR_VERSION', editor.VALIDATOR_VERSION + 1):
+            self.assertEqual(editor.load_validation_cache(), {})
+            self.assertEqual(self.validate()['cached'], 0)
+
+    def test_unreadable_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(editor.VALIDATION_CACHE_PATH), exist_ok=True)
+        with open(editor.VALIDATION_CACHE_PATH, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        self.assertEqual(self.validate()['cached'], 0)
+        self.assertEqual(self.validate()['cached'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
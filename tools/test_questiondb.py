@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+ Unit tests for questiondb.py (standard library only)
+
+Run: npm test
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import editor  # noqa: E402
+import questiondb  # noqa: E402
+from test_editor import TempTreeTestCase, make_question  # noqa: E402
+
+
+class QuestionDbTest(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        pic = dict(make_question(1, 'Ktorý plánovač?'), type='mc_multi', correct=[0, 2], image='basics/pic.png')
+        self.write_course('c', {'basics': [make_question(0), pic], 'more': [make_question(2)]})
+        topics = editor.load_topics('c')
+        topics['topics'].append({'id': 'big', 'file': 'topic/big.shards.json'})
+        editor.save_topics_json('c', topics)
+        editor.save_sharded_topic('c', 'topic/big.shards.json',
+                                  {'topic_id': 'big', 'questions': [make_question(i) for i in range(10, 17)]},
+                                  shard_size=3)
+        self.conn = questiondb.connect()
+        self.addCleanup(self.conn.close)
+
+    def data_files(self, root):
+        out = {}
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                if not name.startswith('.'):
+                    path = os.path.join(dirpath, name)
+                    with open(path, 'rb') as f:
+                        out[os.path.relpath(path, root).replace(os.sep, '/')] = f.read()
+        return out
+
+    def run_main(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            rc = questiondb.main(list(argv))
+        return rc, out.getvalue(), err.getvalue()
+
+    def test_sync_and_query(self):
+        stats = questiondb.sync(self.conn)
+        self.assertEqual((stats['topics'], stats['imported'], stats['questions'], stats['errors']), (3, 3, 10, []))
+        self.assertEqual([r['question']['id'] for r in questiondb.query(self.conn, course='c', topic='basics')],
+                         ['q0', 'q1'])
+        rows = questiondb.query(self.conn, qtype='mc_multi', has_image=True)
+        self.assertEqual([(r['topic'], r['index'], r['question']['image']) for r in rows],
+                         [('basics', 1, 'basics/pic.png')])
+        self.assertEqual(len(questiondb.query(self.conn, image='images/c/basics/*')), 1)
+        # Full-text search folds diacritics and case
+        self.assertEqual([r['question']['id'] for r in questiondb.query(self.conn, text='planovac')], ['q1'])
+        self.assertEqual([r['file'] for r in questiondb.query(self.conn, qid='q12')], ['topic/big.shards.json'])
+
+    def test_resync_imports_only_changed_topics(self):
+        questiondb.sync(self.conn)
+        self.assertEqual(questiondb.sync(self.conn)['imported'], 0)
+        topic = editor.load_topic_file('c', 'topic/more.json')
+        editor.save_topic_patch('c', 'topic/more.json', topic, dict(topic, questions=[make_question(2, 'Edited?')]))
+        self.assertEqual(questiondb.sync(self.conn)['imported'], 1)
+        self.assertEqual(questiondb.query(self.conn, qid='q2')[0]['question']['question'], 'Edited?')
+
+    def test_export_reproduces_editor_written_files(self):
+        questiondb.sync(self.conn)
+        out_dir = os.path.join(self.root, 'export')
+        written = questiondb.export(self.conn, out_dir)
+        exported = self.data_files(out_dir)
+        self.assertEqual(exported, self.data_files(editor.DATA_DIR))
+        self.assertEqual(written, len(exported))
+        self.assertEqual(questiondb.export(self.conn, out_dir), 0)
+
+    def test_cli_round_trip(self):
+        rc, out, _err = self.run_main('sync')
+        self.assertEqual(rc, 0)
+        self.assertIn('10 questions from 3 topics', out)
+        rc, out, _err = self.run_main('query', '--topic', 'more', '--format', 'json')
+        self.assertEqual((rc, [r['question']['id'] for r in json.loads(out)]), (0, ['q2']))
+        rc, out, _err = self.run_main('sql', 'SELECT count(*) FROM questions')
+        self.assertEqual((rc, out.split()), (0, ['count(*)', '10']))
+        rc, _out, _err = self.run_main('export', os.path.join(self.root, 'export'), '--course', 'c')
+        self.assertEqual(rc, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'export', 'c', 'topic', 'big.shards.json')))
+
+    def test_missing_files_exit_with_a_message(self):
+        for argv in (['query'], ['sql', 'SELECT 1'], ['export', os.path.join(self.root, 'export')]):
+            rc, _out, err = self.run_main('--db', os.path.join(self.root, 'none.sqlite'), *argv)
+            self.assertEqual(rc, 2)
+            self.assertIn('questiondb.py sync', err)
+        os.remove(os.path.join(editor.DATA_DIR, 'courses.json'))
+        rc, _out, err = self.run_main('sync')
+        self.assertEqual(rc, 2)
+        self.assertIn('courses.json', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+ Unit tests for topicbin.py (standard library only)
+
+Run: npm test
+"""
+import gc
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import editor  # noqa: E402
+import topicbin  # noqa: E402
+from test_editor import TempTreeTestCase, make_question  # noqa: E402
+
+
+class TopicbinTest(unittest.TestCase):
+    def assert_round_trip(self, value):
+        back = topicbin.loads(topicbin.dumps(value))
+        self.assertEqual(back, value)
+        self.assertEqual(json.dumps(back, ensure_ascii=False, indent=2),
+                         json.dumps(value, ensure_ascii=False, indent=2))
+        return back
+
+    def test_synthetic_topic(self):
+        self.assert_round_trip(topicbin._synthetic_topic(300))
+
+    def test_scalars_and_edge_values(self):
+        self.assert_round_trip([None, True, False, 0, 1, 1.0, -1, -10 ** 12, 2 ** 70, 1.5, -0.0,
+                                '', 'ľščťžýáíé ✓', [], {}, [[[]]], {'b': 1, 'a': 2}])
+        for value in (None, True, 0, 2 ** 70, -0.0, 'x', [], {}):
+            self.assertEqual(repr(topicbin.loads(topicbin.dumps(value))), repr(value))
+
+    def test_many_strings_and_shapes(self):
+        # Table indices past 16 bits and many object shapes of one height
+        value = [{f'k{i}': f's{i % 200}', 'x': [i, f's{i % 200}']} for i in range(25000)]
+        self.assert_round_trip(value)
+
+    def test_containers_are_not_shared(self):
+        back = self.assert_round_trip({'a': [{'b': []}, {'b': []}], 'c': {}, 'd': {}})
+        self.assertIsNot(back['a'][0]['b'], back['a'][1]['b'])
+        self.assertIsNot(back['c'], back['d'])
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            topicbin.loads(b'{"questions": []}')
+        packed = topicbin.dumps({'a': [1, 2], 'b': 'text'})
+        for bad in (packed + b'\0', packed[:-3], packed[:4], packed[:3] + b'\x01' + packed[4:]):
+            with self.assertRaises(ValueError):
+                topicbin.loads(bad)
+        self.assertTrue(gc.isenabled())
+
+    def test_rejects_values_json_cannot_hold(self):
+        with self.assertRaises(TypeError):
+            topicbin.dumps({1: 'a'})
+        with self.assertRaises(TypeError):
+            topicbin.dumps([{1, 2}])
+
+
+class BinaryTopicFileTest(TempTreeTestCase):
+    def test_editor_reads_and_writes_mqt_topics(self):
+        os.makedirs(os.path.join(editor.DATA_DIR, 'c', 'topic'))
+        topic = {'topic_id': 'bin', 'topic_name': 'Binary', 'questions': [make_question(i) for i in range(5)]}
+        editor.save_topic_file('c', 'topic/bin.mqt', topic)
+        with open(editor.topic_path('c', 'topic/bin.mqt'), 'rb') as f:
+            self.assertTrue(topicbin.is_binary(f.read()))
+        self.assertEqual(editor.load_topic_file('c', 'topic/bin.mqt'), topic)
+
+
+if __name__ == '__main__':
+    unittest.main()
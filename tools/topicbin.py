@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+ Compact binary encoding of topic files (standard library only)
+- Lossless for any JSON value: loads(dumps(x)) == x, key order included, so a binary
+  topic converts back to byte-identical pretty-printed JSON
+- Columnar layout built for fast loading: every distinct string is stored once in one
+  UTF-8 blob (field names, question types, repeated options and image paths included),
+  ints and floats in their own sections, and containers as groups of the same shape
+  (objects with one key sequence, arrays of one length) that refer to their children by
+  index into the value table. Groups are ordered so children always come first
+- loads() therefore never looks at values one tag at a time: it decodes the blob once,
+  slices the strings out with map(), and builds each group with a handful of C-level
+  calls (itemgetter over the reference array, zip, dict)
+
+Topic files whose name ends in .mqt use this format (see load_topic_file/save_topic_file
+in editor.py). The site still reads JSON: build.py bundles compiles either format.
+
+Run: python tools/topicbin.py encode data/os/topic/processes.json out.mqt
+     python tools/topicbin.py decode out.mqt out.json
+     python tools/topicbin.py verify            (round-trips every topic under data/)
+     python tools/topicbin.py bench [--questions 10000]
+"""
+import argparse
+import gc
+import gzip
+import json
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from itertools import accumulate, repeat
+from operator import itemgetter
+
+EXT = '.mqt'
+MAGIC = b'MQT'
+VERSION = 2
+
+# Value table: fixed constants first, then strings, ints and floats, then containers
+CONSTANTS = (None, True, False)
+K_OBJECT, K_ARRAY = 0, 1
+
+_DOUBLE = struct.Struct('<d')
+_UINT_CODES = ('B', 'H', 'I', 'Q')
+
+
+def _varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _uints(out, values):
+    """Append unsigned ints as one little-endian array of the narrowest fitting width."""
+    top = max(values, default=0)
+    code = next(c for c in _UINT_CODES if top < 1 << (8 * array(c).itemsize))
+    packed = array(code, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    out.append(_UINT_CODES.index(code))
+    out.extend(packed.tobytes())
+
+
+def dumps(value):
+    """Encode a JSON-compatible value."""
+    strings = {}          # str -> index among strings
+    ints = {}             # int -> index among ints
+    floats = {}           # packed double -> (index among floats, value)
+    heights = {}          # id(container) -> height
+    groups = {}           # (height, kind, keys or length) -> [container, ...]
+
+    def scan(children):
+        # Post-order walk: record every distinct scalar and group containers by height and
+        # shape, so the decoder can build each group from finished children in one pass.
+        # Returns the height of the tallest container among children (0: scalars only)
+        h = 0
+        for c in children:
+            if isinstance(c, str):
+                strings.setdefault(c, len(strings))
+            elif c is None or c is True or c is False:
+                pass
+            elif isinstance(c, int):
+                ints.setdefault(c, len(ints))
+            elif isinstance(c, float):
+                floats.setdefault(_DOUBLE.pack(c), (len(floats), c))
+            else:
+                h = max(h, visit(c))
+        return h
+
+    def visit(v):
+        h = heights.get(id(v))
+        if h is not None:
+            return h
+        if isinstance(v, dict):
+            for k in v:
+                if type(k) is not str:
+                    raise TypeError(f'object keys must be strings, not {type(k).__name__}')
+                strings.setdefault(k, len(strings))
+            key = (K_OBJECT, tuple(v))
+            children = v.values()
+        elif isinstance(v, list):
+            key = (K_ARRAY, len(v))
+            children = v
+        else:
+            raise TypeError(f'{type(v).__name__} is not JSON serializable')
+        h = scan(children) + 1
+        heights[id(v)] = h
+        groups.setdefault((h,) + key, []).append(v)
+        return h
+
+    scan((value,))
+    # Table indices of every value: constants, strings, ints, floats, then containers in
+    # build order (by height, then by group)
+    index = {id(c): i for i, c in enumerate(CONSTANTS)}
+    at = len(CONSTANTS)
+    string_ref = {s: at + i for s, i in strings.items()}
+    at += len(strings)
+    int_ref = {n: at + i for n, i in ints.items()}
+    at += len(ints)
+    float_ref = {b: at + i for b, (i, _) in floats.items()}
+    at += len(floats)
+    order = sorted(groups, key=lambda g: g[0])
+    for g in order:
+        for c in groups[g]:
+            index[id(c)] = at
+            at += 1
+
+    def ref(v):
+        if isinstance(v, str):
+            return string_ref[v]
+        if v is None or v is True or v is False:
+            return index[id(v)]
+        if isinstance(v, int):
+            return int_ref[v]
+        if isinstance(v, float):
+            return float_ref[_DOUBLE.pack(v)]
+        return index[id(v)]
+
+    # Header: magic, version, table sizes; string lengths (in characters) and one UTF-8
+    # blob so loads() decodes every string with one bytes.decode(); ints as decimal text
+    # (any size), floats as raw doubles
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    for n in (len(strings), len(ints), len(floats), len(order)):
+        _varint(out, n)
+    _uints(out, list(map(len, strings)))
+    blob = ''.join(strings).encode('utf-8')
+    _varint(out, len(blob))
+    out.extend(blob)
+    digits = ','.join(map(str, ints)).encode('ascii')
+    _varint(out, len(digits))
+    out.extend(digits)
+    out.extend(b''.join(floats))
+    # Container groups in build order, then one array of child references for all of them
+    refs = []
+    for h, kind, shape in order:
+        members = groups[h, kind, shape]
+        out.append(kind)
+        _varint(out, len(members))
+        if kind == K_OBJECT:
+            _varint(out, len(shape))
+            for k in shape:
+                _varint(out, string_ref[k])
+            for c in members:
+                refs.extend(map(ref, c.values()))
+        else:
+            _varint(out, shape)
+            for c in members:
+                refs.extend(map(ref, c))
+    _varint(out, len(refs))
+    _uints(out, refs)
+    _varint(out, ref(value))
+    return bytes(out)
+
+
+def is_binary(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def loads(data):
+    """Decode bytes produced by dumps()."""
+    data = bytes(data)
+    if not is_binary(data):
+        raise ValueError('not a binary topic (bad magic)')
+    if data[3] != VERSION:
+        raise ValueError(f'unsupported binary topic version {data[3]}')
+    # The result is a tree, so the cyclic collector has nothing to find while it is built;
+    # pausing it saves the repeated scans that tens of thousands of new containers trigger
+    paused = gc.isenabled()
+    gc.disable()
+    try:
+        return _loads(data)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f'corrupt binary topic: {e}') from None
+    finally:
+        if paused:
+            gc.enable()
+
+
+def _loads(data):
+    pos = 4
+
+    def varint():
+        nonlocal pos
+        n = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def uints(count):
+        nonlocal pos
+        values = array(_UINT_CODES[data[pos]])
+        end = pos + 1 + count * values.itemsize
+        if end > len(data):
+            raise IndexError('array past end of data')
+        values.frombytes(data[pos + 1:end])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        pos = end
+        return values
+
+    def chunk(n):
+        nonlocal pos
+        if pos + n > len(data):
+            raise IndexError('section past end of data')
+        pos += n
+        return data[pos - n:pos]
+
+    n_strings, n_ints, n_floats, n_groups = varint(), varint(), varint(), varint()
+    bounds = list(accumulate(uints(n_strings), initial=0))
+    text = chunk(varint()).decode('utf-8')
+    if bounds[-1] != len(text):
+        raise IndexError('string lengths do not match the text')
+    # Every table entry is built by C-level map()s over whole sections; no per-value tags
+    table = list(CONSTANTS)
+    table.extend(map(text.__getitem__, map(slice, bounds, bounds[1:])))
+    digits = chunk(varint())
+    if n_ints:
+        table.extend(map(int, digits.split(b',')))
+    table.extend(v for (v,) in _DOUBLE.iter_unpack(chunk(8 * n_floats)))
+    groups = []
+    for _ in range(n_groups):
+        kind, count = data[pos], (pos := pos + 1) and varint()
+        if kind == K_OBJECT:
+            groups.append((kind, count, [varint() for _ in range(varint())]))
+        elif kind == K_ARRAY:
+            groups.append((kind, count, varint()))
+        else:
+            raise IndexError(f'bad container kind {kind}')
+    refs = uints(varint())
+    at = 0
+    for kind, count, shape in groups:
+        width = len(shape) if kind == K_OBJECT else shape
+        # Children always come from earlier groups, so they are already in the table
+        n = count * width
+        if at + n > len(refs):
+            raise IndexError('references past end of data')
+        values = itemgetter(*refs[at:at + n])(table) if n > 1 else [table[i] for i in refs[at:at + n]]
+        at += n
+        rows = zip(*[iter(values)] * width) if width else repeat((), count)
+        if kind == K_OBJECT:
+            keys = [table[k] for k in shape]
+            table.extend(map(dict, map(zip, repeat(keys), rows)))
+        else:
+            table.extend(map(list, rows))
+    value = table[varint()]
+    if at != len(refs) or pos != len(data):
+        raise ValueError(f'{len(data) - pos} trailing bytes')
+    return value
+
+
+# ---------- CLI ----------
+
+def _dump_json_bytes(data):
+    # Same canonical form as editor.dump_json_bytes (kept local so this module has no deps)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def cmd_encode(args):
+    with open(args.src, 'rb') as f:
+        data = json.loads(f.read())
+    with open(args.dst, 'wb') as f:
+        f.write(dumps(data))
+    return 0
+
+
+def cmd_decode(args):
+    with open(args.src, 'rb') as f:
+        data = loads(f.read())
+    with open(args.dst, 'wb') as f:
+        f.write(_dump_json_bytes(data))
+    return 0
+
+
+def _topic_files():
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    for root, _dirs, files in os.walk(data_dir):
+        for name in sorted(files):
+            if name.endswith('.json') and os.path.basename(root) == 'topic':
+                yield os.path.join(root, name)
+
+
+def cmd_verify(args):
+    rc = 0
+    json_total = bin_total = 0
+    for p in _topic_files():
+        with open(p, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw)
+        packed = dumps(data)
+        back = loads(packed)
+        if back != data or _dump_json_bytes(back) != _dump_json_bytes(data):
+            print(f'MISMATCH {p}', file=sys.stderr)
+            rc = 1
+        json_total += len(raw)
+        bin_total += len(packed)
+    print(f'Round-tripped topics: {json_total} B json -> {bin_total} B binary')
+    return rc
+
+
+def _synthetic_topic(n, seed=1):
+    """A topic of n questions cycling through all seven types (realistic field sizes)."""
+    rnd = random.Random(seed)
+    words = ('proces', 'vlákno', 'plánovač', 'pamäť', 'stránkovanie', 'semafor', 'zámok',
+             'kontext', 'prerušenie', 'jadro', 'súbor', 'disk', 'cache', 'mutex', 'fronta')
+
+    def sentence(k):
+        return ' '.join(rnd.choice(words) for _ in range(k)).capitalize() + '.'
+
+    questions = []
+    for i in range(n):
+        t = ('true_false', 'mc_single', 'mc_multi', 'fill_text', 'fill_table', 'sort', 'connect_nodes')[i % 7]
+        q = {'id': f'q{i}', 'type': t, 'question': sentence(12), 'explanation': sentence(20)}
+        if t == 'true_false':
+            q['correct'] = rnd.random() < 0.5
+        elif t in ('mc_single', 'mc_multi'):
+            q['options'] = [sentence(4) for _ in range(4)]
+            q['correct'] = rnd.randrange(4) if t == 'mc_single' else sorted(rnd.sample(range(4), 2))
+        elif t == 'fill_text':
+            q['answers'] = [rnd.choice(words) for _ in range(2)]
+        elif t == 'fill_table':
+            q['table'] = {'answers': [[rnd.choice(words) for _ in range(3)] for _ in range(3)]}
+        elif t == 'sort':
+            q['items'] = [sentence(3) for _ in range(5)]
+            q['correct'] = rnd.sample(range(5), 5)
+        else:
+            q['leftNodes'] = [{'id': f'l{j}', 'label': sentence(2)} for j in range(4)]
+            q['rightNodes'] = [{'id': f'r{j}', 'label': sentence(2)} for j in range(4)]
+            q['correctPairs'] = [{'leftId': f'l{j}', 'rightId': f'r{j}'} for j in range(4)]
+        if i % 3 == 0:
+            q['explanation_image'] = f'topic/screenshot-{i % 40}.png'
+        questions.append(q)
+    return {'topic_id': 'bench', 'topic_name': 'Benchmark', 'questions': questions}
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def cmd_bench(args):
+    topic = _synthetic_topic(args.questions)
+    as_json = _dump_json_bytes(topic)
+    as_bin = dumps(topic)
+    assert loads(as_bin) == topic
+    rows = [
+        ('json (indent=2)', len(as_json), len(gzip.compress(as_json, mtime=0)),
+         _best_of(lambda: json.loads(as_json), args.repeat), _best_of(lambda: _dump_json_bytes(topic), args.repeat)),
+        ('binary', len(as_bin), len(gzip.compress(as_bin, mtime=0)),
+         _best_of(lambda: loads(as_bin), args.repeat), _best_of(lambda: dumps(topic), args.repeat)),
+    ]
+    print(f'{args.questions} questions (all 7 types), best of {args.repeat}')
+    print(f'{"format":<16}{"bytes":>12}{"gzip":>10}{"load ms":>10}{"dump ms":>10}')
+    for name, size, gz, load_ms, dump_ms in rows:
+        print(f'{name:<16}{size:>12}{gz:>10}{load_ms:>10.1f}{dump_ms:>10.1f}')
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Binary topic format tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_enc = sub.add_parser('encode', help='Convert a JSON topic to binary')
+    p_enc.add_argument('src')
+    p_enc.add_argument('dst')
+    p_enc.set_defaults(func=cmd_encode)
+    p_dec = sub.add_parser('decode', help='Convert a binary topic to pretty-printed JSON')
+    p_dec.add_argument('src')
+    p_dec.add_argument('dst')
+    p_dec.set_defaults(func=cmd_decode)
+    p_ver = sub.add_parser('verify', help='Round-trip every topic under data/ and compare')
+    p_ver.set_defaults(func=cmd_verify)
+    p_bench = sub.add_parser('bench', help='Compare size and speed against json on a synthetic topic')
+    p_bench.add_argument('--questions', type=int, default=10000, help='Questions in the synthetic topic (default: 10000)')
+    p_bench.add_argument('--repeat', type=int, default=5, help='Timing runs; the best is reported (default: 5)')
+    p_bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())